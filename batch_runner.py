@@ -0,0 +1,97 @@
+from typing import Callable, Generator, Iterable, Optional
+from dataclasses import dataclass, field
+from multiprocessing import Pool
+import os
+
+from binary_log import BinaryLog
+from bulk_parser import BulkParser, read_mapped_chunks
+from obstacle_map import ObstacleMap
+from pose import Pose
+from table_simulator import TableSimulator
+
+# Every worker process builds its simulator (and parser) once, when the pool starts, and reuses them for every scenario.
+_simulator = None
+_parser: Optional[BulkParser] = None
+
+
+@dataclass
+class ScenarioResult:
+    """The outcome of running one scenario file.
+    """
+    path: str
+    # Every pose REPORTed by the scenario, in order.
+    reports: list[Pose] = field(default_factory=list)
+    # Where the robot ended up (None if it was never placed).
+    final: Optional[Pose] = None
+    # Why the scenario could not be run at all, if it could not.
+    error: Optional[str] = None
+
+
+def _init_worker(engine: Callable, x_range: Optional[list[int]], y_range: Optional[list[int]],
+                 obstacles: Optional[ObstacleMap]) -> None:
+    global _simulator, _parser
+
+    _simulator = engine(x_range, y_range, obstacles)
+    _parser = BulkParser()
+
+
+def _run_scenario(path: str) -> ScenarioResult:
+    """Runs a scenario file from scratch on the worker's simulator.
+    """
+    _simulator.reset()
+    reports = []
+
+    try:
+        if BinaryLog.is_binary_log(path):
+            with BinaryLog(path) as log:
+                if log.x_range != _simulator.x_range or log.y_range != _simulator.y_range:
+                    raise RuntimeError(f"{path} was recorded for a table of {log.x_range} by {log.y_range}, not "
+                                       f"{_simulator.x_range} by {_simulator.y_range}.")
+
+                reports.extend(_simulator.run_stream(log.stream))
+        else:
+            for stream in _parser.parse_chunks(read_mapped_chunks(path)):
+                reports.extend(_simulator.run_stream(stream))
+    except Exception as error:
+        # Whatever goes wrong, it only goes wrong for this scenario (and the worker has to stay up for the others).
+        return ScenarioResult(path, error=str(error) if isinstance(error, (OSError, RuntimeError)) else repr(error))
+
+    return ScenarioResult(path, reports, _simulator.robot_state)
+
+
+class BatchRunner:
+    """Runs many independent scenario files across a pool of long-lived worker processes.
+
+    Each scenario is a file of commands (text or binary log, just like --input) run from scratch, on a robot that has
+    not been placed. Workers are started once and keep their simulator warm between scenarios, so the cost of starting
+    an interpreter (and of building transition tables) is paid once per worker rather than once per scenario.
+
+    Scenarios are handed out one at a time, largest first: whichever worker is free takes the next one, so a few large
+    files do not hold up the rest. Results come back as soon as they are ready, which is not necessarily in order.
+    """
+
+    def __init__(self,
+                 jobs: Optional[int] = None,
+                 engine: Callable = TableSimulator,
+                 x_range: Optional[list[int]] = None,
+                 y_range: Optional[list[int]] = None,
+                 obstacles: Optional[ObstacleMap] = None):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.engine = engine
+
+        # The table every scenario is run on (the engine's default, unless given).
+        self.x_range = x_range
+        self.y_range = y_range
+        self.obstacles = obstacles
+
+    def run(self, paths: Iterable[str]) -> Generator[ScenarioResult, None, None]:
+        """Yields the result of every scenario, as they complete.
+        """
+        # Missing files sort first, so that they fail straight away rather than at the very end.
+        paths = sorted(paths, key=lambda path: os.path.getsize(path) if os.path.isfile(path) else float("inf"),
+                       reverse=True)
+
+        initargs = (self.engine, self.x_range, self.y_range, self.obstacles)
+
+        with Pool(self.jobs, initializer=_init_worker, initargs=initargs) as pool:
+            yield from pool.imap_unordered(_run_scenario, paths, chunksize=1)
@@ -0,0 +1,334 @@
+from typing import Callable, Optional
+from collections import deque
+from dataclasses import dataclass, asdict
+import contextlib
+import statistics
+import tracemalloc
+import argparse
+import logging
+import random
+import json
+import time
+import io
+
+from bulk_parser import BulkParser
+from command import Command, parse_string_into_command
+from main import run
+from pose import Pose
+from simulator import Simulator
+from table_simulator import TableSimulator
+from user_interface import UserInterface
+import simulator_primitives as primitives
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Workload:
+    """A synthetic stream of commands, and the table it is meant to be run on.
+    """
+    name: str
+    lines: list[str]
+    x_range: list[int]
+    y_range: list[int]
+
+
+def _random_place(rng: random.Random, x_range: list[int], y_range: list[int], margin: int = 0) -> str:
+    x = rng.randint(x_range[0] - margin, x_range[1] + margin)
+    y = rng.randint(y_range[0] - margin, y_range[1] + margin)
+    return f"PLACE {x},{y},{rng.choice(list(Pose.Direction)).name}"
+
+
+def random_walk(size: int, seed: int) -> Workload:
+    """The robot is placed once and then wanders around at random, REPORTing now and then.
+    """
+    rng = random.Random(seed)
+
+    lines = [_random_place(rng, Simulator.x_range, Simulator.y_range)]
+    lines += rng.choices(["MOVE", "LEFT", "RIGHT", "REPORT"], weights=[6, 2, 2, 1], k=size - 1)
+
+    return Workload("random_walk", lines, list(Simulator.x_range), list(Simulator.y_range))
+
+
+def edge_hugging(size: int, seed: int) -> Workload:
+    """The robot keeps running into the edge of the table, so most MOVEs are rejected.
+    """
+    rng = random.Random(seed)
+    lines = []
+
+    while len(lines) < size:
+        # Drive into a wall, and keep pushing against it for a while.
+        lines.append(_random_place(rng, Simulator.x_range, Simulator.y_range))
+        lines += ["MOVE"] * rng.randint(5, 20)
+        lines.append(rng.choice(["LEFT", "RIGHT", "REPORT"]))
+
+    return Workload("edge_hugging", lines[:size], list(Simulator.x_range), list(Simulator.y_range))
+
+
+def place_heavy(size: int, seed: int) -> Workload:
+    """Mostly PLACEs, about a third of which fall outside the table.
+    """
+    rng = random.Random(seed)
+    lines = [_random_place(rng, Simulator.x_range, Simulator.y_range, margin=2) if rng.random() < 0.7
+             else rng.choice(["MOVE", "LEFT", "REPORT"]) for _ in range(size)]
+
+    return Workload("place_heavy", lines, list(Simulator.x_range), list(Simulator.y_range))
+
+
+def large_table(size: int, seed: int) -> Workload:
+    """A random walk on a much larger table, with long counted MOVEs, so there are many more distinct poses.
+
+    (Much larger still, and building the TableSimulator's transition tables takes longer than running the workload.)
+    """
+    x_range, y_range = [0, 99], [0, 99]
+    rng = random.Random(seed)
+
+    lines = [_random_place(rng, x_range, y_range)]
+    lines += [rng.choice(["MOVE", f"MOVE {rng.randint(2, 50)}", "LEFT", "RIGHT", "REPORT"]) for _ in range(size - 1)]
+
+    return Workload("large_table", lines, x_range, y_range)
+
+
+WORKLOADS: dict[str, Callable[[int, int], Workload]] = {
+    "random_walk": random_walk,
+    "edge_hugging": edge_hugging,
+    "place_heavy": place_heavy,
+    "large_table": large_table,
+}
+
+
+def _make_simulator(engine: Callable, workload: Workload):
+    return engine(workload.x_range, workload.y_range)
+
+
+def _poses_of(workload: Workload) -> list[Pose]:
+    """Every pose the robot is in throughout a workload (used as input for the primitives).
+    """
+    simulator = _make_simulator(Simulator, workload)
+    poses = []
+
+    for line in workload.lines:
+        simulator.process_command(Command.from_string(line))
+
+        if simulator.robot_state is not None:
+            poses.append(simulator.robot_state)
+
+    return poses
+
+
+def _end_to_end(workload: Workload) -> tuple[list, Callable]:
+    def run_all(lines: list[str]) -> None:
+        # Output is thrown away; printing it would only measure the terminal.
+        with contextlib.redirect_stdout(io.StringIO()):
+            run(_make_simulator(Simulator, workload), UserInterface(), map(Command.from_string, lines))
+
+    return [workload.lines], run_all
+
+
+def _run_stream(workload: Workload) -> tuple[list, Callable]:
+    simulator = _make_simulator(TableSimulator, workload)
+    streams = list(BulkParser().parse_chunks(["\n".join(workload.lines).encode("ascii")]))
+    return streams, lambda stream: deque(simulator.run_stream(stream), maxlen=0)
+
+
+@dataclass
+class Stage:
+    """A part of the pipeline to measure.
+
+    `prepare` builds, from a workload, the items to process and the function that processes one of them. Preparation is
+    not measured, and happens again for every measurement, so that every one of them starts from the same state.
+    """
+    name: str
+    prepare: Callable[[Workload], tuple[list, Callable]]
+    # Whether every item is a single command; if not, there is no per-command latency to speak of.
+    per_command: bool = True
+
+
+STAGES: dict[str, Stage] = {stage.name: stage for stage in [
+    # Parsing is cached (see parse_string_into_command), which is part of what is being measured.
+    Stage("parse", lambda workload: (workload.lines, parse_string_into_command)),
+    Stage("move_forward", lambda workload: (_poses_of(workload), primitives.move_forward)),
+    Stage("process_command",
+          lambda workload: (list(map(Command.from_string, workload.lines)),
+                            _make_simulator(Simulator, workload).process_command)),
+    Stage("table_process_command",
+          lambda workload: (list(map(Command.from_string, workload.lines)),
+                            _make_simulator(TableSimulator, workload).process_command)),
+    Stage("bulk_parse",
+          lambda workload: (["\n".join(workload.lines).encode("ascii")],
+                            lambda data: deque(BulkParser().parse_chunks([data]), maxlen=0)),
+          per_command=False),
+    Stage("run_stream", _run_stream, per_command=False),
+    Stage("end_to_end", _end_to_end, per_command=False),
+]}
+
+
+@dataclass
+class StageResult:
+    """Measurements for one stage on one workload. Latencies are in nanoseconds, memory in bytes.
+    """
+    workload: str
+    stage: str
+    commands: int
+    commands_per_second: float
+    latency_p50: Optional[float]
+    latency_p90: Optional[float]
+    latency_p99: Optional[float]
+    peak_memory: int
+
+    @property
+    def key(self) -> str:
+        return f"{self.workload}/{self.stage}"
+
+
+def measure(stage: Stage, workload: Workload, repeats: int = 3, latency_samples: int = 20000) -> StageResult:
+    """Measures a stage on a workload: throughput (best of a few runs), per-command latencies and peak memory.
+
+    Each is measured in a run of its own, as timing individual commands and tracing allocations both slow things down.
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        items, step = stage.prepare(workload)
+        commands = len(items) if stage.per_command else len(workload.lines)
+        start = time.perf_counter()
+        for item in items:
+            step(item)
+        best = min(best, time.perf_counter() - start)
+
+    percentiles = [None, None, None]
+    if stage.per_command:
+        items, step = stage.prepare(workload)
+        latencies = []
+        clock = time.perf_counter_ns
+
+        for item in items[:latency_samples]:
+            start = clock()
+            step(item)
+            latencies.append(clock() - start)
+
+        if len(latencies) > 1:
+            quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+            percentiles = [quantiles[49], quantiles[89], quantiles[98]]
+
+    items, step = stage.prepare(workload)
+    tracemalloc.start()
+    try:
+        for item in items:
+            step(item)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return StageResult(workload.name, stage.name, commands, commands / max(best, 1e-9), *percentiles, peak_memory)
+
+
+def run_benchmarks(workloads: list[Workload], stages: list[Stage], repeats: int = 3) -> list[StageResult]:
+    results = []
+
+    for workload in workloads:
+        for stage in stages:
+            results.append(measure(stage, workload, repeats))
+            logger.info(format_result(results[-1]))
+
+    return results
+
+
+def format_result(result: StageResult) -> str:
+    latencies = "n/a" if result.latency_p50 is None else \
+        f"p50 {result.latency_p50:.0f}ns, p90 {result.latency_p90:.0f}ns, p99 {result.latency_p99:.0f}ns"
+
+    return (f"{result.key:<36} {result.commands_per_second:>14,.0f} commands/s   {latencies:<36}   "
+            f"peak {result.peak_memory / 1024:,.0f}KiB")
+
+
+def save_baseline(path: str, results: list[StageResult], **metadata) -> None:
+    with open(path, "w") as file:
+        json.dump({"metadata": metadata, "results": [asdict(result) for result in results]}, file, indent=2)
+
+
+def load_baseline(path: str) -> list[StageResult]:
+    with open(path) as file:
+        return [StageResult(**result) for result in json.load(file)["results"]]
+
+
+def compare(baseline: list[StageResult], results: list[StageResult], tolerance: float = 0.2) -> list[str]:
+    """Compares results against a baseline, returning a description of every regression beyond the tolerance.
+
+    Throughput regresses if it drops, and memory if it grows, by more than the tolerance (as a fraction of the baseline).
+    Stages missing from either side are not compared.
+    """
+    regressions = []
+    previous = {result.key: result for result in baseline}
+
+    for result in results:
+        before = previous.get(result.key)
+
+        if before is None:
+            continue
+
+        if result.commands_per_second < before.commands_per_second * (1 - tolerance):
+            regressions.append(f"{result.key}: throughput dropped from {before.commands_per_second:,.0f} to "
+                               f"{result.commands_per_second:,.0f} commands/s")
+
+        if result.peak_memory > before.peak_memory * (1 + tolerance):
+            regressions.append(f"{result.key}: peak memory grew from {before.peak_memory:,} to "
+                               f"{result.peak_memory:,} bytes")
+
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the simulator pipeline on synthetic workloads.")
+    parser.add_argument('--size',
+                        type=int,
+                        default=100000,
+                        help='Number of commands in each workload.')
+    parser.add_argument('--seed',
+                        type=int,
+                        default=0,
+                        help='Seed for the workload generators; the same seed always gives the same workloads.')
+    parser.add_argument('--repeats',
+                        type=int,
+                        default=3,
+                        help='Throughput is the best of this many runs.')
+    parser.add_argument('--workload',
+                        choices=list(WORKLOADS),
+                        action='append',
+                        help='Workload to run (may be given more than once). Defaults to all of them.')
+    parser.add_argument('--stage',
+                        choices=list(STAGES),
+                        action='append',
+                        help='Stage to measure (may be given more than once). Defaults to all of them.')
+    parser.add_argument('--save',
+                        metavar='FILE',
+                        help='If set, results are saved into this file as JSON, to be used as a baseline.')
+    parser.add_argument('--compare',
+                        metavar='FILE',
+                        help='If set, results are compared against this baseline, exiting with an error on any '
+                             'regression.')
+    parser.add_argument('--tolerance',
+                        type=float,
+                        default=0.2,
+                        help='Fraction by which results may be worse than the baseline before it counts as a '
+                             'regression.')
+    args = parser.parse_args()
+
+    # Rejected commands are logged as usual, which is part of what they cost, but nothing is output.
+    logging.basicConfig(level=logging.WARNING, handlers=[logging.NullHandler()])
+    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.INFO)
+
+    workloads = [WORKLOADS[name](args.size, args.seed) for name in args.workload or WORKLOADS]
+    results = run_benchmarks(workloads, [STAGES[name] for name in args.stage or STAGES], args.repeats)
+
+    if args.save is not None:
+        save_baseline(args.save, results, size=args.size, seed=args.seed)
+
+    if args.compare is not None:
+        regressions = compare(load_baseline(args.compare), results, args.tolerance)
+
+        for regression in regressions:
+            logger.error(regression)
+
+        if regressions:
+            parser.exit(1)
@@ -0,0 +1,216 @@
+# Class methods return objects of the class below, so we need "better" type annotations.
+from __future__ import annotations
+
+from typing import Iterable, Optional
+from array import array
+import logging
+import struct
+import mmap
+import sys
+import os
+
+from command import try_parse_command
+from command_stream import CommandStream
+
+logger = logging.getLogger(__name__)
+
+# Every byte that is a valid opcode, and the number of opcodes checked at a time when a log is opened.
+_OPCODES = bytes(range(CommandStream.MACRO + 1))
+_CHECK_CHUNK_SIZE = 1 << 22
+
+
+class BinaryLog:
+    """A compact on-disk format for command streams, which can be replayed without any parsing.
+
+    The file starts with a fixed header, recording the limits of the table the log was made for and the number of
+    commands, PLACE records and macros in it. It is followed by one opcode byte per command (see CommandStream), then by
+    one packed record of three little-endian int32 (x, y, direction) per PLACE command, in order, and finally by the
+    macro commands, as one line of text each (see Command.to_string).
+
+    Keeping the PLACE records out of line means both sections can be used in place: an open BinaryLog exposes a
+    CommandStream whose opcodes and PLACE arguments are memoryviews straight into the memory-mapped file. (Macros are
+    few and far between, so they are simply parsed when the log is opened.)
+
+    Opening a log checks that the file is as long as its header says, and that every opcode, direction and macro in it
+    is valid, raising a RuntimeError if not; this takes a single pass over the opcodes.
+    """
+
+    MAGIC = b"TRBL"
+    VERSION = 2
+
+    # Magic, version, x_range, y_range, number of commands, number of PLACE records, number of macros.
+    header_format = struct.Struct("<4sHiiiiQQQ")
+    place_format = struct.Struct("<iii")
+
+    # PLACE coordinates are clamped to what fits in an int32; no table is large enough for that to matter.
+    coordinate_limits: tuple[int, int] = (-2 ** 31, 2 ** 31 - 1)
+
+    def __init__(self, path: str):
+        self.path = path
+
+        self.__file = open(path, "rb")
+        try:
+            header = self.__file.read(self.header_format.size)
+            magic, version, x_min, x_max, y_min, y_max, self.command_count, self.place_count, self.macro_count = \
+                self.header_format.unpack(header)
+        except struct.error:
+            self.__file.close()
+            raise RuntimeError(f"File is too short to be a binary command log: {path}")
+
+        if magic != self.MAGIC or version != self.VERSION:
+            self.__file.close()
+            raise RuntimeError(f"Not a binary command log (or an unsupported version of one): {path}")
+
+        self.x_range = [x_min, x_max]
+        self.y_range = [y_min, y_max]
+
+        opcodes_start = self.header_format.size
+        places_start = self.places_offset(self.command_count)
+        places_end = places_start + self.place_count * self.place_format.size
+
+        if os.fstat(self.__file.fileno()).st_size < places_end:
+            self.__file.close()
+            raise RuntimeError(f"Binary command log is truncated (its header promises {self.command_count} commands "
+                               f"and {self.place_count} PLACE records): {path}")
+
+        self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Every view into the map is kept track of, as they all need releasing before the map can be closed.
+        self.__views = [memoryview(self.__map)]
+        self.__views.append(self.__views[0][opcodes_start:opcodes_start + self.command_count])
+        self.__views.append(self.__views[0][places_start:places_end])
+
+        self.stream = CommandStream()
+        self.stream.opcodes = self.__views[1]
+
+        if sys.byteorder == "little":
+            self.__views.append(self.__views[2].cast("i"))
+            self.stream.place_args = self.__views[3]
+        else:
+            # The records cannot be used in place, so fall back to a (byte-swapped) copy.
+            self.stream.place_args = array("i", self.__views[2])
+            self.stream.place_args.byteswap()
+
+        try:
+            self.__check_contents(places_end)
+        except RuntimeError:
+            self.close()
+            raise
+
+    def __check_contents(self, places_end: int) -> None:
+        """Checks the opcodes and PLACE records against each other and the header, and parses the macros.
+        """
+        opcodes = self.stream.opcodes
+        places = 0
+        macros = 0
+
+        for start in range(0, len(opcodes), _CHECK_CHUNK_SIZE):
+            chunk = bytes(opcodes[start:start + _CHECK_CHUNK_SIZE])
+
+            if chunk.translate(None, _OPCODES):
+                invalid = next(opcode for opcode in chunk if opcode not in _OPCODES)
+                raise RuntimeError(f"Invalid opcode {invalid} in binary command log: {self.path}")
+
+            places += chunk.count(CommandStream.PLACE)
+            macros += chunk.count(CommandStream.MACRO)
+
+        if places != self.place_count or macros != self.macro_count:
+            raise RuntimeError(f"Binary command log has {places} PLACEs and {macros} macros, but its header says "
+                               f"{self.place_count} and {self.macro_count}: {self.path}")
+
+        if not set(self.stream.place_args[2::3]) <= set(range(len(CommandStream.directions))):
+            raise RuntimeError(f"Invalid direction in the PLACE records of binary command log: {self.path}")
+
+        if not self.macro_count:
+            return
+
+        try:
+            lines = self.__map[places_end:].decode().split("\n")
+        except UnicodeDecodeError:
+            raise RuntimeError(f"The macros in binary command log are not valid text: {self.path}")
+
+        if len(lines) != self.macro_count + 1 or lines[-1]:
+            raise RuntimeError(f"Binary command log does not have {self.macro_count} macros: {self.path}")
+
+        for line in lines[:self.macro_count]:
+            macro, error = try_parse_command(line)
+
+            if macro is None or not CommandStream.fits(macro) or (macro.count == 1 and macro.body is None):
+                raise RuntimeError(f"Invalid macro in binary command log ({error or line}): {self.path}")
+
+            self.stream.macros.append(macro)
+
+    def __enter__(self) -> BinaryLog:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Releases the file. The stream must not be used afterwards.
+        """
+        self.stream = CommandStream()
+
+        for view in reversed(self.__views):
+            view.release()
+
+        self.__map.close()
+        self.__file.close()
+
+    @classmethod
+    def places_offset(cls, command_count: int) -> int:
+        """Offset of the PLACE records in a file with the given number of commands (aligned to 4 bytes).
+        """
+        end_of_opcodes = cls.header_format.size + command_count
+        return (end_of_opcodes + 3) // 4 * 4
+
+    @classmethod
+    def is_binary_log(cls, path: str) -> bool:
+        with open(path, "rb") as file:
+            return file.read(len(cls.MAGIC)) == cls.MAGIC
+
+    @classmethod
+    def write(cls, path: str, streams: Iterable[CommandStream], x_range: list[int], y_range: list[int]) -> int:
+        """Writes a sequence of streams out into a single binary log, returning the number of commands written.
+
+        Opcodes are written out as they come; only the (much smaller) PLACE records and macros are held in memory until
+        the end.
+        """
+        low, high = cls.coordinate_limits
+        places = array("i")
+        macros = []
+        command_count = 0
+
+        with open(path, "wb") as file:
+            file.write(bytes(cls.header_format.size))
+
+            for stream in streams:
+                file.write(stream.opcodes)
+                command_count += len(stream.opcodes)
+                places.extend(min(max(value, low), high) for value in stream.place_args)
+                macros.extend(macro.to_string() for macro in stream.macros)
+
+            file.write(bytes(cls.places_offset(command_count) - file.tell()))
+
+            if sys.byteorder != "little":
+                places.byteswap()
+            file.write(places)
+            file.write("".join(f"{macro}\n" for macro in macros).encode())
+
+            file.seek(0)
+            file.write(cls.header_format.pack(cls.MAGIC, cls.VERSION, *x_range, *y_range, command_count,
+                                              len(places) // 3, len(macros)))
+
+        logger.info(f"Wrote {command_count} commands to {path}.")
+
+        return command_count
+
+
+def read_header(path: str) -> Optional[tuple[list[int], list[int]]]:
+    """Returns the table limits a binary log was recorded for, or None if the file is not a binary log.
+    """
+    if not BinaryLog.is_binary_log(path):
+        return None
+
+    with BinaryLog(path) as log:
+        return log.x_range, log.y_range
@@ -0,0 +1,270 @@
+from typing import BinaryIO, Generator, Iterable, Optional
+from itertools import chain, compress
+import selectors
+import logging
+import mmap
+import os
+
+from command import Command, try_parse_command
+from command_stream import CommandStream
+
+logger = logging.getLogger(__name__)
+
+# Amount of input handed to the parser at a time.
+CHUNK_SIZE = 1 << 22
+
+# Number of distinct lines the parser remembers; once there are more, it starts over (on the next chunk).
+CACHE_LIMIT = 1 << 16
+
+# Markers for lines that could not be parsed, and for valid commands that do not fit in a CommandStream (GOTOs), which
+# never make it into a CommandStream.
+_INVALID = 0xFF
+_UNFIT = 0xFE
+
+
+class BulkParser:
+    """Parses large amounts of text into CommandStreams, without creating a Command object per line.
+
+    Input is handled in large byte chunks. Each chunk is split into lines in one go, and every distinct line is parsed
+    only once (with the regular parser, so that the same lines are accepted and rejected); the result is cached and
+    the opcodes of the whole chunk are then gathered with a single lookup per line. Real command files only ever
+    contain a handful of distinct lines, so after the first chunk virtually all of the work happens inside builtins.
+    (Files made of many more distinct lines, e.g. PLACEs all over a large table, are parsed just as well, but the cache
+    is only kept up to CACHE_LIMIT lines.)
+
+    Much like any other command source, parsing stops at the first line that is not a valid command. Valid commands that
+    compact streams have no room for (GOTOs) cannot be skipped without changing what the rest of the input does, so
+    they raise a RuntimeError instead (see first_unfit_line() for finding them up front).
+    """
+
+    def __init__(self):
+        # Opcode of every line seen so far, the (x, y, direction) arguments of the PLACE lines among them, and the
+        # commands of the macro lines.
+        self.__opcodes: dict[bytes, int] = {}
+        self.__place_args: dict[bytes, tuple[int, int, int]] = {}
+        self.__macros: dict[bytes, Command] = {}
+        self.__errors: dict[bytes, str] = {}
+
+    def parse_chunks(self, chunks: Iterable[bytes]) -> Generator[CommandStream, None, None]:
+        """Parses chunks of text, yielding one CommandStream per chunk.
+
+        Chunks need not end on a line break; partial lines are carried over to the next chunk.
+        """
+        remainder = b""
+        lines_so_far = 0
+
+        for chunk in chain(chunks, [None]):
+            if chunk is None:
+                # The input has run out, so whatever is left is the last line (if anything is left at all).
+                if not remainder:
+                    return
+                lines = [remainder]
+            else:
+                lines = (remainder + chunk).split(b"\n")
+                remainder = lines.pop()
+
+            stream = self.__parse_lines(lines, lines_so_far)
+
+            if stream.invalid_line is not None:
+                stream.invalid_line += lines_so_far
+                logger.info(f"Stopped reading commands at invalid line {stream.invalid_line}.")
+                yield stream
+                return
+
+            lines_so_far += len(lines)
+            yield stream
+
+    def parse_file(self, path: str) -> CommandStream:
+        """Memory-maps a file and parses all of it into a single CommandStream.
+        """
+        output = CommandStream()
+
+        for stream in self.parse_chunks(read_mapped_chunks(path)):
+            output.extend(stream)
+            output.invalid_line = stream.invalid_line
+
+        return output
+
+    def __learn(self, lines: set[bytes]) -> None:
+        """Parses (and caches) every line that has not been seen before.
+        """
+        for line in lines:
+            try:
+                command, error = try_parse_command(line.decode().removesuffix("\r"))
+            except UnicodeDecodeError:
+                command, error = None, f"Command is not valid text: {line!r}"
+
+            if command is not None and not CommandStream.fits(command):
+                self.__opcodes[line] = _UNFIT
+                continue
+
+            if command is None:
+                self.__opcodes[line] = _INVALID
+                self.__errors[line] = error
+                continue
+
+            if command.count > 1 or command.body is not None:
+                self.__opcodes[line] = CommandStream.MACRO
+                self.__macros[line] = command
+                continue
+
+            self.__opcodes[line] = CommandStream.opcode_of[command.type]
+
+            if command.type == Command.Type.PLACE:
+                self.__place_args[line] = CommandStream.place_record(command.pose)
+
+    def __forget(self) -> None:
+        self.__opcodes.clear()
+        self.__place_args.clear()
+        self.__macros.clear()
+        self.__errors.clear()
+
+    def __parse_lines(self, lines: list[bytes], lines_so_far: int) -> CommandStream:
+        try:
+            opcodes = bytes(map(self.__opcodes.get, lines))
+        except TypeError:
+            # Some lines have not been seen before (so their opcode came out as None); learn them and try again.
+            if len(self.__opcodes) > CACHE_LIMIT:
+                self.__forget()
+
+            self.__learn(set(lines).difference(self.__opcodes))
+            opcodes = bytes(map(self.__opcodes.get, lines))
+
+        stream = CommandStream()
+
+        unfit = opcodes.find(_UNFIT)
+        if unfit != -1 and _INVALID not in opcodes[:unfit]:
+            raise RuntimeError(f"Line {lines_so_far + unfit + 1}: GOTO commands cannot be run from compact streams (such "
+                               "as --input files), as there is no room for them.")
+
+        invalid = opcodes.find(_INVALID)
+        if invalid != -1:
+            logger.error(self.__errors[lines[invalid]])
+            stream.invalid_line = invalid
+            opcodes = opcodes[:invalid]
+            lines = lines[:invalid]
+
+        stream.opcodes.frombytes(opcodes)
+
+        if CommandStream.PLACE in opcodes:
+            is_place = map(CommandStream.PLACE.__eq__, opcodes)
+            stream.place_args.extend(chain.from_iterable(map(self.__place_args.get, compress(lines, is_place))))
+
+        if CommandStream.MACRO in opcodes:
+            is_macro = map(CommandStream.MACRO.__eq__, opcodes)
+            stream.macros.extend(map(self.__macros.get, compress(lines, is_macro)))
+
+        return stream
+
+
+def first_unfit_line(path: str) -> Optional[int]:
+    """Returns the number (counting from 1) of the first line of a text file that is a valid command but does not fit in
+    a CommandStream (i.e. has a GOTO in it), or None if there is no such line.
+
+    The file is memory-mapped and searched for "GOTO", so only the few lines that mention it are ever parsed.
+    """
+    with open(path, "rb") as file:
+        if file.seek(0, 2) == 0:
+            return None
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            found = data.find(b"GOTO")
+
+            while found != -1:
+                start = data.rfind(b"\n", 0, found) + 1
+                end = data.find(b"\n", found)
+                end = len(data) if end == -1 else end
+
+                try:
+                    command, _ = try_parse_command(data[start:end].decode().removesuffix("\r"))
+                except UnicodeDecodeError:
+                    command = None
+
+                if command is not None and not CommandStream.fits(command):
+                    return data[:start].count(b"\n") + 1
+
+                found = data.find(b"GOTO", end)
+
+    return None
+
+
+def read_mapped_chunks(path: str) -> Generator[bytes, None, None]:
+    """Memory-maps a file and yields it in chunks of roughly CHUNK_SIZE bytes, each ending on a line break.
+    """
+    with open(path, "rb") as file:
+        # Empty files cannot be mapped, but they do not have any chunks either.
+        if file.seek(0, 2) == 0:
+            return
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            start = 0
+
+            while start < len(data):
+                end = data.rfind(b"\n", start, start + CHUNK_SIZE) + 1
+
+                # No line break in the whole window (or at the end of the file): take everything up to the next one.
+                if end <= start:
+                    end = data.find(b"\n", start + CHUNK_SIZE) + 1 or len(data)
+
+                yield data[start:end]
+                start = end
+
+
+def read_pipe_chunks(pipe: BinaryIO) -> Generator[bytes, None, None]:
+    """Yields whatever is available from a pipe (e.g. stdin), up to CHUNK_SIZE bytes at a time, until it closes.
+    """
+    read = getattr(pipe, "read1", pipe.read)
+
+    while chunk := read(CHUNK_SIZE):
+        yield chunk
+
+
+def read_available_lines(fd: int, read_size: int = 1 << 16) -> Generator[list[bytes], None, None]:
+    """Yields the lines from a file descriptor (e.g. stdin) in batches, each of every complete line that was available
+    at once, until it closes (the last line counting even without a line break).
+
+    A selector waits for input whenever there is none, and once there is, everything that has already arrived (up to
+    CHUNK_SIZE bytes) is drained without waiting again, so a fast feed is taken in a few large batches rather than
+    line by line. Lines still have their "\r", if any.
+    """
+    selector = selectors.DefaultSelector()
+
+    try:
+        selector.register(fd, selectors.EVENT_READ)
+    except (OSError, ValueError):
+        # Regular files cannot be waited on (nor, on Windows, can anything but sockets); reads just never block then.
+        selector.close()
+        selector = None
+
+    remainder = b""
+    closed = False
+
+    try:
+        while not closed:
+            if selector is not None:
+                selector.select()
+
+            data = [remainder]
+            size = 0
+
+            while size < CHUNK_SIZE:
+                chunk = os.read(fd, read_size)
+
+                if not chunk:
+                    closed = True
+                    break
+
+                data.append(chunk)
+                size += len(chunk)
+
+                if selector is None or not selector.select(0):
+                    break
+
+            lines = b"".join(data).split(b"\n")
+            remainder = b"" if closed else lines.pop()
+
+            if lines != [b""]:
+                yield lines
+    finally:
+        if selector is not None:
+            selector.close()
@@ -3,20 +3,35 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from enum import Enum
-from typing import Optional
+from typing import Generator, Optional
 import logging
+import re
 
 from pose import Pose
 
 logger = logging.getLogger(__name__)
 
+# Commands are interned (see Pose), as are the results of parsing strings into them, up to these many entries each.
+_INTERN_LIMIT = 1 << 16
+_interned: dict = {}
+_parsed: dict = {}
 
-@dataclass
+# Robot IDs, as used to address commands to one of many robots (see parse_addressed_command).
+_ROBOT_ID = re.compile(r"[A-Za-z0-9_.\-]+")
+
+
+@dataclass(frozen=True, slots=True, init=False)
 class Command:
     """Represents a single command to be passed to the simulator.
 
-    Contains a command type and a pose. The pose will only be valid for commands of type PLACE; all other commands will
-    have their pose set to None.
+    Contains a command type and a pose. The pose will only be valid for commands of type PLACE and GOTO (where it is
+    the pose to go to); all other commands will have their pose set to None.
+
+    MOVE, LEFT and RIGHT may carry a count, standing for that many consecutive single steps, and a REPEAT command runs
+    its body (a sequence of commands without REPORTs) `count` times. Simulators can evaluate these "macro" commands
+    much faster than the equivalent sequence of single steps (as yielded by expand()), with the same result.
+
+    Commands are immutable and interned, so that each distinct command only ever exists once.
     """
 
     class Type(Enum):
@@ -28,21 +43,80 @@ class Command:
         MOVE = "MOVE",
         LEFT = "LEFT",
         RIGHT = "RIGHT",
-        REPORT = "REPORT"
+        REPORT = "REPORT",
+        REPEAT = "REPEAT",
+        GOTO = "GOTO"
 
-    def __init__(self, type: Type, pose: Optional[Pose] = None):
-        """Ensures that the object is initialised consistently, namely that pose is only valid for a PLACE command.
+    def __new__(cls, type: Type, pose: Optional[Pose] = None, count: int = 1, body: Optional[tuple[Command]] = None):
+        """Ensures that the object is initialised consistently, namely that pose is only valid for PLACE and GOTO
+        commands, counts are only given to commands that can be repeated and only REPEAT commands have a body.
         """
-        self.type = type
-        self.pose = pose
+        key = (type, pose, count, body)
+        cmd = _interned.get(key)
+
+        if cmd is not None:
+            return cmd
 
-        if self.type == Command.Type.PLACE:
+        if type in Command.posed_types:
             if pose is None:
-                raise RuntimeError("A PLACE command MUST always have a pose!")
+                raise RuntimeError(f"A {type.name} command MUST always have a pose!")
 
-        if self.type != Command.Type.PLACE:
+        if type not in Command.posed_types:
             if pose is not None:
-                raise RuntimeError("Only PLACE commands should have a pose!")
+                raise RuntimeError("Only PLACE and GOTO commands should have a pose!")
+
+        if count < 1 or (count != 1 and type not in Command.repeatable_types):
+            raise RuntimeError(f"Invalid count for a {type.name} command: {count}")
+
+        if (type == Command.Type.REPEAT) != (body is not None):
+            raise RuntimeError("REPEAT commands, and only REPEAT commands, MUST have a body!")
+
+        if body is not None and (not body or any(step.type == Command.Type.REPORT for step in body)):
+            raise RuntimeError("The body of a REPEAT command must not be empty nor contain REPORTs!")
+
+        cmd = object.__new__(cls)
+        object.__setattr__(cmd, "type", type)
+        object.__setattr__(cmd, "pose", pose)
+        object.__setattr__(cmd, "count", count)
+        object.__setattr__(cmd, "body", body)
+
+        if len(_interned) < _INTERN_LIMIT:
+            _interned[key] = cmd
+
+        return cmd
+
+    def __reduce__(self):
+        return Command, (self.type, self.pose, self.count, self.body)
+
+    @property
+    def length(self) -> int:
+        """Number of single-step commands this command stands for.
+        """
+        if self.body is None:
+            return self.count
+
+        return self.count * sum(step.length for step in self.body)
+
+    def to_string(self) -> str:
+        """Formats the command the way it is parsed (see from_string).
+        """
+        if self.body is not None:
+            return f"REPEAT {self.count} {{ {'; '.join(step.to_string() for step in self.body)} }}"
+
+        if self.pose is not None:
+            return f"{self.type.name} {self.pose.x},{self.pose.y},{self.pose.direction.name}"
+
+        return self.type.name if self.count == 1 else f"{self.type.name} {self.count}"
+
+    def expand(self) -> Generator[Command, None, None]:
+        """Yields the sequence of single-step commands this command stands for.
+        """
+        for _ in range(self.count):
+            if self.body is None:
+                yield Command(self.type, self.pose)
+            else:
+                for step in self.body:
+                    yield from step.expand()
 
     @classmethod
     def from_string(cls, raw_cmd: str) -> Command:
@@ -59,8 +133,16 @@ class Command:
 
         return cmd
 
+    # Types of command that can be given a count.
+    repeatable_types = (Type.MOVE, Type.LEFT, Type.RIGHT, Type.REPEAT)
+
+    # Types of command that carry a pose.
+    posed_types = (Type.PLACE, Type.GOTO)
+
     type: Type
     pose: Optional[Pose]
+    count: int
+    body: Optional[tuple[Command]]
 
 
 def parse_string_into_command(raw_cmd: str) -> Optional[Command]:
@@ -68,6 +150,62 @@ def parse_string_into_command(raw_cmd: str) -> Optional[Command]:
 
     In case of parsing failure, the reason for failure is logged out, and the output will be None.
     """
+    cmd, error = try_parse_command(raw_cmd)
+
+    if error is not None:
+        logger.error(error)
+
+    return cmd
+
+
+def parse_addressed_command(raw_cmd: str) -> tuple[str, Command]:
+    """Parses a command addressed to one of many robots, e.g. "r2: MOVE 3", into the robot's ID and the command.
+
+    IDs are made of letters, digits, "_", "." and "-". Raises a RuntimeError if parsing fails, and logs why.
+    """
+    addressed, error = try_parse_addressed_command(raw_cmd)
+
+    if error is not None:
+        logger.error(error)
+        raise RuntimeError(f"Could not parse command: {raw_cmd}")
+
+    return addressed
+
+
+def try_parse_addressed_command(raw_cmd: str) -> tuple[Optional[tuple[str, Command]], Optional[str]]:
+    """Parses a command addressed to one of many robots (see parse_addressed_command), without logging anything.
+
+    Returns the robot's ID and the command, and None on success, or None and the reason for failure otherwise.
+    """
+    robot, separator, rest = raw_cmd.partition(": ")
+
+    if not separator or not _ROBOT_ID.fullmatch(robot):
+        return None, f"Commands must be addressed to a robot, as in \"ID: COMMAND\": {raw_cmd}"
+
+    cmd, error = try_parse_command(rest)
+
+    return ((robot, cmd), None) if error is None else (None, error)
+
+
+def try_parse_command(raw_cmd: str) -> tuple[Optional[Command], Optional[str]]:
+    """Parses a string into a command, without logging anything.
+
+    Returns the command and None on success, or None and the reason for failure otherwise.
+    """
+    # Streams repeat the same few lines over and over, so successful parses are remembered.
+    cmd = _parsed.get(raw_cmd)
+    if cmd is not None:
+        return cmd, None
+
+    cmd, error = _try_parse_uncached(raw_cmd)
+
+    if error is None and len(_parsed) < _INTERN_LIMIT:
+        _parsed[raw_cmd] = cmd
+
+    return cmd, error
+
+
+def _try_parse_uncached(raw_cmd: str) -> tuple[Optional[Command], Optional[str]]:
     split_raw_cmd = raw_cmd.split(" ")
 
     # Parse out the command type
@@ -75,36 +213,118 @@ def parse_string_into_command(raw_cmd: str) -> Optional[Command]:
     try:
         type = Command.Type[split_raw_cmd[0]]
     except KeyError:
-        logger.error(f"Unknown command type or wrong separator in {raw_cmd}.")
-        return None
+        return None, f"Unknown command type or wrong separator in {raw_cmd}."
 
-    # Parse out the pose for a PLACE command
+    # Parse out the pose for a PLACE (or GOTO) command
     pose = None
 
-    if type == Command.Type.PLACE:
+    if type in Command.posed_types:
         if len(split_raw_cmd) != 2:
-            logger.error(f"Wrong number of parts in PLACE command: {len(split_raw_cmd)}")
-            return None
+            return None, f"Wrong number of parts in {type.name} command: {len(split_raw_cmd)}"
 
         split_params = split_raw_cmd[1].split(",")
 
         if len(split_params) != 3:
-            logger.error(f"Wrong number of arguments in PLACE command: {len(split_params)}")
-            return None
+            return None, f"Wrong number of arguments in {type.name} command: {len(split_params)}"
 
         try:
             x = int(split_params[0])
             y = int(split_params[1])
         except ValueError:
-            logger.error("Error parsing out numbers from command!")
-            return None
+            return None, "Error parsing out numbers from command!"
 
         try:
             direction = Pose.Direction[split_params[2]]
         except KeyError:
-            logger.error(f"Given direction is invalid: {split_params[2]}")
-            return None
+            return None, f"Given direction is invalid: {split_params[2]}"
 
         pose = Pose(x, y, direction)
 
-    return Command(type, pose)
+    if type == Command.Type.REPEAT:
+        return _try_parse_repeat(raw_cmd)
+
+    # Commands that can be repeated may be followed by a count. (A trailing space on its own has always been accepted.)
+    count = 1
+
+    if type in Command.repeatable_types and len(split_raw_cmd) > 1:
+        if len(split_raw_cmd) != 2:
+            return None, f"Wrong number of parts in {type.name} command: {len(split_raw_cmd)}"
+
+        if split_raw_cmd[1] != "":
+            try:
+                count = int(split_raw_cmd[1])
+            except ValueError:
+                return None, f"Error parsing out count from command: {split_raw_cmd[1]}"
+
+            if count < 1:
+                return None, f"Counts must be positive: {count}"
+
+    return Command(type, pose, count), None
+
+
+def _try_parse_repeat(raw_cmd: str) -> tuple[Optional[Command], Optional[str]]:
+    """Parses a REPEAT command, e.g. "REPEAT 3 { MOVE 2; LEFT }".
+
+    Commands in the body are separated by semicolons, and may themselves be REPEAT commands.
+    """
+    split_raw_cmd = raw_cmd.split(" ", 2)
+
+    if len(split_raw_cmd) != 3:
+        return None, f"Wrong number of parts in REPEAT command: {len(split_raw_cmd)}"
+
+    try:
+        count = int(split_raw_cmd[1])
+    except ValueError:
+        return None, f"Error parsing out count from command: {split_raw_cmd[1]}"
+
+    if count < 1:
+        return None, f"Counts must be positive: {count}"
+
+    block = split_raw_cmd[2]
+
+    if not (block.startswith("{") and block.endswith("}")):
+        return None, f"The body of a REPEAT command must be enclosed in braces: {block}"
+
+    # Split the body on the semicolons that are not inside nested blocks.
+    raw_body = []
+    depth = 0
+    start = 1
+
+    for position, character in enumerate(block[:-1]):
+        if character == "{":
+            depth += 1
+        elif character == "}":
+            depth -= 1
+        elif character == ";" and depth == 1:
+            raw_body.append(block[start:position])
+            start = position + 1
+
+        if depth < 1 and position > 0:
+            return None, f"Unbalanced braces in REPEAT command: {block}"
+
+    raw_body.append(block[start:-1])
+
+    if depth != 1:
+        return None, f"Unbalanced braces in REPEAT command: {block}"
+
+    body = []
+
+    for raw_step in raw_body:
+        # Allow for spacing around commands, and for a trailing semicolon.
+        if raw_step.strip() == "":
+            continue
+
+        step, error = try_parse_command(raw_step.strip())
+
+        if error is not None:
+            return None, f"Error in the body of a REPEAT command: {error}"
+
+        if step.type == Command.Type.REPORT:
+            return None, "The body of a REPEAT command must not contain REPORTs!"
+
+        body.append(step)
+
+    if not body:
+        return None, "The body of a REPEAT command must not be empty!"
+
+    return Command(Command.Type.REPEAT, count=count, body=tuple(body)), None
@@ -0,0 +1,135 @@
+# A class method returns an object of the class below, so we need "better" type annotations.
+from __future__ import annotations
+
+from typing import Generator, Iterable, Optional
+from array import array
+import logging
+
+from command import Command, parse_string_into_command
+from pose import Pose
+
+logger = logging.getLogger(__name__)
+
+
+class CommandStream:
+    """A compact encoding of a sequence of commands, for replaying long logs without one Command object per entry.
+
+    Each command is stored as a single opcode byte in `opcodes`. PLACE commands additionally append their x, y and
+    direction (as an index into `directions`) to `place_args`, in the same order as they appear in the stream. Macro
+    commands (counted MOVEs and turns, and REPEAT blocks; see Command) are stored whole, under a single MACRO opcode,
+    and appended to `macros` in the same way, so that simulators can evaluate them without expanding them.
+
+    Consumers only ever index and iterate over these sequences, so a stream may also be backed by other buffers, e.g.
+    memoryviews into a memory-mapped BinaryLog.
+    """
+
+    # Opcodes are kept contiguous from zero so that they can be used to index lists directly.
+    PLACE = 0
+    MOVE = 1
+    LEFT = 2
+    RIGHT = 3
+    REPORT = 4
+    MACRO = 5
+
+    opcode_of: dict[Command.Type, int] = {
+        Command.Type.PLACE: PLACE,
+        Command.Type.MOVE: MOVE,
+        Command.Type.LEFT: LEFT,
+        Command.Type.RIGHT: RIGHT,
+        Command.Type.REPORT: REPORT,
+    }
+    # (MACROs have no type of their own: the type is the macro command's.)
+    type_of: list[Command.Type] = list(opcode_of)
+
+    directions: list[Pose.Direction] = list(Pose.Direction)
+
+    # PLACE coordinates are clamped to what fits in `place_args`; no table is large enough for that to matter, so PLACEs
+    # beyond these limits are simply off the table.
+    coordinate_limits: tuple[int, int] = (-2 ** 63, 2 ** 63 - 1)
+
+    def __init__(self):
+        self.opcodes = array("B")
+        self.place_args = array("q")
+        self.macros: list[Command] = []
+
+        # Number of the first line that could not be parsed (if the stream was built from text and parsing stopped).
+        self.invalid_line: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self.opcodes)
+
+    @classmethod
+    def fits(cls, command: Command) -> bool:
+        """Whether a command can be part of a compact stream.
+
+        Where a GOTO leads depends on whether its target can be reached, which is only known when it runs, so GOTOs
+        cannot (not even in the body of a REPEAT).
+        """
+        if command.type == Command.Type.GOTO:
+            return False
+
+        return command.body is None or all(cls.fits(step) for step in command.body)
+
+    def append(self, command: Command) -> None:
+        if not self.fits(command):
+            raise RuntimeError("GOTO commands cannot be part of a compact stream.")
+
+        if command.count > 1 or command.body is not None:
+            self.opcodes.append(self.MACRO)
+            self.macros.append(command)
+            return
+
+        self.opcodes.append(self.opcode_of[command.type])
+
+        if command.type == Command.Type.PLACE:
+            self.place_args.extend(self.place_record(command.pose))
+
+    @classmethod
+    def place_record(cls, pose: Pose) -> tuple[int, int, int]:
+        """Returns the (x, y, direction) arguments a PLACE command for the given pose is stored as.
+        """
+        low, high = cls.coordinate_limits
+        return min(max(pose.x, low), high), min(max(pose.y, low), high), cls.directions.index(pose.direction)
+
+    def extend(self, other: CommandStream) -> None:
+        """Appends every command of another stream to this one.
+        """
+        self.opcodes.extend(other.opcodes)
+        self.place_args.extend(other.place_args)
+        self.macros.extend(other.macros)
+
+    def __iter__(self) -> Generator[Command, None, None]:
+        """Yields the stream back as Command objects, e.g. to drive the reference Simulator (macros as they are).
+        """
+        args = iter(self.place_args)
+        macros = iter(self.macros)
+
+        for opcode in self.opcodes:
+            if opcode == self.PLACE:
+                x, y, direction = next(args), next(args), next(args)
+                yield Command(Command.Type.PLACE, Pose(x, y, self.directions[direction]))
+            elif opcode == self.MACRO:
+                yield next(macros)
+            else:
+                yield Command(self.type_of[opcode])
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[str]) -> CommandStream:
+        """Parses lines of text into a stream.
+
+        Much like a live session, parsing stops at the first line that is not a valid command; its (zero-based) number
+        is kept in `invalid_line`.
+        """
+        stream = cls()
+
+        for line_number, line in enumerate(lines):
+            command = parse_string_into_command(line)
+
+            if command is None:
+                logger.info(f"Stopped reading commands at invalid line {line_number}.")
+                stream.invalid_line = line_number
+                break
+
+            stream.append(command)
+
+        return stream
@@ -0,0 +1,45 @@
+from typing import Callable, Optional
+
+from simulator import Simulator
+from table_simulator import TableSimulator
+from verifying_simulator import VerifyingSimulator
+from obstacle_map import ObstacleMap
+
+# Simulation engines, by the name they are selected with (e.g. main.py's --engine). An engine is anything that can be
+# called with a table's x and y ranges and obstacles, and gives back a simulator that behaves exactly like the
+# Simulator does (see VerifyingSimulator for checking that it does).
+ENGINES: dict[str, Callable] = {
+    "reference": Simulator,
+    "table": TableSimulator,
+}
+
+
+def register_engine(name: str, engine: Callable) -> None:
+    """Makes an engine selectable by name.
+    """
+    if name in ENGINES:
+        raise RuntimeError(f"There already is an engine called {name}.")
+
+    ENGINES[name] = engine
+
+
+def make_engine(name: str,
+                x_range: Optional[list[int]] = None,
+                y_range: Optional[list[int]] = None,
+                obstacles: Optional[ObstacleMap] = None,
+                verify: bool = False,
+                sample_interval: Optional[int] = None):
+    """Builds a simulator with the engine of the given name, on the given table.
+
+    If `verify` is set, the engine is checked against the reference Simulator as it runs: in lockstep, or on a window
+    of steps once every `sample_interval` steps (see VerifyingSimulator).
+    """
+    engine = ENGINES.get(name)
+
+    if engine is None:
+        raise RuntimeError(f"There is no engine called {name} (only {', '.join(ENGINES)}).")
+
+    if not verify:
+        return engine(x_range, y_range, obstacles)
+
+    return VerifyingSimulator(x_range, y_range, obstacles, engine=engine, sample_interval=sample_interval)
@@ -0,0 +1,155 @@
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+from command import Command
+from command_stream import CommandStream
+from pose import Pose
+from simulator import Simulator
+import simulator_primitives as primitives
+
+_DIRECTIONS = list(Pose.Direction)
+
+
+class FleetSimulator:
+    """Simulates a whole fleet of independent robots at once, with the same rules as the Simulator.
+
+    Instead of one Simulator (and one Pose) per robot, the fleet keeps each robot's x, y and direction in NumPy arrays,
+    one slot per robot. Commands are applied to every robot with vectorised operations: each robot may receive its own
+    command, or a single command may be broadcast to all of them.
+
+    Directions are stored as their position in Pose.Direction, with UNPLACED marking robots that have not been placed.
+    """
+
+    UNPLACED = -1
+
+    directions: list[Pose.Direction] = _DIRECTIONS
+
+    # Per-direction effect of the primitives, derived from them so that both simulators can never disagree.
+    step_x = np.array([primitives.move_forward(Pose(0, 0, direction)).x for direction in _DIRECTIONS])
+    step_y = np.array([primitives.move_forward(Pose(0, 0, direction)).y for direction in _DIRECTIONS])
+    left_of = np.array([_DIRECTIONS.index(primitives.turn_left(direction)) for direction in _DIRECTIONS],
+                       dtype=np.int8)
+    right_of = np.array([_DIRECTIONS.index(primitives.turn_right(direction)) for direction in _DIRECTIONS],
+                        dtype=np.int8)
+
+    def __init__(self, count: int, x_range: Optional[list[int]] = None, y_range: Optional[list[int]] = None):
+        self.x_range = list(x_range if x_range is not None else Simulator.x_range)
+        self.y_range = list(y_range if y_range is not None else Simulator.y_range)
+
+        self.x = np.zeros(count, dtype=np.int64)
+        self.y = np.zeros(count, dtype=np.int64)
+        self.direction = np.full(count, self.UNPLACED, dtype=np.int8)
+
+    def __len__(self) -> int:
+        return len(self.direction)
+
+    def process_command(self, command: Command) -> None:
+        """Broadcasts a single command to every robot in the fleet.
+
+        Counted MOVEs and turns are supported, REPEAT blocks are not (as they would need expanding anyway).
+        """
+        if command.type == Command.Type.REPEAT:
+            raise RuntimeError("FleetSimulator does not support REPEAT blocks; broadcast their steps instead.")
+
+        if command.type == Command.Type.GOTO:
+            raise RuntimeError("FleetSimulator does not support GOTO commands.")
+
+        opcodes = np.full(len(self), CommandStream.opcode_of[command.type], dtype=np.uint8)
+
+        if command.type == Command.Type.PLACE:
+            x, y, direction = CommandStream.place_record(command.pose)
+            self.apply(opcodes,
+                       np.full(len(self), x, dtype=np.int64),
+                       np.full(len(self), y, dtype=np.int64),
+                       np.full(len(self), direction, dtype=np.int8))
+            return
+
+        # No robot can move further in a straight line than the table is long, and four turns are no turn at all.
+        if command.type == Command.Type.MOVE:
+            repetitions = min(command.count, max(self.x_range[1] - self.x_range[0], self.y_range[1] - self.y_range[0]))
+        else:
+            repetitions = command.count % 4 if command.type in [Command.Type.LEFT, Command.Type.RIGHT] else 1
+
+        for _ in range(repetitions):
+            self.apply(opcodes)
+
+    def process_commands(self, commands: Sequence[Command]) -> None:
+        """Gives each robot its own command (the i-th command goes to the i-th robot).
+        """
+        if len(commands) != len(self):
+            raise RuntimeError(f"Expected one command per robot ({len(self)}), got {len(commands)}.")
+
+        if any(command.count > 1 or command.body is not None for command in commands):
+            raise RuntimeError("Per-robot commands must be single steps; only broadcast commands may be macros.")
+
+        opcodes = np.fromiter((CommandStream.opcode_of[command.type] for command in commands),
+                              dtype=np.uint8, count=len(commands))
+        place_x = np.zeros(len(self), dtype=np.int64)
+        place_y = np.zeros(len(self), dtype=np.int64)
+        place_direction = np.zeros(len(self), dtype=np.int8)
+
+        for index in np.flatnonzero(opcodes == CommandStream.PLACE):
+            place_x[index], place_y[index], place_direction[index] = CommandStream.place_record(commands[index].pose)
+
+        self.apply(opcodes, place_x, place_y, place_direction)
+
+    def apply(self,
+              opcodes: np.ndarray,
+              place_x: Optional[np.ndarray] = None,
+              place_y: Optional[np.ndarray] = None,
+              place_direction: Optional[np.ndarray] = None) -> None:
+        """Applies one command (given as a CommandStream opcode) to each robot.
+
+        The place_* arrays are only read for robots whose opcode is PLACE, and may be omitted if there are none.
+        REPORT opcodes leave their robots untouched; use report() to read the state of the fleet.
+        """
+        opcodes = np.asarray(opcodes)
+        placed = self.direction != self.UNPLACED
+
+        # PLACE is accepted wherever the target lies on the table, placed or not.
+        place = opcodes == CommandStream.PLACE
+        if place.any():
+            if place_x is None or place_y is None or place_direction is None:
+                raise RuntimeError("PLACE commands need place_x, place_y and place_direction!")
+
+            place &= self.__within_table(place_x, place_y)
+            self.x[place] = place_x[place]
+            self.y[place] = place_y[place]
+            self.direction[place] = place_direction[place]
+
+        # Everything else only applies to robots that were already on the table.
+        move = placed & (opcodes == CommandStream.MOVE)
+        if move.any():
+            facing = self.direction[move]
+            candidate_x = self.x[move] + self.step_x[facing]
+            candidate_y = self.y[move] + self.step_y[facing]
+            valid = self.__within_table(candidate_x, candidate_y)
+
+            moving = np.flatnonzero(move)[valid]
+            self.x[moving] = candidate_x[valid]
+            self.y[moving] = candidate_y[valid]
+
+        left = placed & (opcodes == CommandStream.LEFT)
+        self.direction[left] = self.left_of[self.direction[left]]
+
+        right = placed & (opcodes == CommandStream.RIGHT)
+        self.direction[right] = self.right_of[self.direction[right]]
+
+    def report(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns copies of the x, y and direction arrays of the whole fleet.
+
+        Robots that have not been placed have a direction of UNPLACED (and meaningless coordinates).
+        """
+        return self.x.copy(), self.y.copy(), self.direction.copy()
+
+    def pose_of(self, robot: int) -> Optional[Pose]:
+        """Returns the pose of a single robot, or None if it has not been placed.
+        """
+        if self.direction[robot] == self.UNPLACED:
+            return None
+
+        return Pose(int(self.x[robot]), int(self.y[robot]), self.directions[self.direction[robot]])
+
+    def __within_table(self, x: Union[np.ndarray, int], y: Union[np.ndarray, int]) -> np.ndarray:
+        return (self.x_range[0] <= x) & (x <= self.x_range[1]) & (self.y_range[0] <= y) & (y <= self.y_range[1])
@@ -0,0 +1,210 @@
+from typing import Callable, Optional
+from collections import deque
+from dataclasses import dataclass, field
+from itertools import islice
+from array import array
+
+from command import Command
+from command_stream import CommandStream
+from pose import Pose
+from state import State
+from simulator_events import process_collecting_changes
+import simulator_primitives as primitives
+
+# What each step did to the robot is kept as a CommandStream opcode: single moves and turns need nothing else, and
+# anything else (a PLACE, or the outcome of a macro command) is kept as a jump straight to the resulting pose. Steps
+# that left the robot where it was are kept as REPORTs, which have no effect either.
+_UNCHANGED = CommandStream.REPORT
+
+# Steps that do not start a command of their own (REPORTs, and every step along the route of a GOTO but the first) have
+# this bit set on top of their opcode, so that undoing takes back whole commands.
+_CONTINUED = 0x80
+_OPCODE_BITS = 0x7f
+
+
+@dataclass
+class _Segment:
+    """A checkpoint (the pose before the segment's first step) and what each step after it did, up to an interval's
+    worth of them.
+    """
+    start: Optional[Pose]
+    opcodes: array = field(default_factory=lambda: array("B"))
+    jumps: list[Pose] = field(default_factory=list)
+
+
+class HistoryRecorder:
+    """Records everything a simulator does, so that its pose after any step can be looked up later, and so that steps
+    can be undone.
+
+    Commands go through the recorder, which passes them on to the simulator (any engine will do) and notes down what
+    each of them did: a byte per step, plus the pose for steps that jump somewhere, such as PLACEs. Every `interval`
+    steps, a checkpoint of the pose is taken, so looking up a step only means replaying the steps since the checkpoint
+    before it; seeking takes at most `interval` steps, however long the run. A GOTO takes as many steps as its route,
+    but is undone as a single command (and REPORTs, which change nothing, are not undone on their own at all).
+
+    If `max_steps` is set, only (about) that many of the latest steps are kept, and older ones are forgotten a whole
+    interval at a time, so that memory stays bounded on runs of any length.
+    """
+
+    def __init__(self, simulator, interval: int = 1024, max_steps: Optional[int] = None):
+        if interval < 1:
+            raise RuntimeError(f"Checkpoints must be at least one step apart, not {interval}.")
+
+        self.simulator = simulator
+        self.interval = interval
+        self.max_steps = max_steps
+
+        # Segments are all `interval` steps long except for the latest one, so the step any of them starts at is known.
+        self.__segments: deque[_Segment] = deque([_Segment(simulator.robot_state)])
+        self.__first_step = 0
+        self.__steps = 0
+
+    def __len__(self) -> int:
+        """Number of steps recorded so far (including any that have been forgotten since).
+        """
+        return self.__steps
+
+    @property
+    def first_step(self) -> int:
+        """The earliest step that can still be looked up.
+        """
+        return self.__first_step
+
+    def subscribe(self, event, callback: Callable[[State], None]) -> None:
+        self.simulator.subscribe(event, callback)
+
+    def unsubscribe(self, event, callback: Callable[[State], None]) -> None:
+        self.simulator.unsubscribe(event, callback)
+
+    def process_command(self, command: Command) -> None:
+        before = self.simulator.robot_state
+
+        # The robot goes along the route of a GOTO a single step at a time, and each of them is recorded as such.
+        if command.type == Command.Type.GOTO:
+            route = process_collecting_changes(self.simulator, command)
+        else:
+            self.simulator.process_command(command)
+            route = [self.simulator.robot_state]
+
+        continued = command.type == Command.Type.REPORT
+
+        for after in route or [before]:
+            self.__record(before, after, continued)
+            before, continued = after, True
+
+    def __record(self, before: Optional[Pose], after: Optional[Pose], continued: bool) -> None:
+        """Notes down what a step did, given the pose before and after it, and whether it started a command.
+        """
+        segment = self.__segments[-1]
+
+        if len(segment.opcodes) == self.interval:
+            segment = _Segment(before)
+            self.__segments.append(segment)
+            self.__forget()
+
+        if after == before:
+            opcode = _UNCHANGED
+        elif before is not None and after == primitives.move_forward(before):
+            opcode = CommandStream.MOVE
+        elif before is not None and after.x == before.x and after.y == before.y \
+                and after.direction == primitives.turn_left(before.direction):
+            opcode = CommandStream.LEFT
+        elif before is not None and after.x == before.x and after.y == before.y \
+                and after.direction == primitives.turn_right(before.direction):
+            opcode = CommandStream.RIGHT
+        else:
+            opcode = CommandStream.PLACE
+            segment.jumps.append(after)
+
+        segment.opcodes.append(opcode | _CONTINUED if continued else opcode)
+
+        self.__steps += 1
+
+    def pose_at(self, step: int) -> Optional[Pose]:
+        """Returns the pose of the robot after `step` steps (the pose it started in for step 0), or None if it had not
+        been placed by then.
+        """
+        segment, offset = self.__locate(step)
+        pose = segment.start
+        jumps = iter(segment.jumps)
+
+        for opcode in islice(segment.opcodes, offset):
+            opcode &= _OPCODE_BITS
+
+            if opcode == CommandStream.MOVE:
+                pose = primitives.move_forward(pose)
+            elif opcode == CommandStream.LEFT:
+                pose = Pose(pose.x, pose.y, primitives.turn_left(pose.direction))
+            elif opcode == CommandStream.RIGHT:
+                pose = Pose(pose.x, pose.y, primitives.turn_right(pose.direction))
+            elif opcode == CommandStream.PLACE:
+                pose = next(jumps)
+
+        return pose
+
+    def rewind_to(self, step: int) -> None:
+        """Puts the robot back where it was after `step` steps, forgetting every step after it (so that new commands
+        are recorded from there).
+
+        The simulator is reset, and the robot PLACEd back where it was, so subscribers hear about it like any other
+        change.
+        """
+        pose = self.pose_at(step)
+        segment, offset = self.__locate(step)
+
+        while self.__segments[-1] is not segment:
+            self.__segments.pop()
+
+        opcodes = segment.opcodes[:offset]
+        del segment.jumps[opcodes.count(CommandStream.PLACE) + opcodes.count(CommandStream.PLACE | _CONTINUED):]
+        del segment.opcodes[offset:]
+        self.__steps = step
+
+        if pose != self.simulator.robot_state:
+            self.simulator.reset()
+
+            if pose is not None:
+                self.simulator.process_command(Command(Command.Type.PLACE, pose))
+
+    def undo(self, commands: int = 1) -> None:
+        """Undoes the latest commands (REPORTs aside), however many steps each of them took.
+        """
+        step = self.__steps
+
+        while commands > 0:
+            if step == self.__first_step:
+                raise RuntimeError(f"There are not enough commands in the recorded history (from step "
+                                   f"{self.__first_step} on) to undo.")
+
+            step -= 1
+            index, offset = divmod(step - self.__first_step, self.interval)
+
+            if not self.__segments[index].opcodes[offset] & _CONTINUED:
+                commands -= 1
+
+        self.rewind_to(step)
+
+    def __locate(self, step: int) -> tuple[_Segment, int]:
+        """Finds the segment a step is in, and how many of the segment's steps lead up to it.
+        """
+        if not self.__first_step <= step <= self.__steps:
+            raise RuntimeError(f"Step {step} is not in the recorded history (steps {self.__first_step} to "
+                               f"{self.__steps}).")
+
+        index, offset = divmod(step - self.__first_step, self.interval)
+
+        # The very end of a full segment is also the start of the next one, which may not exist yet.
+        if index == len(self.__segments):
+            index, offset = index - 1, self.interval
+
+        return self.__segments[index], offset
+
+    def __forget(self) -> None:
+        """Forgets the oldest steps, a segment at a time, while there are more than `max_steps` of them.
+        """
+        if self.max_steps is None:
+            return
+
+        while len(self.__segments) > 1 and self.__steps - self.__first_step - self.interval >= self.max_steps:
+            self.__segments.popleft()
+            self.__first_step += self.interval
@@ -0,0 +1,115 @@
+from dataclasses import dataclass, field
+import argparse
+import asyncio
+import logging
+import time
+
+from server import open_connection
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LoadStatistics:
+    """Results of a load test.
+    """
+    sessions: int = 0
+    requests: int = 0
+    commands: int = 0
+    elapsed: float = 0.0
+    # Round-trip times of every request, in seconds.
+    latencies: list[float] = field(default_factory=list)
+
+    def percentile(self, percent: float) -> float:
+        if not self.latencies:
+            return 0.0
+
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+    def summary(self) -> str:
+        return (f"{self.sessions} sessions, {self.requests} requests, {self.commands} commands in {self.elapsed:.2f}s "
+                f"({self.commands / max(self.elapsed, 1e-9):.0f} commands/s); latency p50 "
+                f"{self.percentile(50) * 1e3:.2f}ms, p99 {self.percentile(99) * 1e3:.2f}ms, max "
+                f"{self.percentile(100) * 1e3:.2f}ms")
+
+
+# A request drives the robot around a bit and asks where it ended up, so that every request gets exactly one line back.
+REQUEST = [
+    "MOVE",
+    "MOVE",
+    "LEFT",
+    "MOVE",
+    "RIGHT",
+    "MOVE 3",
+    "RIGHT",
+    "REPORT",
+]
+
+
+async def run_session(address: str, requests: int, statistics: LoadStatistics, pipeline: int = 1) -> None:
+    """Runs a single session against a server, sending up to `pipeline` requests before waiting for their output.
+    """
+    reader, writer = await open_connection(address)
+
+    request = ("\n".join(REQUEST) + "\n").encode("ascii")
+
+    try:
+        writer.write(b"PLACE 0,0,NORTH\n")
+
+        sent = 0
+        while sent < requests:
+            batch = min(pipeline, requests - sent)
+            start = time.perf_counter()
+
+            writer.write(request * batch)
+            await writer.drain()
+
+            for _ in range(batch):
+                if not await reader.readline():
+                    raise RuntimeError("The server closed the session unexpectedly.")
+
+            statistics.latencies.append(time.perf_counter() - start)
+            statistics.requests += batch
+            statistics.commands += batch * len(REQUEST)
+            sent += batch
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+    statistics.sessions += 1
+
+
+async def generate_load(address: str, sessions: int, requests: int, pipeline: int = 1) -> LoadStatistics:
+    """Runs many concurrent sessions against a server, and gathers statistics on how it coped.
+    """
+    statistics = LoadStatistics()
+    start = time.perf_counter()
+
+    await asyncio.gather(*(run_session(address, requests, statistics, pipeline) for _ in range(sessions)))
+
+    statistics.elapsed = time.perf_counter() - start
+
+    return statistics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load generator for a simulator server (see main.py --serve).")
+    parser.add_argument('address',
+                        help='Address of the server, as HOST:PORT or unix:PATH.')
+    parser.add_argument('--sessions',
+                        type=int,
+                        default=1000,
+                        help='Number of concurrent sessions to open.')
+    parser.add_argument('--requests',
+                        type=int,
+                        default=100,
+                        help='Number of requests (a few commands and a REPORT) to send in each session.')
+    parser.add_argument('--pipeline',
+                        type=int,
+                        default=1,
+                        help='Number of requests to send before waiting for their output.')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    logger.info(asyncio.run(generate_load(args.address, args.sessions, args.requests, args.pipeline)).summary())
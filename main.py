@@ -1,13 +1,144 @@
+from itertools import chain
 import logging
 import argparse
+import asyncio
+import sys
 
 from simulator import Simulator
+from engines import ENGINES, make_engine
+from table_simulator import TableSimulator
+from pose_space import PoseSpace
+from multi_robot_simulator import MultiRobotSimulator
+from parallel_replay import ParallelReplayer
+from batch_runner import BatchRunner
+from binary_log import BinaryLog, read_header
+from bulk_parser import first_unfit_line
+from optimizer import StreamOptimizer
+from history import HistoryRecorder
+from trajectory import TrajectoryRecorder
+from monte_carlo import CommandMix, MonteCarloEngine
+from symbolic_execution import SymbolicExecutor
+from telemetry import TelemetryPublisher
+from command_stream import CommandStream
+from obstacle_map import ObstacleMap
+from metrics import MetricsServer, SimulatorMetrics, flush_rate_limited
+from server import SimulatorServer, parse_address
+from output_sinks import SINKS
 from user_interface import UserInterface
-from command import Command
 
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.DEBUG)
+
+
+def run(simulator, interface: UserInterface, commands) -> None:
+    """Feeds every command from the source into the simulator, which lets the interface know when to report.
+    """
+    # The interface only needs to know about the state when it has to report it; subscribing to every change (e.g. for
+    # a visualisation) would work just as well, at a cost.
+    simulator.subscribe(Simulator.Event.REPORT, interface.report_state)
+
+    # Iterate over the source of commands until it has run out.
+    for command in commands:
+        simulator.process_command(command)
+
+
+def run_robots(simulator: MultiRobotSimulator, interface: UserInterface, commands) -> None:
+    """Feeds every (robot ID, command) pair from the source into a simulator of many robots; REPORTs are output along
+    with the ID of the robot they are about.
+    """
+    simulator.subscribe(Simulator.Event.REPORT, lambda state: interface.report_state(state, source=state.robot))
+
+    for robot, command in commands:
+        simulator.process_command(robot, command)
+
+
+def seek(recorder: HistoryRecorder, interface: UserInterface, commands, steps: list[int]) -> None:
+    """Records a whole run, and then outputs the pose the robot was in after each of the given steps. Steps the run
+    never got to (or has forgotten), and steps before the robot had been placed, are logged instead.
+    """
+    run(recorder, interface, commands)
+
+    for step in steps:
+        if step > len(recorder):
+            logger.error(f"Cannot seek to step {step}, as the run only took {len(recorder)} steps.")
+            continue
+
+        if step < recorder.first_step:
+            logger.error(f"Cannot seek to step {step}, as only steps from {recorder.first_step} on were kept.")
+            continue
+
+        pose = recorder.pose_at(step)
+
+        if pose is None:
+            logger.warning(f"The robot had not been placed yet after step {step}, so there is nothing to output.")
+        else:
+            interface.report_poses([pose], source=f"step {step}")
+
+
+def run_streams(simulator, interface: UserInterface, streams) -> None:
+    """Feeds compact CommandStreams into the simulator; the interface is only told about the poses to report.
+    """
+    for stream in streams:
+        interface.report_poses(simulator.run_stream(stream))
+
+
+def replay_in_parallel(path: str, jobs: int, simulator, interface: UserInterface) -> None:
+    """Replays a whole file across processes, on the simulator's table; the interface is only told about the poses to
+    report.
+    """
+    replayer = ParallelReplayer(jobs, simulator.x_range, simulator.y_range, simulator.obstacles)
+    interface.report_poses(replayer.replay(path))
+
+
+def run_batch(paths: list[str], jobs: int, simulator, interface: UserInterface) -> None:
+    """Runs every scenario file independently across processes (on simulators like the one given), reporting the
+    output of each as it completes.
+    """
+    runner = BatchRunner(jobs, type(simulator), simulator.x_range, simulator.y_range, simulator.obstacles)
+
+    for result in runner.run(paths):
+        if result.error is not None:
+            logger.error(f"Could not run scenario: {result.error}")
+
+        interface.report_poses(result.reports, source=result.path)
+
+
+def analyze_starts(executor: SymbolicExecutor, streams, max_groups: int = 64) -> None:
+    """Runs the commands from every start pose at once, and outputs where they can leave the robot, when (if ever) that
+    stops depending on the start pose, and (if there are only a few final poses) which start poses lead to each.
+    """
+    stream = CommandStream()
+    for part in streams:
+        stream.extend(part)
+
+    result = executor.run(stream)
+
+    if result.converged_at is None:
+        lines = ["The outcome depends on the start pose throughout."]
+    else:
+        lines = [f"The outcome no longer depends on the start pose after command {result.converged_at}."]
+
+    lines.append(f"Possible final poses: {len(result.final)}")
+
+    if len(result.final) <= max_groups:
+        for pose, starts in executor.groups(stream).items():
+            final = "unplaced" if pose is None else f"{pose.x},{pose.y},{pose.direction.name}"
+            lines.append(f"{final}: from {len(starts)} start poses")
+
+    sys.stdout.write("\n".join(lines) + "\n")
+
+
+def run_monte_carlo(engine: MonteCarloEngine, trials: int, seed: int, jobs: int) -> None:
+    """Runs random trials, and outputs how often commands were rejected and how many trials ended in each pose.
+    """
+    result = engine.run(trials, seed, jobs)
+
+    lines = [f"Trials: {result.trials} ({result.unplaced} never placed)",
+             f"MOVE rejections: {result.move_rejection_rate:.2%} ({result.move_rejections} of {result.moves})",
+             f"PLACE rejections: {result.place_rejection_rate:.2%} ({result.place_rejections} of {result.places})"]
+    lines += [f"{pose.x},{pose.y},{pose.direction.name}: {count}" for pose, count in result.most_common()]
+
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 if __name__ == "__main__":
@@ -15,27 +146,405 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Little toy robot simulator.")
     parser.add_argument('--live',
                         action='store_true',
-                        help='If set, the simulator will take input from stdin. If not, it will run a hard-coded test.')
+                        help='If set, the simulator will take input from stdin. If not, it will run a hard-coded test. '
+                             'Piped input is read in batches, without prompts, and invalid lines are skipped.')
+    parser.add_argument('--input',
+                        metavar='FILE',
+                        help='If set, commands are read from this file (or from stdin, if "-"), one per line, instead. '
+                             'Input is parsed in bulk, which is much faster than a live session.')
+    parser.add_argument('--batch',
+                        metavar='FILE',
+                        nargs='+',
+                        help='If set, each of these files is run as an independent scenario (starting from an unplaced '
+                             'robot), across --jobs processes. Output lines are prefixed with their scenario.')
+    parser.add_argument('--jobs',
+                        type=int,
+                        default=1,
+                        help='Number of processes to replay an --input file (or run --batch scenarios) with. Results '
+                             'are the same as a serial run.')
+    parser.add_argument('--convert',
+                        metavar='OUTPUT',
+                        help='If set, the --input commands are converted into a binary log in this file, which can '
+                             'later be replayed (much faster) by passing it as --input.')
+    parser.add_argument('--optimize',
+                        action='store_true',
+                        help='If set, commands are rewritten into the shortest equivalent stream before being '
+                             'simulated. Output is unchanged.')
+    parser.add_argument('--robots',
+                        action='store_true',
+                        help='If set, many named robots share the table, and every command (from --live or --input) is '
+                             'addressed to one of them, as in "r2: MOVE". Robots cannot occupy the same cell.')
+    parser.add_argument('--history',
+                        metavar='INTERVAL',
+                        type=int,
+                        help='If set, every command of a --live session is recorded (with a checkpoint every INTERVAL '
+                             'commands), and "UNDO" or "UNDO n" undoes the latest ones.')
+    parser.add_argument('--history-limit',
+                        metavar='STEPS',
+                        type=int,
+                        help='If set, only about this many of the latest commands are kept in the history.')
+    parser.add_argument('--seek',
+                        metavar='STEP',
+                        type=int,
+                        action='append',
+                        help='If set, the --input file is run through, and then the pose after this many steps is '
+                             'output (every command, macro commands and REPORTs included, counting as one step). May '
+                             'be given more than once.')
+    parser.add_argument('--trajectory',
+                        metavar='FILE',
+                        help='If set, the pose after every command is recorded, and the whole trajectory saved '
+                             '(compressed) into this file at the end, to be queried with TrajectoryRecorder.load().')
+    parser.add_argument('--monte-carlo',
+                        metavar='TRIALS',
+                        type=int,
+                        help='If set, this many random trials are run instead (each of --steps commands drawn from '
+                             '--mix, across --jobs processes), and the final pose of every trial and the rate at which '
+                             'commands were rejected are output. Needs NumPy.')
+    parser.add_argument('--steps',
+                        type=int,
+                        default=100,
+                        help='Number of commands in each --monte-carlo trial.')
+    parser.add_argument('--mix',
+                        metavar='MOVE,LEFT,RIGHT,PLACE',
+                        default="0.7,0.1,0.1,0.1",
+                        help='Relative probabilities of each command in --monte-carlo trials. PLACEs go anywhere on '
+                             'the table, or up to a cell beyond its edges.')
+    parser.add_argument('--seed',
+                        type=int,
+                        default=0,
+                        help='Seed of --monte-carlo trials; the same seed always gives the same results.')
+    parser.add_argument('--analyze',
+                        action='store_true',
+                        help='If set, the --input commands are run from every pose on the table at once, as if their '
+                             'start were unknown, and the final poses they can lead to (and from how many start poses) '
+                             'are output, along with when the outcome stops depending on the start.')
+    parser.add_argument('--engine',
+                        choices=list(ENGINES),
+                        default="reference",
+                        help='Simulation engine to use. "table" precomputes all transitions and is faster on long '
+                             'runs.')
+    parser.add_argument('--verify',
+                        metavar='INTERVAL',
+                        type=int,
+                        nargs='?',
+                        const=0,
+                        help='If set, the engine is checked against the reference engine as it runs, step by step, or '
+                             'if INTERVAL is given, on a window of steps once every INTERVAL steps. The first step '
+                             'at which they disagree is logged, and the exit status is 1.')
+    parser.add_argument('--table',
+                        metavar='WIDTHxHEIGHT',
+                        default=f"{Simulator.x_range[1] + 1}x{Simulator.y_range[1] + 1}",
+                        help='Size of the table, in cells.')
+    parser.add_argument('--obstacles',
+                        metavar='FILE',
+                        help='If set, cells listed in this file (one "x,y" per line) are blocked, and the robot can '
+                             'neither be placed on nor move into them.')
+    parser.add_argument('--format',
+                        choices=list(SINKS),
+                        default="short",
+                        help='Format to output REPORTs in: the short "1,2,Direction.NORTH" string, CSV, JSON lines or '
+                             'packed binary records.')
+    parser.add_argument('--log-level',
+                        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        default="WARNING",
+                        help='Least severe level of log messages to output.')
+    parser.add_argument('--metrics',
+                        metavar='HOST:PORT',
+                        help='If set, metrics are served on this address while running, at /metrics (in Prometheus\' '
+                             'text format) and at /metrics.json.')
+    parser.add_argument('--metrics-output',
+                        metavar='FILE',
+                        help='If set, metrics are written into this file at the end of the run (as JSON if its name ends '
+                             'in .json, in Prometheus\' text format otherwise).')
+    parser.add_argument('--telemetry',
+                        metavar='NAME',
+                        help='If set, every change of the robot\'s pose is published into a ring buffer in shared '
+                             'memory of this name, for other processes to follow (see telemetry.py).')
+    parser.add_argument('--serve',
+                        metavar='ADDRESS',
+                        action='append',
+                        help='If set, the simulator is served over the network instead, with one session per '
+                             'connection. ADDRESS is either HOST:PORT or unix:PATH, and may be given more than once.')
     args = parser.parse_args()
 
+    logging.basicConfig(level=args.log_level)
+
+    if args.live and args.input is not None:
+        parser.error("--live and --input cannot be used together, as commands come either from the user or a file.")
+
+    if args.batch is not None and (args.live or args.input is not None or args.optimize or args.serve is not None
+                                   or args.convert is not None):
+        parser.error("--batch cannot be used together with --live, --input, --optimize, --serve or --convert.")
+
+    if args.jobs > 1 and args.input in [None, "-"] and args.batch is None and args.monte_carlo is None:
+        parser.error("--jobs can only be used together with an --input file, --batch or --monte-carlo.")
+
+    if args.convert is not None and args.input is None:
+        parser.error("--convert can only be used together with --input.")
+
+    if args.optimize and (args.jobs > 1 or args.convert is not None):
+        parser.error("--optimize cannot be used together with --jobs or --convert.")
+
+    if args.serve is not None and (args.live or args.input is not None or args.optimize or args.trajectory is not None
+                                   or args.format != "short"):
+        parser.error("--serve cannot be used together with --live, --input, --optimize, --trajectory or --format "
+                     "(sessions always get the short format).")
+
+    if args.format == "binary" and args.batch is not None:
+        parser.error("Binary output cannot be used with --batch, as it has no room for scenario names.")
+
+    if args.robots and (not (args.live or args.input is not None) or args.batch is not None or args.jobs > 1
+                        or args.convert is not None or args.optimize or args.serve is not None
+                        or args.history is not None):
+        parser.error("--robots needs --live or --input, and cannot be used with --batch, --jobs, --convert, "
+                     "--optimize, --serve or --history.")
+
+    if args.robots and (args.engine != "reference" or args.format == "binary"):
+        parser.error("--robots only works with the reference engine, and cannot output binary records.")
+
+    if args.monte_carlo is not None and (args.live or args.input is not None or args.batch is not None
+                                         or args.serve is not None or args.robots or args.optimize
+                                         or args.verify is not None or args.trajectory is not None
+                                         or args.format != "short" or args.metrics is not None
+                                         or args.metrics_output is not None):
+        parser.error("--monte-carlo runs on its own, and cannot be used with --live, --input, --batch, --serve, "
+                     "--robots, --optimize, --verify, --trajectory, --format or metrics.")
+
+    if args.analyze and (args.input is None or args.jobs > 1 or args.convert is not None or args.optimize or args.robots
+                         or args.seek is not None or args.trajectory is not None or args.verify is not None
+                         or args.format != "short" or args.metrics is not None or args.metrics_output is not None):
+        parser.error("--analyze needs --input, and cannot be used with --jobs, --convert, --optimize, --robots, "
+                     "--seek, --trajectory, --verify, --format or metrics.")
+
+    if args.verify is not None and (args.batch is not None or args.jobs > 1 or args.convert is not None
+                                    or args.robots):
+        parser.error("--verify cannot be used together with --batch, --jobs, --convert or --robots.")
+
+    if args.telemetry is not None and (args.serve is not None or args.batch is not None or args.jobs > 1
+                                       or args.convert is not None or args.robots or args.monte_carlo is not None
+                                       or args.analyze):
+        parser.error("--telemetry cannot be used together with --serve, --batch, --jobs, --convert, --robots, "
+                     "--monte-carlo or --analyze.")
+
+    if args.verify is not None and args.verify < 0:
+        parser.error("--verify needs a positive INTERVAL, if any.")
+
+    if args.history is not None and not args.live:
+        parser.error("--history can only be used together with --live (see --seek for files).")
+
+    if args.seek is not None and (args.input is None or args.jobs > 1 or args.convert is not None or args.optimize
+                                  or args.robots):
+        parser.error("--seek can only be used together with --input, and not with --jobs, --convert, --optimize or "
+                     "--robots.")
+
+    if args.seek is not None and min(args.seek) < 0:
+        parser.error("--seek needs steps of 0 or more.")
+
+    if args.trajectory is not None and (args.jobs > 1 or args.convert is not None or args.optimize or args.robots
+                                        or args.seek is not None or args.history is not None):
+        parser.error("--trajectory cannot be used with --jobs, --convert, --optimize, --robots, --seek or --history.")
+
+    if args.format == "binary" and args.seek is not None:
+        parser.error("Binary output cannot be used with --seek, as it has no room for step numbers.")
+
+    try:
+        width, height = map(int, args.table.lower().split("x"))
+    except ValueError:
+        parser.error(f"Tables are given as WIDTHxHEIGHT, not {args.table}.")
+
+    if width < 1 or height < 1:
+        parser.error("Tables must be at least one cell wide and high.")
+
+    x_range, y_range = [0, width - 1], [0, height - 1]
+
+    if args.engine == "table" and width * height * len(PoseSpace.directions) > TableSimulator.max_poses:
+        parser.error(f"--engine table only handles tables of up to {TableSimulator.max_poses} poses (four per cell), "
+                     f"which {args.table} is too large for; use --engine reference instead.")
+    try:
+        obstacles = ObstacleMap.load(args.obstacles) if args.obstacles is not None else None
+    except (OSError, RuntimeError) as error:
+        parser.error(f"Could not load obstacles: {error}")
+
+    # Input files are run as compact streams, which have no room for GOTOs, so files with any are turned down before
+    # anything is run (rather than stopping part of the way through). Input from stdin can only be stopped on the way.
+    if args.input not in [None, "-"] and not args.robots:
+        try:
+            unfit = None if BinaryLog.is_binary_log(args.input) else first_unfit_line(args.input)
+        except OSError as error:
+            parser.error(f"Could not read {args.input}: {error}")
+
+        if unfit is not None:
+            parser.error(f"{args.input} has a GOTO on line {unfit}, which cannot be run from an --input file (there "
+                         "is no room for GOTOs in compact streams).")
+
+    measured = args.metrics is not None or args.metrics_output is not None
+
+    if measured and (args.jobs > 1 or args.batch is not None):
+        parser.error("Metrics are not collected across processes, so they cannot be used with --jobs or --batch.")
+
+    if measured and args.robots:
+        parser.error("Metrics are not collected for many robots, so they cannot be used with --robots.")
+
+    # Everything measured goes into one set of metrics, however many simulators there are.
+    metrics = SimulatorMetrics() if measured else None
+
+    if args.metrics is not None:
+        match parse_address(args.metrics):
+            case ("tcp", host, port):
+                MetricsServer(metrics, host or "localhost", port).start()
+            case _:
+                parser.error("Metrics can only be served on HOST:PORT.")
+
+    def make_simulator():
+        simulator = make_engine(args.engine, x_range, y_range, obstacles, verify=args.verify is not None,
+                                sample_interval=args.verify or None)
+        simulator.metrics = metrics
+        return simulator
+
+    if args.monte_carlo is not None:
+        try:
+            engine = MonteCarloEngine(x_range, y_range, obstacles, CommandMix.from_string(args.mix), args.steps)
+        except RuntimeError as error:
+            parser.error(str(error))
+        run_monte_carlo(engine, args.monte_carlo, args.seed, args.jobs)
+        parser.exit()
+
+    if args.analyze:
+        try:
+            analyze_starts(SymbolicExecutor(x_range, y_range, obstacles),
+                           UserInterface().get_command_streams_from_file(args.input))
+        except RuntimeError as error:
+            logger.error(f"Could not analyze the input: {error}")
+            parser.exit(1)
+        parser.exit()
+
+    if args.serve is not None:
+        try:
+            asyncio.run(SimulatorServer(make_simulator).serve_forever(args.serve))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            flush_rate_limited()
+            if args.metrics_output is not None:
+                metrics.save(args.metrics_output)
+        parser.exit()
+
     # Construct simulator and user interface, the two components we will orchestrate here.
-    simulator = Simulator()
+    simulator = make_simulator()
     interface = UserInterface()
+    interface.metrics = metrics
+
+    # Live input that is piped in (rather than typed) is read in batches, and output is flushed after each of them.
+    piped = args.live and not sys.stdin.isatty()
+
+    # Output is buffered, except in typed live sessions, where every REPORT should show up straight away.
+    interface.sink = SINKS[args.format](sys.stdout.buffer, buffer_size=0 if args.live and not piped else 1 << 16)
+
+    publisher = None
+    if args.telemetry is not None:
+        try:
+            publisher = TelemetryPublisher(args.telemetry)
+        except (FileExistsError, RuntimeError) as error:
+            parser.error(f"Could not publish telemetry into {args.telemetry}: {error}")
+        simulator.subscribe(Simulator.Event.CHANGE, publisher.publish_state)
+
+    if args.robots:
+        simulator = MultiRobotSimulator(x_range, y_range, obstacles)
+        if piped:
+            commands = interface.get_piped_robot_commands()
+        elif args.live:
+            commands = interface.get_robot_commands_from_user()
+        else:
+            commands = interface.get_robot_commands_from_file(args.input)
+        try:
+            run_robots(simulator, interface, commands)
+        finally:
+            interface.flush()
+            flush_rate_limited()
+        parser.exit()
+
+    if args.batch is not None:
+        try:
+            run_batch(args.batch, args.jobs, simulator, interface)
+        finally:
+            interface.flush()
+            flush_rate_limited()
+        parser.exit()
+
+    # Binary logs are only meaningful on the table they were recorded for.
+    if args.input not in [None, "-"] and (header := read_header(args.input)) is not None:
+        if args.jobs > 1:
+            parser.error("Binary logs cannot be replayed in parallel (nor do they need to be).")
+        if header != (simulator.x_range, simulator.y_range):
+            parser.error(f"{args.input} was recorded for a table of {header[0]} by {header[1]}, not "
+                         f"{simulator.x_range} by {simulator.y_range}.")
 
     # Select a source of commands, depending on whether this is a live session.
-    command_source = interface.get_command_from_user if args.live else interface.get_pre_coded_commands
+    if piped:
+        command_source = interface.get_piped_commands
+    elif args.live:
+        command_source = interface.get_command_from_user
+    else:
+        command_source = interface.get_pre_coded_commands
 
-    # Iterate over the source of commands until it has run out.
-    for command in command_source():
-        # The simulator does not need to process REPORT commands, as they cannot affect state.
-        if command.type != Command.Type.REPORT:
-            simulator.process_command(command)
-
-        # The interface is always told about the latest state, in case it needs to update something (e.g.
-        # visualisation).
-        current_state = simulator.get_current_state()
-        interface.update_state(current_state)
-
-        # If the command is to report, then the interface is told to do so
-        if command.type == Command.Type.REPORT:
-            interface.report_state()
+    # Recording a history means going through the recorder, rather than straight to the simulator.
+    interval = args.history or 1024
+    recorder = HistoryRecorder(simulator, interval, args.history_limit) \
+        if args.history is not None or args.seek is not None else None
+
+    try:
+        if args.convert is not None:
+            BinaryLog.write(args.convert, interface.get_command_streams_from_file(args.input), simulator.x_range,
+                            simulator.y_range)
+        elif args.jobs > 1:
+            replay_in_parallel(args.input, args.jobs, simulator, interface)
+        elif args.optimize:
+            # The optimizer works on Command objects, so input files are read back out of their compact streams.
+            if args.input is not None:
+                commands = chain.from_iterable(interface.get_command_streams_from_file(args.input))
+            else:
+                commands = command_source()
+
+            optimizer = StreamOptimizer(simulator.x_range, simulator.y_range, obstacles=simulator.obstacles)
+            run(simulator, interface, optimizer.optimize(commands))
+            logger.info(f"Optimizer statistics: {optimizer.statistics}")
+        elif args.trajectory is not None:
+            # Every step is recorded, so input files are read back out of their compact streams.
+            if args.input is not None:
+                commands = chain.from_iterable(interface.get_command_streams_from_file(args.input))
+            else:
+                commands = command_source()
+
+            trajectory = TrajectoryRecorder(simulator)
+            try:
+                run(trajectory, interface, commands)
+            finally:
+                trajectory.save(args.trajectory)
+        elif args.seek is not None:
+            seek(recorder, interface, chain.from_iterable(interface.get_command_streams_from_file(args.input)),
+                 args.seek)
+        elif args.history is not None:
+            run(recorder, interface, command_source(history=recorder))
+        elif args.input is not None and publisher is None:
+            run_streams(simulator, interface, interface.get_command_streams_from_file(args.input))
+        elif args.input is not None:
+            # Compact streams may skip events altogether, so they are read back out as commands to publish every change.
+            run(simulator, interface, chain.from_iterable(interface.get_command_streams_from_file(args.input)))
+        else:
+            run(simulator, interface, command_source())
+    except RuntimeError as error:
+        # e.g. a GOTO in input from stdin, which cannot be checked for up front.
+        logger.error(f"Stopped: {error}")
+        parser.exit(1)
+    finally:
+        interface.flush()
+        flush_rate_limited()
+
+        if publisher is not None:
+            publisher.close()
+
+    if args.metrics_output is not None:
+        metrics.save(args.metrics_output)
+
+    if args.verify is not None and simulator.divergence is not None:
+        parser.exit(1)
@@ -0,0 +1,226 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from bisect import bisect_left
+import threading
+import logging
+import weakref
+import json
+import time
+
+from command import Command
+
+logger = logging.getLogger(__name__)
+
+
+class Counter:
+    """A set of monotonically increasing counts, one per value of a single label.
+
+    Every label value is known upfront, so that the counts can be read (e.g. by the metrics endpoint, from another
+    thread) while they are being updated.
+    """
+
+    def __init__(self, name: str, help: str, label: str, values: list[str]):
+        self.name = name
+        self.help = help
+        self.label = label
+        self.values: dict[str, int] = dict.fromkeys(values, 0)
+
+    def increment(self, value: str, amount: int = 1) -> None:
+        self.values[value] += amount
+
+    def to_dict(self) -> dict:
+        return dict(self.values)
+
+    def to_prometheus(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}",
+                f"# TYPE {self.name} counter"] + \
+               [f'{self.name}{{{self.label}="{value}"}} {count}' for value, count in list(self.values.items())]
+
+
+class Histogram:
+    """A distribution of durations (in seconds), kept as counts per bucket.
+
+    Buckets are exponential, from a microsecond to about a second, which is the range a single stage of processing a
+    command can be expected to take.
+    """
+
+    buckets: list[float] = [1e-6 * 2 ** power for power in range(21)]
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+
+        # One more count than there are buckets, for everything larger than the largest one.
+        self.counts: list[int] = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def to_dict(self) -> dict:
+        return {"buckets": dict(zip(map(str, self.buckets + [float("inf")]), self.counts)),
+                "sum": self.sum,
+                "count": self.count}
+
+    def to_prometheus(self, labels: str = "") -> list[str]:
+        lines = []
+        cumulative = 0
+
+        for bound, count in zip(self.buckets + [float("inf")], list(self.counts)):
+            cumulative += count
+            bound = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{self.name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+
+        labels = f"{{{labels.rstrip(',')}}}" if labels else ""
+        lines.append(f"{self.name}_sum{labels} {self.sum}")
+        lines.append(f"{self.name}_count{labels} {self.count}")
+
+        return lines
+
+
+class SimulatorMetrics:
+    """Everything measured about a run, shared by the simulator(s) and the interface that feed it.
+
+    Components only measure anything if they have been handed a SimulatorMetrics object, so unmeasured runs do not pay
+    for it.
+    """
+
+    # Stages of processing a command that are timed.
+    stages = ["parse", "compute", "validate", "report"]
+
+    def __init__(self):
+        self.commands = Counter("simulator_commands_total", "Commands processed, by type.", "type",
+                                [command_type.name for command_type in Command.Type])
+        self.outcomes = Counter("simulator_command_outcomes_total",
+                                "Commands that (would) change the state of the robot, by whether they were accepted.",
+                                "outcome", ["accepted", "rejected"])
+        self.stage_seconds = {stage: Histogram("simulator_stage_seconds", "Time taken by each stage of a command.")
+                              for stage in self.stages}
+
+    def to_dict(self) -> dict:
+        return {
+            self.commands.name: self.commands.to_dict(),
+            self.outcomes.name: self.outcomes.to_dict(),
+            "simulator_stage_seconds": {stage: histogram.to_dict() for stage, histogram in self.stage_seconds.items()},
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self) -> str:
+        lines = self.commands.to_prometheus() + self.outcomes.to_prometheus()
+
+        lines += ["# HELP simulator_stage_seconds Time taken by each stage of a command.",
+                  "# TYPE simulator_stage_seconds histogram"]
+        for stage, histogram in self.stage_seconds.items():
+            lines += histogram.to_prometheus(f'stage="{stage}",')
+
+        return "\n".join(lines) + "\n"
+
+    def save(self, path: str) -> None:
+        """Writes the metrics out to a file, as JSON if its name ends in .json, or in Prometheus' text format otherwise.
+        """
+        with open(path, "w") as file:
+            file.write(self.to_json() if path.endswith(".json") else self.to_prometheus())
+
+
+class MetricsServer:
+    """Serves metrics over HTTP, from a background thread: /metrics in Prometheus' text format, /metrics.json as JSON.
+    """
+
+    def __init__(self, metrics: SimulatorMetrics, host: str = "localhost", port: int = 0):
+        self.metrics = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path == "/metrics":
+                    body, content_type = metrics.to_prometheus(), "text/plain; version=0.0.4"
+                elif handler.path == "/metrics.json":
+                    body, content_type = metrics.to_json(), "application/json"
+                else:
+                    handler.send_error(404)
+                    return
+
+                body = body.encode("utf-8")
+                handler.send_response(200)
+                handler.send_header("Content-Type", content_type)
+                handler.send_header("Content-Length", str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, *_):
+                # Scrapes are not worth a line each.
+                pass
+
+        self.__server = ThreadingHTTPServer((host, port), Handler)
+        self.address = self.__server.server_address
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+
+    def start(self) -> None:
+        self.__thread.start()
+        logger.info(f"Serving metrics on http://{self.address[0]}:{self.address[1]}/metrics")
+
+    def stop(self) -> None:
+        self.__server.shutdown()
+        self.__server.server_close()
+
+
+# Every RateLimitedLogger there is, so that whatever they have held back can be logged in one go.
+_rate_limited: "weakref.WeakSet[RateLimitedLogger]" = weakref.WeakSet()
+
+
+class RateLimitedLogger:
+    """Logs warnings of each kind at most once per interval, instead of once per event.
+
+    Warnings that come too soon after the latest one of their kind are only counted, and the count is added to the next
+    one that does get logged (or logged on its own by flush(), or by flush_rate_limited() for every one of them).
+    """
+
+    def __init__(self, logger: logging.Logger, interval: float = 1.0, clock=time.monotonic):
+        self.logger = logger
+        self.interval = interval
+        self.clock = clock
+
+        self.__next_allowed: dict[str, float] = {}
+        self.__suppressed: dict[str, int] = {}
+        self.__latest: dict[str, str] = {}
+
+        _rate_limited.add(self)
+
+    def warning(self, kind: str, message: str) -> None:
+        if not self.logger.isEnabledFor(logging.WARNING):
+            return
+
+        now = self.clock()
+
+        if now < self.__next_allowed.get(kind, now):
+            self.__suppressed[kind] = self.__suppressed.get(kind, 0) + 1
+            self.__latest[kind] = message
+            return
+
+        suppressed = self.__suppressed.pop(kind, 0)
+        if suppressed:
+            message += f" ({suppressed} more like this since the last one.)"
+
+        self.logger.warning(message)
+        self.__next_allowed[kind] = now + self.interval
+
+    def flush(self) -> None:
+        """Logs how many warnings of each kind have been held back since they were last logged.
+        """
+        for kind, suppressed in self.__suppressed.items():
+            self.logger.warning(f"{self.__latest[kind]} (And {suppressed} more like this, which were not logged.)")
+
+        self.__suppressed.clear()
+        self.__latest.clear()
+        self.__next_allowed.clear()
+
+
+def flush_rate_limited() -> None:
+    """Flushes every RateLimitedLogger. Nothing is flushed at exit, so applications call this once they are done (see
+    main.py), and only the warnings of the run at hand get summarised, at the end of its own output.
+    """
+    for rate_limited in list(_rate_limited):
+        rate_limited.flush()
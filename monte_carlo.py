@@ -0,0 +1,242 @@
+# A class method returns an object of the class below, so we need "better" type annotations.
+from __future__ import annotations
+
+from typing import Optional
+from dataclasses import dataclass
+from multiprocessing import Pool
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from command_stream import CommandStream
+from obstacle_map import ObstacleMap
+from pose import Pose
+from pose_space import PoseSpace
+from simulator import Simulator
+
+# Every worker process builds its own engine (and transition tables) once, when the pool starts.
+_engine: Optional[MonteCarloEngine] = None
+
+# The kinds of command a trial is given, in the order of the CommandMix.
+_KINDS = [CommandStream.MOVE, CommandStream.LEFT, CommandStream.RIGHT, CommandStream.PLACE]
+_MOVE, _PLACE = _KINDS.index(CommandStream.MOVE), _KINDS.index(CommandStream.PLACE)
+
+
+@dataclass(frozen=True)
+class CommandMix:
+    """How likely each kind of command is to be given at any one step of a trial.
+
+    Probabilities are relative, so they need not add up to one. PLACEs go anywhere on the table, or up to
+    `place_margin` cells beyond its edges (where they are rejected), facing any way.
+    """
+    move: float = 0.7
+    left: float = 0.1
+    right: float = 0.1
+    place: float = 0.1
+    place_margin: int = 1
+
+    @classmethod
+    def from_string(cls, text: str) -> CommandMix:
+        """Parses a mix given as MOVE,LEFT,RIGHT,PLACE probabilities, e.g. "0.7,0.1,0.1,0.1".
+        """
+        try:
+            move, left, right, place = map(float, text.split(","))
+        except ValueError:
+            raise RuntimeError(f"Command mixes are given as MOVE,LEFT,RIGHT,PLACE probabilities, not {text}.")
+
+        return cls(move, left, right, place)
+
+
+@dataclass
+class MonteCarloResult:
+    """Where the robot ended up over a number of trials, and how often its commands were rejected along the way.
+    """
+    x_range: list[int]
+    y_range: list[int]
+    # Number of trials that ended in each pose, indexed by x and y (from the corner of the table) and direction (as its
+    # position in Pose.Direction).
+    histogram: np.ndarray
+    # Number of trials in which the robot was never (validly) placed.
+    unplaced: int = 0
+    # MOVEs given to a robot on the table, and how many of them were rejected for leading off it (or into an obstacle).
+    moves: int = 0
+    move_rejections: int = 0
+    # PLACEs given, and how many of them were rejected.
+    places: int = 0
+    place_rejections: int = 0
+
+    @property
+    def trials(self) -> int:
+        return int(self.histogram.sum()) + self.unplaced
+
+    @property
+    def move_rejection_rate(self) -> float:
+        return self.move_rejections / self.moves if self.moves else 0.0
+
+    @property
+    def place_rejection_rate(self) -> float:
+        return self.place_rejections / self.places if self.places else 0.0
+
+    def merge(self, other: MonteCarloResult) -> None:
+        """Adds another result (for the same table) into this one.
+        """
+        self.histogram += other.histogram
+        self.unplaced += other.unplaced
+        self.moves += other.moves
+        self.move_rejections += other.move_rejections
+        self.places += other.places
+        self.place_rejections += other.place_rejections
+
+    def most_common(self, count: Optional[int] = None) -> list[tuple[Pose, int]]:
+        """Returns the final poses of the trials, and how many trials ended in each, most common first.
+        """
+        order = np.argsort(self.histogram, axis=None, kind="stable")[::-1]
+        order = order[self.histogram.flat[order] > 0][:count]
+        cells = zip(*np.unravel_index(order, self.histogram.shape))
+
+        return [(Pose(int(x) + self.x_range[0], int(y) + self.y_range[0], PoseSpace.directions[direction]),
+                 int(self.histogram.flat[index])) for (x, y, direction), index in zip(cells, order)]
+
+
+class MonteCarloEngine:
+    """Runs many random trials at once, each of them a robot given `steps` random commands (drawn from a CommandMix)
+    from a given start pose (unplaced, by default).
+
+    Trials are run in batches of `batch_size`, with the pose of every trial of a batch kept as its index into the
+    PoseSpace, in a NumPy array. Every step draws a command per trial and looks all of them up at once in the
+    PoseSpace's transition tables (which are derived from the same primitives, and reject the same moves, as the
+    Simulator), so a batch costs a handful of array operations per step, however many trials there are in it.
+
+    Each batch draws its commands from its own random generator, seeded with the seed of the run and the batch's
+    number. Results only depend on the seed, then, whether batches are run one after the other or across processes.
+    """
+
+    batch_size: int = 1 << 16
+
+    def __init__(self,
+                 x_range: Optional[list[int]] = None,
+                 y_range: Optional[list[int]] = None,
+                 obstacles: Optional[ObstacleMap] = None,
+                 mix: CommandMix = CommandMix(),
+                 steps: int = 100,
+                 start: Optional[Pose] = None):
+        if np is None:
+            raise RuntimeError("Monte Carlo runs need NumPy (pip install numpy).")
+
+        probabilities = [mix.move, mix.left, mix.right, mix.place]
+        if min(probabilities) < 0 or sum(probabilities) <= 0:
+            raise RuntimeError(f"Command mixes need non-negative probabilities, not all zero: {probabilities}")
+
+        self.x_range = list(x_range if x_range is not None else Simulator.x_range)
+        self.y_range = list(y_range if y_range is not None else Simulator.y_range)
+        self.obstacles = obstacles
+        self.mix = mix
+        self.steps = steps
+        self.start = start
+
+        self.pose_space = PoseSpace(self.x_range, self.y_range, obstacles)
+        self.__start_index = self.pose_space.index_of(start)
+        if self.__start_index is None:
+            raise RuntimeError(f"Trials cannot start off the table: {start}")
+
+        # Commands are drawn by how many of the cumulative probabilities a uniform number is past.
+        self.__thresholds = [float(threshold) for threshold in np.cumsum(probabilities[:-1]) / sum(probabilities)]
+
+        # One row of transitions per kind of command, one after the other, so that a kind and a pose index make an
+        # index into them. (The PLACE row is never used, as PLACEs do not depend on where the robot is.)
+        dtype = np.int32 if 4 * (self.pose_space.size + 1) < 1 << 31 else np.int64
+        self.__tables = np.zeros((len(_KINDS), self.pose_space.size + 1), dtype=dtype)
+        for kind, opcode in enumerate(_KINDS):
+            if opcode != CommandStream.PLACE:
+                self.__tables[kind] = self.pose_space.transition_table(CommandStream.type_of[opcode])
+
+        self.__free = np.ones((self.pose_space.width, self.pose_space.height), dtype=bool)
+        for x, y in obstacles or ():
+            if self.x_range[0] <= x <= self.x_range[1] and self.y_range[0] <= y <= self.y_range[1]:
+                self.__free[x - self.x_range[0], y - self.y_range[0]] = False
+
+    def run(self, trials: int, seed: int = 0, jobs: int = 1) -> MonteCarloResult:
+        """Runs the given number of trials, across `jobs` processes (if more than one).
+        """
+        batches = [(seed, batch, min(self.batch_size, trials - batch * self.batch_size))
+                   for batch in range(-(-trials // self.batch_size))]
+        result = self.__empty_result()
+
+        if jobs <= 1:
+            for batch in batches:
+                result.merge(self.run_batch(*batch))
+            return result
+
+        initargs = (self.x_range, self.y_range, self.obstacles, self.mix, self.steps, self.start, self.batch_size)
+
+        with Pool(jobs, initializer=_init_worker, initargs=initargs) as pool:
+            for batch_result in pool.imap_unordered(_run_batch, batches):
+                result.merge(batch_result)
+
+        return result
+
+    def run_batch(self, seed: int, batch: int, trials: int) -> MonteCarloResult:
+        """Runs one batch of trials, with the generator for the given seed and batch number.
+        """
+        rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(batch,)))
+        space = self.pose_space
+        tables = self.__tables.ravel()
+        stride = self.__tables.shape[1]
+        unplaced = space.unplaced
+        result = self.__empty_result()
+
+        poses = np.full(trials, self.__start_index, dtype=tables.dtype)
+        margin = self.mix.place_margin
+
+        for _ in range(self.steps):
+            draws = rng.random(trials)
+            kinds = (draws >= self.__thresholds[0]).astype(tables.dtype)
+            for threshold in self.__thresholds[1:]:
+                kinds += draws >= threshold
+
+            candidates = tables[kinds * stride + poses]
+
+            moving = (kinds == _MOVE) & (poses != unplaced)
+            result.moves += int(np.count_nonzero(moving))
+            result.move_rejections += int(np.count_nonzero(moving & (candidates == poses)))
+
+            placing = np.flatnonzero(kinds == _PLACE)
+            if len(placing):
+                x = rng.integers(-margin, space.width + margin, len(placing))
+                y = rng.integers(-margin, space.height + margin, len(placing))
+                direction = rng.integers(0, len(space.directions), len(placing))
+
+                valid = (0 <= x) & (x < space.width) & (0 <= y) & (y < space.height)
+                valid[valid] = self.__free[x[valid], y[valid]]
+
+                candidates[placing[valid]] = (x[valid] * space.height + y[valid]) * 4 + direction[valid]
+                # PLACEs that are rejected leave the robot where it was (placed or not).
+                candidates[placing[~valid]] = poses[placing[~valid]]
+                result.places += len(placing)
+                result.place_rejections += int(np.count_nonzero(~valid))
+
+            poses = candidates
+
+        counts = np.bincount(poses, minlength=unplaced + 1)
+        result.histogram += counts[:unplaced].reshape(result.histogram.shape)
+        result.unplaced += int(counts[unplaced])
+
+        return result
+
+    def __empty_result(self) -> MonteCarloResult:
+        return MonteCarloResult(self.x_range, self.y_range,
+                                np.zeros((self.pose_space.width, self.pose_space.height, 4), dtype=np.int64))
+
+
+def _init_worker(x_range: list[int], y_range: list[int], obstacles: Optional[ObstacleMap], mix: CommandMix, steps: int,
+                 start: Optional[Pose], batch_size: int) -> None:
+    global _engine
+
+    _engine = MonteCarloEngine(x_range, y_range, obstacles, mix, steps, start)
+    _engine.batch_size = batch_size
+
+
+def _run_batch(batch: tuple[int, int, int]) -> MonteCarloResult:
+    return _engine.run_batch(*batch)
@@ -0,0 +1,171 @@
+from typing import Optional
+import logging
+
+from command import Command
+from state import State
+from pose import Pose
+from simulator import Simulator
+from simulator_events import SimulatorEvents
+from metrics import RateLimitedLogger
+from obstacle_map import ObstacleMap, cell_key
+import simulator_primitives as primitives
+
+logger = logging.getLogger(__name__)
+
+# Collisions can come by the million too (see Simulator).
+rejections = RateLimitedLogger(logger)
+
+
+class MultiRobotSimulator(SimulatorEvents):
+    """Simulates many named robots sharing one table, where no two robots can ever be in the same cell.
+
+    Each robot follows exactly the same rules as in the Simulator (which does the actual simulating, one robot at a
+    time), and other robots are simply one more thing it cannot be placed on nor move into: a MOVE n stops right before
+    the first robot in its way, just as it would before an obstacle.
+
+    Which robot is in each cell is kept in a hash map from (packed) cells to robot IDs, updated whenever a robot is
+    placed or moves, so checking a cell for collisions takes constant time however many robots there are. Memory grows
+    with the number of robots rather than with the size of the table.
+
+    Events carry the State of the robot that the latest command was addressed to (with its ID in State.robot).
+    """
+
+    def __init__(self,
+                 x_range: Optional[list[int]] = None,
+                 y_range: Optional[list[int]] = None,
+                 obstacles: Optional[ObstacleMap] = None):
+        super().__init__()
+
+        self.__physics = Simulator(x_range, y_range, obstacles)
+        self.x_range = self.__physics.x_range
+        self.y_range = self.__physics.y_range
+        self.obstacles = self.__physics.obstacles
+
+        # Where every robot that has been placed is, and which robot is in every occupied cell.
+        self.__robots: dict[str, Pose] = {}
+        self.__occupancy: dict[int, str] = {}
+
+        # The robot the latest command was addressed to.
+        self.__current: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self.__robots)
+
+    def process_command(self, robot: str, command: Command) -> None:
+        """Processes a command addressed to one robot (robots need no introducing; a PLACE is enough).
+        """
+        self.__current = robot
+
+        if command.type == Command.Type.REPORT:
+            if robot in self.__robots:
+                self._notify(MultiRobotSimulator.Event.REPORT)
+            return
+
+        if command.type == Command.Type.REPEAT:
+            self.__repeat(robot, command)
+            return
+
+        # Paths are planned around obstacles, but not around other robots, which keep moving.
+        if command.type == Command.Type.GOTO:
+            rejections.warning("goto", "GOTO commands are not supported on shared tables, so it has been ignored.")
+            return
+
+        # The robot is first simulated on its own, as if the table was empty, and only then checked against the others.
+        start = self.__robots.get(robot)
+        physics = self.__physics
+        physics.robot_state = start
+        physics.process_command(command)
+        end = physics.robot_state
+
+        if end is start or (start is not None and end.x == start.x and end.y == start.y):
+            self.__move(robot, start, end)
+            return
+
+        if command.type == Command.Type.MOVE and command.count > 1:
+            # Every cell along the way has to be free, not just the last one.
+            pose = start
+            distance = abs(end.x - start.x) + abs(end.y - start.y)
+            steps = 0
+
+            while steps < distance:
+                step = primitives.move_forward(pose)
+
+                if cell_key(step.x, step.y) in self.__occupancy:
+                    break
+
+                pose = step
+                steps += 1
+
+            if steps < distance:
+                rejections.warning("collision", f"{distance - steps} of {command.count} steps would run into "
+                                                "another robot, so they have been ignored.")
+                end = pose
+        elif self.__occupancy.get(cell_key(end.x, end.y), robot) != robot:
+            rejections.warning("collision", "Latest command would run into another robot, so it has been ignored.")
+            return
+
+        self.__move(robot, start, end)
+
+    def reset(self) -> None:
+        """Takes every robot off the table (subscribers are kept, and are not notified).
+        """
+        self.__robots.clear()
+        self.__occupancy.clear()
+        self.__current = None
+
+    def pose_of(self, robot: str) -> Optional[Pose]:
+        """Returns the pose of a robot, or None if it has not been placed.
+        """
+        return self.__robots.get(robot)
+
+    def robot_at(self, x: int, y: int) -> Optional[str]:
+        """Returns the ID of the robot in a cell, or None if the cell is free.
+        """
+        return self.__occupancy.get(cell_key(x, y))
+
+    def get_current_state(self) -> State:
+        pose = self.__robots.get(self.__current)
+
+        if pose is None:
+            raise RuntimeError("The simulator was asked to output a state before initialisation!")
+
+        return State(pose, self.__current)
+
+    def __move(self, robot: str, start: Optional[Pose], end: Optional[Pose]) -> None:
+        """Moves a robot to its new pose, keeping the occupancy map up to date and letting subscribers know.
+        """
+        if end == start:
+            return
+
+        if start is not None:
+            del self.__occupancy[cell_key(start.x, start.y)]
+
+        self.__occupancy[cell_key(end.x, end.y)] = robot
+        self.__robots[robot] = end
+        self._notify(MultiRobotSimulator.Event.CHANGE)
+
+    def __repeat(self, robot: str, command: Command) -> None:
+        """Runs the body of a REPEAT command for one robot, skipping whole cycles (see Simulator).
+
+        Other robots stay put while it runs, so where the robot ends up still only depends on where it started each
+        repetition.
+        """
+        seen: dict[Optional[Pose], int] = {}
+        iteration = 0
+
+        while iteration < command.count:
+            pose = self.__robots.get(robot)
+
+            if pose in seen:
+                cycle = iteration - seen[pose]
+                iteration += (command.count - iteration) // cycle * cycle
+
+                if iteration == command.count:
+                    break
+
+            seen[pose] = iteration
+
+            for step in command.body:
+                self.process_command(robot, step)
+
+            iteration += 1
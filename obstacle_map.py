@@ -0,0 +1,171 @@
+# A class method returns an object of the class below, so we need "better" type annotations.
+from __future__ import annotations
+
+from typing import Iterable, Optional
+from bisect import bisect_left, bisect_right
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Cells are kept as single integers, with x in the high bits and y in the low 32 (which is as far as coordinates go
+# anywhere in this project; see BinaryLog).
+_Y_BITS = 32
+_Y_MASK = (1 << _Y_BITS) - 1
+_Y_LIMITS = (-(1 << (_Y_BITS - 1)), (1 << (_Y_BITS - 1)) - 1)
+
+# A line of an obstacle map (without its line break), and a whole map. Most maps are written just like save() writes
+# them, which can be checked much faster than the general case, so such lines are skipped over first.
+_LINE = rb"[ \t\r]*(?:-?[0-9]+[ \t]*,[ \t]*-?[0-9]+[ \t\r]*)?"
+_MAP = re.compile(rb"(?:" + _LINE + rb"\n)*" + _LINE)
+_SAVED_LINES = re.compile(rb"(?:-?[0-9]+,-?[0-9]+\n)*")
+
+
+def cell_key(x: int, y: int) -> int:
+    """Packs a cell into the single integer it is kept as (so that other sets of cells can share the layout).
+
+    Raises a RuntimeError if y does not fit in 32 bits, as the cell would then share its key with another one.
+    """
+    if not _Y_LIMITS[0] <= y <= _Y_LIMITS[1]:
+        raise RuntimeError(f"Cells can only lie at y from {_Y_LIMITS[0]} to {_Y_LIMITS[1]}, not at {y}.")
+
+    return x << _Y_BITS | y & _Y_MASK
+
+
+class ObstacleMap:
+    """A sparse set of blocked cells on the table.
+
+    Cells are stored in a hash set, so checking whether a cell is blocked takes constant time, and memory grows with
+    the number of obstacles rather than with the area of the table. Obstacles can lie anywhere, on the table or not
+    (those off the table simply never matter), as long as their y fits in 32 bits (see cell_key).
+
+    For moving several steps at once, the obstacles on each row and column are also indexed in sorted order, so that
+    the nearest one ahead can be found without walking every cell in between. That index is only built when first
+    needed.
+    """
+
+    def __init__(self, cells: Iterable[tuple[int, int]] = ()):
+        self.__cells: set[int] = {cell_key(x, y) for x, y in cells}
+
+        # Goes up whenever obstacles are added, so that anything derived from the map knows when to start over.
+        self.version = 0
+
+        # Sorted x of the obstacles on each row, and y of the obstacles on each column (built on demand).
+        self.__rows: Optional[dict[int, list[int]]] = None
+        self.__columns: Optional[dict[int, list[int]]] = None
+
+    def __len__(self) -> int:
+        return len(self.__cells)
+
+    def __iter__(self):
+        for cell in self.__cells:
+            yield cell >> _Y_BITS, _signed_y(cell & _Y_MASK)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ObstacleMap) and self.__cells == other.__cells
+
+    def add(self, x: int, y: int) -> None:
+        self.__cells.add(cell_key(x, y))
+        self.__rows = self.__columns = None
+        self.version += 1
+
+    def blocked(self, x: int, y: int) -> bool:
+        # No obstacle can lie beyond what cell_key can pack.
+        return _Y_LIMITS[0] <= y <= _Y_LIMITS[1] and cell_key(x, y) in self.__cells
+
+    def free_steps(self, x: int, y: int, step_x: int, step_y: int, limit: int) -> int:
+        """Counts how many (up to `limit`) steps can be taken from a cell, in the given unit direction, before running
+        into an obstacle.
+        """
+        if not self.__cells:
+            return limit
+
+        if self.__rows is None:
+            self.__build_index()
+
+        if step_y == 0:
+            line, position, step = self.__rows.get(y), x, step_x
+        else:
+            line, position, step = self.__columns.get(x), y, step_y
+
+        if not line:
+            return limit
+
+        if step > 0:
+            index = bisect_right(line, position)
+            return limit if index == len(line) else min(limit, line[index] - position - 1)
+
+        index = bisect_left(line, position) - 1
+        return limit if index < 0 else min(limit, position - line[index] - 1)
+
+    def __build_index(self) -> None:
+        rows: dict[int, list[int]] = {}
+        columns: dict[int, list[int]] = {}
+
+        for x, y in self:
+            rows.setdefault(y, []).append(x)
+            columns.setdefault(x, []).append(y)
+
+        for line in rows.values():
+            line.sort()
+        for line in columns.values():
+            line.sort()
+
+        self.__rows, self.__columns = rows, columns
+
+    @classmethod
+    def load(cls, path: str) -> ObstacleMap:
+        """Loads obstacles from a text file, with one "x,y" cell per line (anything after a "#" being a comment, and blank
+        lines being allowed).
+
+        The whole file is read, checked and tokenised in one go, rather than line by line, so that maps with millions of
+        obstacles load in a matter of seconds. Raises a RuntimeError, naming the first line that is not a valid cell,
+        if there is one.
+        """
+        with open(path, "rb") as file:
+            data = file.read()
+
+        # Comments are only stripped if there are any, as that is much slower than not.
+        if b"#" in data:
+            data = re.sub(rb"#[^\n]*", b"", data)
+
+        if not _MAP.fullmatch(data, _SAVED_LINES.match(data).end()):
+            raise RuntimeError(f"Obstacle maps may only contain x,y pairs, one per line, unlike line "
+                               f"{_first_invalid_line(data)}: {path}")
+
+        numbers = list(map(int, data.replace(b",", b" ").split()))
+
+        if numbers and not (_Y_LIMITS[0] <= min(numbers[1::2]) and max(numbers[1::2]) <= _Y_LIMITS[1]):
+            raise RuntimeError(f"Obstacles can only lie at y from {_Y_LIMITS[0]} to {_Y_LIMITS[1]}, unlike on line "
+                               f"{_first_invalid_line(data)}: {path}")
+
+        obstacles = cls()
+        coordinates = iter(numbers)
+        obstacles.__cells = {x << _Y_BITS | y & _Y_MASK for x, y in zip(coordinates, coordinates)}
+
+        logger.info(f"Loaded {len(obstacles)} obstacles from {path}.")
+
+        return obstacles
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as file:
+            file.writelines(f"{x},{y}\n" for x, y in self)
+
+
+def _first_invalid_line(data: bytes) -> int:
+    """Finds the (one-based) number of the first line of an obstacle map that is not a valid cell.
+    """
+    for number, line in enumerate(data.split(b"\n"), 1):
+        if not re.fullmatch(_LINE, line):
+            return number
+
+        if line.strip() and not _Y_LIMITS[0] <= int(line.split(b",")[1]) <= _Y_LIMITS[1]:
+            return number
+
+    raise RuntimeError("Every line of the obstacle map is valid.")
+
+
+def _signed_y(y: int) -> int:
+    """Recovers a (possibly negative) y from its low 32 bits.
+    """
+    return y - (1 << _Y_BITS) if y >> (_Y_BITS - 1) else y
@@ -0,0 +1,158 @@
+from typing import Generator, Iterable, Optional
+from dataclasses import dataclass
+
+from command import Command
+from obstacle_map import ObstacleMap
+from pose import Pose
+from simulator import Simulator
+import simulator_primitives as primitives
+
+
+@dataclass
+class OptimizerStatistics:
+    """Keeps count of what the optimizer did to a stream.
+    """
+    commands_in: int = 0
+    commands_out: int = 0
+
+    # Commands dropped because the robot had not been placed yet (REPORTs included, as they have nothing to report).
+    before_placement: int = 0
+    # PLACEs that could never be accepted, as they are outside the table (or on an obstacle).
+    invalid_placements: int = 0
+    # Commands dropped because a later PLACE made them irrelevant before anything was REPORTed.
+    overwritten: int = 0
+    # Turns that cancelled out, or were folded into a neighbouring turn or PLACE.
+    turns_removed: int = 0
+    # MOVEs folded into a neighbouring MOVE.
+    moves_merged: int = 0
+    # Commands dropped after the last REPORT (only if the final state need not be kept).
+    trailing: int = 0
+
+    @property
+    def eliminated(self) -> int:
+        return self.commands_in - self.commands_out
+
+
+class StreamOptimizer:
+    """Rewrites a stream of commands into a shorter one that produces exactly the same REPORTs.
+
+    The optimizer sits between a source of commands and a simulator. It never simulates anything itself; it only
+    applies rules that hold whatever the state of the robot:
+
+    * until the first valid PLACE, nothing but PLACE has any effect (and REPORTs have nothing to report);
+    * a PLACE outside the table (or onto an obstacle) is always rejected;
+    * a valid PLACE makes everything since the latest REPORT irrelevant;
+    * consecutive turns add up (four of them being no turn at all), and turning right after a PLACE is the same as
+      placing the robot facing the other way;
+    * consecutive MOVEs add up into a single counted MOVE.
+
+    Commands are held back until the next REPORT (or the end of the stream), as a later PLACE may still make them
+    irrelevant. REPEAT blocks are passed through untouched.
+    """
+
+    def __init__(self,
+                 x_range: Optional[list[int]] = None,
+                 y_range: Optional[list[int]] = None,
+                 keep_final_state: bool = True,
+                 obstacles: Optional[ObstacleMap] = None):
+        self.x_range = list(x_range if x_range is not None else Simulator.x_range)
+        self.y_range = list(y_range if y_range is not None else Simulator.y_range)
+        self.obstacles = obstacles
+
+        # If the state at the very end of the stream does not matter, everything after the last REPORT can go too.
+        self.keep_final_state = keep_final_state
+
+        self.statistics = OptimizerStatistics()
+
+    def optimize(self, commands: Iterable[Command]) -> Generator[Command, None, None]:
+        """Yields the optimised equivalent of the given commands.
+        """
+        statistics = self.statistics
+        placed = False
+
+        # Commands since the latest REPORT, already simplified as far as they can be.
+        pending: list[Command] = []
+
+        for command in commands:
+            statistics.commands_in += 1
+
+            if command.type == Command.Type.PLACE and not self.__within_table(command.pose):
+                statistics.invalid_placements += 1
+                continue
+
+            if not placed:
+                if command.type == Command.Type.PLACE or _may_place(command):
+                    placed = True
+                else:
+                    statistics.before_placement += 1
+                    continue
+
+            if command.type == Command.Type.REPORT:
+                pending.append(command)
+                statistics.commands_out += len(pending)
+                yield from pending
+                pending.clear()
+            elif command.type == Command.Type.PLACE:
+                statistics.overwritten += len(pending)
+                pending.clear()
+                pending.append(command)
+            elif command.type in [Command.Type.LEFT, Command.Type.RIGHT]:
+                self.__turn(pending, command)
+            elif command.type == Command.Type.MOVE and pending and pending[-1].type == Command.Type.MOVE:
+                pending[-1] = Command(Command.Type.MOVE, count=pending[-1].count + command.count)
+                statistics.moves_merged += 1
+            else:
+                pending.append(command)
+
+        if self.keep_final_state:
+            statistics.commands_out += len(pending)
+            yield from pending
+        else:
+            statistics.trailing += len(pending)
+
+    def __turn(self, pending: list[Command], command: Command) -> None:
+        """Adds a turn to the pending commands, combining it with the one before if possible.
+        """
+        # Turns are counted as a number of left turns, between 0 and 3.
+        quarter_turns = command.count if command.type == Command.Type.LEFT else -command.count
+        previous = pending[-1] if pending else None
+
+        if previous is not None and previous.type == Command.Type.PLACE:
+            direction = previous.pose.direction
+            for _ in range(quarter_turns % 4):
+                direction = primitives.turn_left(direction)
+
+            pending[-1] = Command(Command.Type.PLACE, Pose(previous.pose.x, previous.pose.y, direction))
+            self.statistics.turns_removed += 1
+            return
+
+        if previous is not None and previous.type in [Command.Type.LEFT, Command.Type.RIGHT]:
+            previous_quarter_turns = previous.count if previous.type == Command.Type.LEFT else -previous.count
+            quarter_turns += previous_quarter_turns
+            pending.pop()
+            self.statistics.turns_removed += 1
+
+        match quarter_turns % 4:
+            case 0:
+                self.statistics.turns_removed += 1
+            case 1:
+                pending.append(Command(Command.Type.LEFT))
+            case 2:
+                pending.append(Command(Command.Type.LEFT, count=2))
+            case 3:
+                pending.append(Command(Command.Type.RIGHT))
+
+    def __within_table(self, pose: Pose) -> bool:
+        if self.obstacles is not None and self.obstacles.blocked(pose.x, pose.y):
+            return False
+
+        return self.x_range[0] <= pose.x <= self.x_range[1] and self.y_range[0] <= pose.y <= self.y_range[1]
+
+
+def _may_place(command: Command) -> bool:
+    """Determines whether a command could place the robot (i.e. it is, or is a REPEAT block containing, a PLACE).
+    """
+    if command.body is None:
+        return command.type == Command.Type.PLACE
+
+    return any(_may_place(step) for step in command.body)
@@ -0,0 +1,158 @@
+# Sinks return themselves as context managers, so we need "better" type annotations.
+from __future__ import annotations
+
+from typing import BinaryIO, Iterable, Optional
+from abc import ABC, abstractmethod
+import struct
+import json
+
+from command_stream import CommandStream
+from pose import Pose
+
+# Records are cached per pose (and source), but only up to this many of them (see Pose).
+_RECORD_LIMIT = 1 << 16
+
+
+class OutputSink(ABC):
+    """Writes REPORTed poses out to a binary stream, in some format, a buffer at a time.
+
+    Records are collected until there are at least `buffer_size` bytes of them, and then written out (and the stream
+    flushed) all at once, so that output costs about one write per buffer rather than one per REPORT. A buffer size of
+    zero writes every record straight away, as an interactive session needs.
+
+    Poses are interned, and the same few of them are REPORTed over and over, so each record is only formatted once.
+    Subclasses implement format() (and header(), if the format has one).
+    """
+
+    def __init__(self, stream: BinaryIO, buffer_size: int = 1 << 16):
+        self.stream = stream
+        self.buffer_size = buffer_size
+
+        self.__buffer: list[bytes] = []
+        self.__buffered = 0
+        self.__records: dict = {}
+        self.__started = False
+
+    def __enter__(self) -> OutputSink:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.flush()
+
+    def write(self, pose: Pose, source: Optional[str] = None) -> None:
+        """Writes out a pose, and optionally where it came from (e.g. the scenario it was REPORTed by).
+        """
+        key = pose if source is None else (source, pose)
+        record = self.__records.get(key)
+
+        if record is None:
+            record = self.format(pose, source)
+
+            if len(self.__records) < _RECORD_LIMIT:
+                self.__records[key] = record
+
+        if not self.__started:
+            self.__started = True
+            record = self.header(source is not None) + record
+
+        self.__buffer.append(record)
+        self.__buffered += len(record)
+
+        if self.__buffered >= self.buffer_size:
+            self.flush()
+
+    def write_many(self, poses: Iterable[Pose], source: Optional[str] = None) -> None:
+        for pose in poses:
+            self.write(pose, source)
+
+    def flush(self) -> None:
+        if self.__buffer:
+            self.stream.write(b"".join(self.__buffer))
+            self.__buffer.clear()
+            self.__buffered = 0
+
+        self.stream.flush()
+
+    def header(self, with_source: bool) -> bytes:
+        """Anything that goes before the first record.
+        """
+        return b""
+
+    @abstractmethod
+    def format(self, pose: Pose, source: Optional[str]) -> bytes:
+        """The record for a pose (and where it came from, if anywhere).
+        """
+
+
+class ShortSink(OutputSink):
+    """The original output format, one Pose.to_short_string per line (e.g. "1,2,Direction.NORTH").
+    """
+
+    def format(self, pose: Pose, source: Optional[str]) -> bytes:
+        line = pose.to_short_string()
+
+        if source is not None:
+            line = f"{source}: {line}"
+
+        return (line + "\n").encode("utf-8")
+
+
+class CsvSink(OutputSink):
+    """Comma-separated values, with a header (e.g. "1,2,NORTH").
+    """
+
+    def header(self, with_source: bool) -> bytes:
+        return b"source,x,y,direction\n" if with_source else b"x,y,direction\n"
+
+    def format(self, pose: Pose, source: Optional[str]) -> bytes:
+        line = f"{pose.x},{pose.y},{_direction_names[pose.direction]}\n"
+
+        if source is not None:
+            # Only sources need quoting, as they could be any file name.
+            if any(character in source for character in ',"\r\n'):
+                source = '"' + source.replace('"', '""') + '"'
+
+            line = f"{source},{line}"
+
+        return line.encode("utf-8")
+
+
+class JsonlSink(OutputSink):
+    """One JSON object per line (e.g. {"x": 1, "y": 2, "direction": "NORTH"}).
+    """
+
+    def format(self, pose: Pose, source: Optional[str]) -> bytes:
+        record = {"x": pose.x, "y": pose.y, "direction": _direction_names[pose.direction]}
+
+        if source is not None:
+            record = {"source": source, **record}
+
+        return (json.dumps(record) + "\n").encode("utf-8")
+
+
+class BinarySink(OutputSink):
+    """Packed records of two little-endian int32 (x, y) and a byte (direction, as in CommandStream), with no header.
+
+    Records have no room for a source, so they can only be written for a single one.
+    """
+
+    record_format = struct.Struct("<iiB")
+
+    def format(self, pose: Pose, source: Optional[str]) -> bytes:
+        if source is not None:
+            raise RuntimeError("Binary output cannot record where poses came from.")
+
+        return self.record_format.pack(pose.x, pose.y, _direction_numbers[pose.direction])
+
+
+# Output formats that can be selected from the command line.
+SINKS: dict[str, type] = {
+    "short": ShortSink,
+    "csv": CsvSink,
+    "jsonl": JsonlSink,
+    "binary": BinarySink,
+}
+
+_direction_names: dict[Pose.Direction, str] = {direction: direction.name for direction in Pose.Direction}
+_direction_numbers: dict[Pose.Direction, int] = {direction: number
+                                                  for number, direction in enumerate(CommandStream.directions)}
@@ -0,0 +1,237 @@
+from typing import Generator, Optional
+from dataclasses import dataclass
+from multiprocessing import Pool
+from array import array
+import os
+
+from bulk_parser import BulkParser
+from obstacle_map import ObstacleMap
+from command_stream import CommandStream
+from pose import Pose
+from pose_space import PoseSpace, TransitionTables
+from simulator import Simulator
+
+# Every worker process builds its own transition tables once, when the pool starts.
+_space: Optional[PoseSpace] = None
+_transitions: Optional[TransitionTables] = None
+_tables: list[Optional[list[int]]] = []
+
+# How often (in commands) the set of candidate states is de-duplicated while composing a chunk.
+_DEDUPLICATION_PERIOD = 256
+
+
+@dataclass
+class ChunkSummary:
+    """Everything the coordinating process needs to know about a chunk of the input after the first pass.
+
+    A chunk is a function from the pose it starts in to the pose it ends in. Until its first valid PLACE, that function
+    is kept as `mapping` (indexed by start pose); from that PLACE onwards the chunk no longer depends on where it
+    started, so `mapping` is None, `final` holds its end pose and `reports` holds every pose REPORTed after the PLACE.
+    Only the `prefix_length` commands before the PLACE need to be replayed once the start pose is known, and only if
+    `prefix_has_reports`.
+    """
+    mapping: Optional[list[int]]
+    final: int
+    prefix_length: int
+    prefix_has_reports: bool
+    reports: array
+    stopped: bool
+
+
+def _init_worker(x_range: list[int], y_range: list[int], obstacles: Optional[ObstacleMap]) -> None:
+    global _space, _transitions, _tables
+
+    _space = PoseSpace(x_range, y_range, obstacles)
+    _transitions = TransitionTables(_space)
+    _tables = [None, _transitions.move, _transitions.left, _transitions.right, None]
+
+
+def _read_chunk(path: str, start: int, end: int) -> CommandStream:
+    """Reads and parses the lines between two byte offsets (which always sit right after a line break).
+    """
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+
+    # A last line with no line break comes out as a stream of its own, so everything is gathered up (see parse_file).
+    output = CommandStream()
+
+    for stream in BulkParser().parse_chunks([data]):
+        output.extend(stream)
+        output.invalid_line = stream.invalid_line
+
+    return output
+
+
+def _summarise_chunk(path: str, start: int, end: int) -> ChunkSummary:
+    """First pass: composes the chunk into a function over all start poses.
+    """
+    stream = _read_chunk(path, start, end)
+    opcodes, place_args = stream.opcodes, stream.place_args
+    macros = iter(stream.macros)
+
+    # Until the first valid PLACE, track every start pose at once. `slots` holds the distinct poses the robot could be
+    # in, and `owner` maps each start pose onto its slot; poses that merge (e.g. against an edge) share a slot.
+    slots = list(range(_space.size + 1))
+    owner = list(range(_space.size + 1))
+    prefix_has_reports = False
+    next_place = 0
+    position = 0
+
+    for position, opcode in enumerate(opcodes):
+        if opcode == CommandStream.PLACE:
+            state = _space.index_at(*place_args[next_place:next_place + 3])
+            next_place += 3
+
+            if state is not None:
+                break
+        elif opcode == CommandStream.REPORT:
+            prefix_has_reports = True
+        else:
+            if opcode == CommandStream.MACRO:
+                macro = next(macros)
+                slots = [_transitions.run(slot, macro)[0] for slot in slots]
+            else:
+                table = _tables[opcode]
+                slots = [table[slot] for slot in slots]
+
+            if position % _DEDUPLICATION_PERIOD == 0:
+                distinct = {}
+                renumbering = [distinct.setdefault(slot, len(distinct)) for slot in slots]
+                owner = [renumbering[slot] for slot in owner]
+                slots = list(distinct)
+    else:
+        # No valid PLACE at all: the whole chunk depends on its start pose.
+        return ChunkSummary(mapping=[slots[slot] for slot in owner],
+                            final=-1,
+                            prefix_length=len(opcodes),
+                            prefix_has_reports=prefix_has_reports,
+                            reports=array("I"),
+                            stopped=stream.invalid_line is not None)
+
+    # From the first valid PLACE onwards there is a single, known state.
+    prefix_length = position
+    reports = array("I")
+
+    for opcode in opcodes[prefix_length + 1:]:
+        if opcode == CommandStream.PLACE:
+            candidate = _space.index_at(*place_args[next_place:next_place + 3])
+            next_place += 3
+
+            if candidate is not None:
+                state = candidate
+        elif opcode == CommandStream.REPORT:
+            reports.append(state)
+        elif opcode == CommandStream.MACRO:
+            state = _transitions.run(state, next(macros))[0]
+        else:
+            state = _tables[opcode][state]
+
+    return ChunkSummary(mapping=None,
+                        final=state,
+                        prefix_length=prefix_length,
+                        prefix_has_reports=prefix_has_reports,
+                        reports=reports,
+                        stopped=stream.invalid_line is not None)
+
+
+def _replay_prefix(path: str, start: int, end: int, prefix_length: int, state: int) -> array:
+    """Second pass: replays the start of a chunk (up to its first valid PLACE) from a known pose, collecting REPORTs.
+    """
+    stream = _read_chunk(path, start, end)
+    macros = iter(stream.macros)
+    reports = array("I")
+
+    # The prefix contains no valid PLACE by construction, so only pose-dependent commands and REPORTs matter. Macros
+    # may still PLACE the robot, so it can be placed part of the way through even if it starts off unplaced.
+    for opcode in stream.opcodes[:prefix_length]:
+        if opcode == CommandStream.REPORT:
+            if state != _space.unplaced:
+                reports.append(state)
+        elif opcode == CommandStream.MACRO:
+            state = _transitions.run(state, next(macros))[0]
+        elif opcode != CommandStream.PLACE:
+            state = _tables[opcode][state]
+
+    return reports
+
+
+def split_file(path: str, chunks: int) -> list[tuple[int, int]]:
+    """Splits a file into (at most) the given number of byte ranges, each of them made up of whole lines.
+    """
+    size = os.path.getsize(path)
+    boundaries = [0]
+
+    with open(path, "rb") as file:
+        for chunk in range(1, chunks):
+            file.seek(max(size * chunk // chunks, boundaries[-1]))
+            file.readline()
+            boundaries.append(min(file.tell(), size))
+
+    boundaries.append(size)
+
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end]
+
+
+class ParallelReplayer:
+    """Replays a (long) command file across several processes, with the same results as a serial run.
+
+    Every command, and thus every chunk of commands, is a function over the finite set of poses (see PoseSpace). The
+    file is split into chunks that are composed into such functions in parallel; a quick scan over the composed chunks
+    then gives the pose each chunk starts in, after which the REPORT output of every chunk is known.
+
+    As with any other command source, the replay stops at the first line that is not a valid command. Unlike the
+    simulators, rejected commands are not logged, as that would defeat the purpose.
+    """
+
+    # Chunks per worker; more chunks balance the load better, at the cost of more coordination.
+    chunks_per_job: int = 8
+
+    def __init__(self,
+                 jobs: int,
+                 x_range: Optional[list[int]] = None,
+                 y_range: Optional[list[int]] = None,
+                 obstacles: Optional[ObstacleMap] = None):
+        self.jobs = jobs
+        self.x_range = list(x_range if x_range is not None else Simulator.x_range)
+        self.y_range = list(y_range if y_range is not None else Simulator.y_range)
+        self.obstacles = obstacles
+        self.pose_space = PoseSpace(self.x_range, self.y_range, obstacles)
+
+        # The state of the robot at the end of the latest replay.
+        self.robot_state: Optional[Pose] = None
+
+    def replay(self, path: str) -> Generator[Pose, None, None]:
+        """Yields every pose REPORTed by the file, in order.
+        """
+        ranges = split_file(path, self.jobs * self.chunks_per_job)
+
+        with Pool(self.jobs, initializer=_init_worker, initargs=(self.x_range, self.y_range, self.obstacles)) as pool:
+            summaries = pool.starmap(_summarise_chunk, [(path, start, end) for start, end in ranges])
+
+            # Scan through the composed chunks to find out where each of them starts.
+            state = self.pose_space.unplaced
+            starts = []
+
+            for summary in summaries:
+                starts.append(state)
+                state = summary.final if summary.mapping is None else summary.mapping[state]
+
+                if summary.stopped:
+                    break
+
+            # Chunks that REPORT before their first valid PLACE still need to be replayed from their start pose. (This
+            # includes chunks that start off unplaced, as a macro in the prefix may yet PLACE the robot.)
+            prefixes = {index: pool.apply_async(_replay_prefix, (path, *ranges[index], summary.prefix_length, start))
+                        for index, (summary, start) in enumerate(zip(summaries, starts))
+                        if summary.prefix_has_reports}
+
+            for index in range(len(starts)):
+                if index in prefixes:
+                    for report in prefixes[index].get():
+                        yield self.pose_space.pose_at(report)
+
+                for report in summaries[index].reports:
+                    yield self.pose_space.pose_at(report)
+
+        self.robot_state = self.pose_space.pose_at(state)
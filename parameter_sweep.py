@@ -0,0 +1,227 @@
+from typing import Iterable, Optional, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+
+from command import Command
+from command_stream import CommandStream
+from fleet_simulator import FleetSimulator
+from pose import Pose
+
+
+@dataclass(frozen=True)
+class SweepConfiguration:
+    """One of the tables a stream is swept across, and where the robot starts on it (unplaced, if None).
+    """
+    x_range: tuple[int, int]
+    y_range: tuple[int, int]
+    start: Optional[Pose] = None
+
+
+def configuration_grid(sizes: Iterable[tuple[int, int]],
+                       starts: Iterable[Optional[Pose]] = (None,)) -> list[SweepConfiguration]:
+    """Returns every combination of a table size (as WIDTH, HEIGHT, with the origin in the corner) and a start.
+    """
+    starts = list(starts)
+    return [SweepConfiguration((0, width - 1), (0, height - 1), start) for width, height in sizes for start in starts]
+
+
+@dataclass
+class SweepResult:
+    """What became of the robot in each configuration (the i-th entry of every array being the i-th configuration's).
+
+    Directions are positions in Pose.Direction, with FleetSimulator.UNPLACED where the robot is not on the table.
+    REPORTs are kept as one row per REPORT in the stream (if they were kept at all), including for configurations in
+    which the robot had not been placed by then.
+    """
+    configurations: list[SweepConfiguration]
+    x: np.ndarray
+    y: np.ndarray
+    direction: np.ndarray
+    report_x: Optional[np.ndarray] = None
+    report_y: Optional[np.ndarray] = None
+    report_direction: Optional[np.ndarray] = None
+
+    def final_pose(self, configuration: int) -> Optional[Pose]:
+        """Returns where the robot ended up in a configuration, or None if it was never placed.
+        """
+        return _pose(self.x[configuration], self.y[configuration], self.direction[configuration])
+
+    def reports(self, configuration: int) -> list[Pose]:
+        """Returns the poses a configuration REPORTed, just as a Simulator on its table would have.
+        """
+        if self.report_direction is None:
+            raise RuntimeError("REPORTs were not kept for this sweep.")
+
+        placed = np.flatnonzero(self.report_direction[:, configuration] != FleetSimulator.UNPLACED)
+        return [_pose(self.report_x[row, configuration], self.report_y[row, configuration],
+                      self.report_direction[row, configuration]) for row in placed]
+
+
+class ParameterSweep:
+    """Runs one command stream on many tables (and from many starting poses) at once, with the same rules as the
+    Simulator.
+
+    Like the FleetSimulator, every configuration keeps the robot's x, y and direction in one slot of a NumPy array, but
+    as every configuration runs the same stream, each step is a handful of operations over whole arrays. Runs of steps
+    are also taken in one go: a run of turns is a single rotation, and a run of MOVEs is a single step clipped to each
+    table (the robot stops at the edge, and stays there), so sweeping a thousand configurations takes about as many
+    array operations as there are runs in the stream. Counted MOVEs and turns are runs of their own, and REPEAT blocks
+    skip whole cycles of repetitions once every configuration comes round to where it was at the start of an earlier
+    repetition (see Simulator).
+
+    Tables have no obstacles, as a run of MOVEs could not be clipped to them.
+    """
+
+    def __init__(self, configurations: Sequence[SweepConfiguration]):
+        self.configurations = list(configurations)
+
+        self.x_min = np.array([configuration.x_range[0] for configuration in self.configurations], dtype=np.int64)
+        self.x_max = np.array([configuration.x_range[1] for configuration in self.configurations], dtype=np.int64)
+        self.y_min = np.array([configuration.y_range[0] for configuration in self.configurations], dtype=np.int64)
+        self.y_max = np.array([configuration.y_range[1] for configuration in self.configurations], dtype=np.int64)
+
+        # Turning left k times over, for k from 0 to 3 (a RIGHT being three LEFTs). Tables are indexed with directions,
+        # so UNPLACED (-1) picks the last entry, which keeps the robot unplaced.
+        self.__turned = [np.append(np.arange(len(FleetSimulator.directions), dtype=np.int8), FleetSimulator.UNPLACED)]
+        for _ in range(3):
+            self.__turned.append(np.append(FleetSimulator.left_of[self.__turned[-1][:-1]], FleetSimulator.UNPLACED))
+
+        # No run of MOVEs takes the robot any further than the longest side of any of the tables.
+        self.__longest_side = int(max(np.max(self.x_max - self.x_min, initial=0),
+                                      np.max(self.y_max - self.y_min, initial=0)))
+
+    def run(self, stream: CommandStream, keep_reports: bool = True) -> SweepResult:
+        """Runs the stream in every configuration.
+
+        REPORTs take a row of three arrays each (of one entry per configuration), so on long streams with many REPORTs
+        and configurations, `keep_reports` can be turned off to keep only the final poses.
+        """
+        count = len(self.configurations)
+        x = np.zeros(count, dtype=np.int64)
+        y = np.zeros(count, dtype=np.int64)
+        direction = np.full(count, FleetSimulator.UNPLACED, dtype=np.int8)
+
+        # Robots start where their configuration says, if that is on its table (and unplaced otherwise).
+        starts = np.array([CommandStream.place_record(configuration.start) if configuration.start is not None
+                           else (0, 0, FleetSimulator.UNPLACED) for configuration in self.configurations],
+                          dtype=np.int64).reshape(count, 3)
+        start_x, start_y, start_direction = starts.T
+
+        placed = (start_direction != FleetSimulator.UNPLACED) & self.__within_table(start_x, start_y)
+        x[placed], y[placed], direction[placed] = start_x[placed], start_y[placed], start_direction[placed]
+
+        result = SweepResult(self.configurations, x, y, direction)
+
+        if keep_reports:
+            report_rows = bytes(stream.opcodes).count(CommandStream.REPORT)
+            result.report_x = np.empty((report_rows, count), dtype=np.int64)
+            result.report_y = np.empty((report_rows, count), dtype=np.int64)
+            result.report_direction = np.empty((report_rows, count), dtype=np.int8)
+
+        place_args = stream.place_args
+        macros = iter(stream.macros)
+        next_place = 0
+        next_report = 0
+
+        # Where robots that have not been placed are is neither here nor there, so they are moved (and clipped) along
+        # with everyone else, rather than masked out every time.
+        for opcode, start, stop, turns in self.__runs(stream):
+            if opcode == CommandStream.PLACE:
+                place_x, place_y, place_direction = place_args[next_place:next_place + 3]
+                next_place += 3
+
+                self.__place(place_x, place_y, place_direction, x, y, direction)
+            elif opcode == CommandStream.MOVE:
+                self.__move(stop - start, x, y, direction)
+            elif opcode == CommandStream.MACRO:
+                self.__run_macro(next(macros), x, y, direction)
+            elif opcode == CommandStream.REPORT:
+                if keep_reports:
+                    rows = slice(next_report, next_report + stop - start)
+                    result.report_x[rows], result.report_y[rows], result.report_direction[rows] = x, y, direction
+                    next_report += stop - start
+            elif turns:
+                direction[:] = self.__turned[turns][direction]
+
+        return result
+
+    def __place(self, place_x: int, place_y: int, place_direction: int, x, y, direction) -> None:
+        place = self.__within_table(place_x, place_y)
+        x[place], y[place], direction[place] = place_x, place_y, place_direction
+
+    def __move(self, steps: int, x, y, direction) -> None:
+        steps = min(steps, self.__longest_side)
+        x += FleetSimulator.step_x[direction] * steps
+        y += FleetSimulator.step_y[direction] * steps
+        np.minimum(np.maximum(x, self.x_min, out=x), self.x_max, out=x)
+        np.minimum(np.maximum(y, self.y_min, out=y), self.y_max, out=y)
+
+    def __run_macro(self, command: Command, x, y, direction) -> None:
+        """Runs a command (on its own, or as part of a REPEAT body) in every configuration, updating the arrays in place.
+        """
+        if command.type == Command.Type.PLACE:
+            self.__place(*CommandStream.place_record(command.pose), x, y, direction)
+        elif command.type == Command.Type.MOVE:
+            self.__move(command.count, x, y, direction)
+        elif command.type == Command.Type.LEFT:
+            direction[:] = self.__turned[command.count % 4][direction]
+        elif command.type == Command.Type.RIGHT:
+            direction[:] = self.__turned[-command.count % 4][direction]
+        elif command.type == Command.Type.REPEAT:
+            seen: dict[bytes, int] = {}
+            iteration = 0
+
+            while iteration < command.count:
+                state = x.tobytes() + y.tobytes() + direction.tobytes()
+
+                if state in seen:
+                    cycle = iteration - seen[state]
+                    iteration += (command.count - iteration) // cycle * cycle
+
+                    if iteration == command.count:
+                        break
+
+                seen[state] = iteration
+
+                for step in command.body:
+                    self.__run_macro(step, x, y, direction)
+
+                iteration += 1
+        else:
+            raise RuntimeError(f"Parameter sweeps cannot run {command.type.name} commands.")
+
+    def __runs(self, stream: CommandStream) -> list[tuple[int, int, int, int]]:
+        """Splits the stream into runs of the same kind of step (PLACEs and MACROs on their own), as (opcode, start,
+        stop, turns).
+
+        LEFTs and RIGHTs make up runs of turns together, with `turns` being how many LEFTs (from 0 to 3) they add up to.
+        """
+        opcodes = np.frombuffer(stream.opcodes, dtype=np.uint8)
+
+        if not len(opcodes):
+            return []
+
+        kinds = np.where(opcodes == CommandStream.RIGHT, CommandStream.LEFT, opcodes)
+        changes = (kinds[1:] != kinds[:-1]) | (kinds[1:] == CommandStream.PLACE) | (kinds[1:] == CommandStream.MACRO)
+        starts = np.flatnonzero(np.concatenate(([True], changes)))
+        stops = np.append(starts[1:], len(opcodes))
+
+        lefts = np.concatenate(([0], np.cumsum((opcodes == CommandStream.LEFT).astype(np.int64) -
+                                               (opcodes == CommandStream.RIGHT))))
+        turns = (lefts[stops] - lefts[starts]) % 4
+
+        return list(zip(kinds[starts].tolist(), starts.tolist(), stops.tolist(), turns.tolist()))
+
+    def __within_table(self, x, y) -> np.ndarray:
+        """Tells, per configuration, whether (x, y) is on its table (x and y being either one point, or one per
+        configuration).
+        """
+        return (self.x_min <= x) & (x <= self.x_max) & (self.y_min <= y) & (y <= self.y_max)
+
+
+def _pose(x, y, direction) -> Optional[Pose]:
+    if direction == FleetSimulator.UNPLACED:
+        return None
+
+    return Pose(int(x), int(y), FleetSimulator.directions[direction])
@@ -0,0 +1,266 @@
+from typing import Optional
+from collections import OrderedDict
+from array import array
+import heapq
+import logging
+
+from command import Command
+from pose import Pose
+from pose_space import PoseSpace
+import simulator_primitives as primitives
+
+logger = logging.getLogger(__name__)
+
+_DIRECTIONS = PoseSpace.directions
+
+# Direction numbers (see PoseSpace) after turning, and the step forward in each direction.
+_left_of = [_DIRECTIONS.index(primitives.turn_left(direction)) for direction in _DIRECTIONS]
+_right_of = [_DIRECTIONS.index(primitives.turn_right(direction)) for direction in _DIRECTIONS]
+_steps = [(step.x, step.y) for step in (primitives.move_forward(Pose(0, 0, direction)) for direction in _DIRECTIONS)]
+
+
+class PathPlanner:
+    """Finds the shortest sequence of MOVEs and turns that takes the robot from one pose to another on a table.
+
+    Every MOVE, LEFT and RIGHT counts as one step. Paths are found with a breadth-first search backwards from the
+    target, which gives the distance from every pose on the table to that target at once (its "distance field").
+    Fields are cached per target (up to `cache_size` of them, and no more than `max_cached_poses` poses' worth, least
+    recently used first out), so once a target has been planned for, finding out whether and how it can be reached from
+    anywhere takes a single lookup per step.
+
+    Fields cover every pose on the table, so on tables with more than `max_field_poses` poses, paths are instead
+    searched for one at a time with A*, giving up after `max_expansions` poses (in which case `gave_up` is set, as
+    there may well be a path all the same).
+
+    Fields only hold for the table they were built on: they are dropped whenever obstacles are added to it (and a
+    simulator builds a new planner whenever its table changes size).
+    """
+
+    cache_size: int = 16
+    # At four bytes per pose, this keeps the cache to 64MB, i.e. four fields of the largest size.
+    max_cached_poses: int = 1 << 24
+    max_field_poses: int = 1 << 22
+    max_expansions: int = 1 << 20
+
+    def __init__(self, pose_space: PoseSpace):
+        self.pose_space = pose_space
+
+        self.__fields: OrderedDict[int, array] = OrderedDict()
+        self.__obstacles_version = self.__current_obstacles_version()
+
+        # Whether the latest search gave up before finding out if there was a path (rather than finding there was none).
+        self.gave_up = False
+
+    def distance(self, start: Pose, target: Pose) -> Optional[int]:
+        """Returns the number of steps it takes to get from one pose to another, or None if it cannot be done (or
+        either pose is not on the table).
+        """
+        self.gave_up = False
+        start_index = self.pose_space.index_of(start)
+        target_index = self.pose_space.index_of(target)
+
+        if start_index is None or target_index is None or start_index == self.pose_space.unplaced:
+            return None
+
+        return self.distance_between(start_index, target_index)
+
+    def distance_between(self, start: int, target: int) -> Optional[int]:
+        """Same as distance(), but between pose indices (see PoseSpace), which must be on the table.
+        """
+        self.gave_up = False
+
+        if self.pose_space.size > self.max_field_poses:
+            path = self.__search(start, target)
+            return None if path is None else len(path) - 1
+
+        distance = self.__field(target)[start]
+        return None if distance < 0 else distance
+
+    def plan(self, start: Pose, target: Pose) -> Optional[list[Command]]:
+        """Returns the shortest sequence of commands from one pose to another (runs of MOVEs and of turns folded into
+        counted commands), or None if there is none.
+        """
+        self.gave_up = False
+        start_index = self.pose_space.index_of(start)
+        target_index = self.pose_space.index_of(target)
+
+        if start_index is None or target_index is None or start_index == self.pose_space.unplaced:
+            return None
+
+        if self.pose_space.size > self.max_field_poses:
+            path = self.__search(start_index, target_index)
+        else:
+            path = self.__descend(start_index, target_index)
+
+        if path is None:
+            return None
+
+        commands: list[Command] = []
+
+        for before, after in zip(path, path[1:]):
+            if after // 4 != before // 4:
+                command_type = Command.Type.MOVE
+            elif after % 4 == _left_of[before % 4]:
+                command_type = Command.Type.LEFT
+            else:
+                command_type = Command.Type.RIGHT
+
+            if commands and commands[-1].type == command_type:
+                commands[-1] = Command(command_type, count=commands[-1].count + 1)
+            else:
+                commands.append(Command(command_type))
+
+        return commands
+
+    def invalidate(self) -> None:
+        """Forgets every distance field (e.g. because the table has changed in a way the planner cannot tell).
+        """
+        self.__fields.clear()
+
+    def __neighbours(self, index: int) -> list[int]:
+        """Indices of the poses one step away from a pose: after a MOVE (if possible), a LEFT and a RIGHT.
+        """
+        cell, direction = divmod(index, 4)
+        x, y = divmod(cell, self.pose_space.height)
+        step_x, step_y = _steps[direction]
+        space = self.pose_space
+
+        neighbours = [cell * 4 + _left_of[direction], cell * 4 + _right_of[direction]]
+        moved = space.index_at(x + space.x_range[0] + step_x, y + space.y_range[0] + step_y, direction)
+
+        if moved is not None:
+            neighbours.append(moved)
+
+        return neighbours
+
+    def __field(self, target: int) -> array:
+        """Returns the distance from every pose to the target (-1 where it cannot be reached), from the cache if
+        possible.
+        """
+        if self.__current_obstacles_version() != self.__obstacles_version:
+            self.__fields.clear()
+            self.__obstacles_version = self.__current_obstacles_version()
+
+        field = self.__fields.get(target)
+
+        if field is not None:
+            self.__fields.move_to_end(target)
+            return field
+
+        field = self.__build_field(target)
+        self.__fields[target] = field
+
+        while len(self.__fields) > max(1, min(self.cache_size, self.max_cached_poses // self.pose_space.size)):
+            self.__fields.popitem(last=False)
+
+        return field
+
+    def __build_field(self, target: int) -> array:
+        """Breadth-first search backwards from the target: a pose is one step further away than whichever pose it can
+        reach in one step.
+        """
+        space = self.pose_space
+        height = space.height
+        x_min, y_min = space.x_range[0], space.y_range[0]
+        index_at = space.index_at
+
+        field = array("i", [-1]) * space.size
+        field[target] = 0
+        frontier = [target]
+        distance = 0
+
+        while frontier:
+            distance += 1
+            next_frontier = []
+
+            for index in frontier:
+                cell, direction = divmod(index, 4)
+
+                # Turning into this pose, from either side.
+                for previous in (cell * 4 + _right_of[direction], cell * 4 + _left_of[direction]):
+                    if field[previous] < 0:
+                        field[previous] = distance
+                        next_frontier.append(previous)
+
+                # Moving into this pose, from the cell behind it.
+                x, y = divmod(cell, height)
+                step_x, step_y = _steps[direction]
+                previous = index_at(x + x_min - step_x, y + y_min - step_y, direction)
+
+                if previous is not None and field[previous] < 0:
+                    field[previous] = distance
+                    next_frontier.append(previous)
+
+            frontier = next_frontier
+
+        return field
+
+    def __descend(self, start: int, target: int) -> Optional[list[int]]:
+        """Follows the target's distance field down from the start, one step closer at a time.
+        """
+        field = self.__field(target)
+
+        if field[start] < 0:
+            return None
+
+        path = [start]
+
+        while path[-1] != target:
+            closer = field[path[-1]] - 1
+            path.append(next(index for index in self.__neighbours(path[-1]) if field[index] == closer))
+
+        return path
+
+    def __search(self, start: int, target: int) -> Optional[list[int]]:
+        """A* from the start to the target, for tables too large for distance fields.
+
+        The heuristic (the Manhattan distance, plus one if the robot still has to turn to face the right way) never
+        overestimates, so the path found is a shortest one.
+        """
+        height = self.pose_space.height
+        target_x, target_y = divmod(target // 4, height)
+        target_direction = target % 4
+
+        def estimate(index: int) -> int:
+            x, y = divmod(index // 4, height)
+            return abs(x - target_x) + abs(y - target_y) + (index % 4 != target_direction)
+
+        distances = {start: 0}
+        previous: dict[int, int] = {}
+        # Ties are broken in favour of poses closer to the target, which keeps searches on open tables short.
+        queue = [(estimate(start), estimate(start), start)]
+        expansions = 0
+
+        while queue:
+            estimated, remaining, index = heapq.heappop(queue)
+
+            # Poses are queued again whenever a shorter way to them is found; only the shortest one counts.
+            if estimated - remaining > distances[index]:
+                continue
+
+            if index == target:
+                path = [target]
+                while path[-1] != start:
+                    path.append(previous[path[-1]])
+                return path[::-1]
+
+            expansions += 1
+            if expansions > self.max_expansions:
+                logger.info(f"Gave up looking for a path after {self.max_expansions} expansions.")
+                self.gave_up = True
+                return None
+
+            distance = distances[index] + 1
+
+            for neighbour in self.__neighbours(index):
+                if distance < distances.get(neighbour, distance + 1):
+                    distances[neighbour] = distance
+                    previous[neighbour] = index
+                    remaining = estimate(neighbour)
+                    heapq.heappush(queue, (distance + remaining, remaining, neighbour))
+
+        return None
+
+    def __current_obstacles_version(self) -> Optional[int]:
+        obstacles = self.pose_space.obstacles
+        return None if obstacles is None else obstacles.version
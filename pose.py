@@ -1,12 +1,20 @@
 from dataclasses import dataclass
 from enum import Enum
 
+# Poses are interned, but only up to this many of them, so that a stream of (say) wildly out-of-bounds placements
+# cannot grow the cache without limit. Poses beyond it are simply created anew.
+_INTERN_LIMIT = 1 << 16
+_interned: dict = {}
 
-@dataclass
+
+@dataclass(frozen=True, slots=True, init=False)
 class Pose:
     """Represents a pose (position + direction).
 
     Valid directions are limited to the members of the Direction enum.
+
+    Poses are immutable and interned: constructing the same pose twice yields the very same object, so poses can be
+    shared freely and simulating a step does not need to allocate anything.
     """
 
     class Direction(Enum):
@@ -19,9 +27,32 @@ class Pose:
         EAST = "EAST",
         WEST = "WEST"
 
+    def __new__(cls, x: int, y: int, direction: Direction):
+        key = (x, y, direction)
+        pose = _interned.get(key)
+
+        if pose is None:
+            pose = object.__new__(cls)
+            object.__setattr__(pose, "x", x)
+            object.__setattr__(pose, "y", y)
+            object.__setattr__(pose, "direction", direction)
+
+            if len(_interned) < _INTERN_LIMIT:
+                _interned[key] = pose
+
+        return pose
+
+    def __reduce__(self):
+        # Unpickled (and copied) poses go through __new__ too, so they end up interned as well.
+        return Pose, (self.x, self.y, self.direction)
+
     def to_short_string(self) -> str:
-        return f"{self.x},{self.y},{self.direction}"
+        return f"{self.x},{self.y},{_direction_strings[self.direction]}"
 
     x: int
     y: int
     direction: Direction
+
+
+# Formatting an Enum member is surprisingly slow, and there are only four of them.
+_direction_strings: dict[Pose.Direction, str] = {direction: str(direction) for direction in Pose.Direction}
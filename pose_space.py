@@ -0,0 +1,204 @@
+from typing import Optional
+
+from command import Command
+from obstacle_map import ObstacleMap
+from pose import Pose
+import simulator_primitives as primitives
+
+
+class PoseSpace:
+    """Enumerates every admissible pose on a bounded table, so that poses can be handled as plain integer indices.
+
+    Poses are laid out as ((x - x_min) * height + (y - y_min)) * 4 + direction, with directions numbered in the order
+    they are declared in Pose.Direction. One extra index, `unplaced`, stands for a robot that has not been placed yet.
+
+    Poses on cells blocked by obstacles still have an index (so the layout stays the same), but are not admissible:
+    index_of() treats them as off the table, and transition tables never lead into them.
+    """
+
+    directions: list[Pose.Direction] = list(Pose.Direction)
+
+    def __init__(self, x_range: list[int], y_range: list[int], obstacles: Optional[ObstacleMap] = None):
+        self.x_range = list(x_range)
+        self.y_range = list(y_range)
+        self.obstacles = obstacles
+
+        self.width = self.x_range[1] - self.x_range[0] + 1
+        self.height = self.y_range[1] - self.y_range[0] + 1
+
+        # Number of real poses; the index right after them is reserved for the unplaced robot.
+        self.size = self.width * self.height * len(self.directions)
+        self.unplaced = self.size
+
+        self.__direction_numbers = {direction: number for number, direction in enumerate(self.directions)}
+
+    def contains(self, pose: Pose) -> bool:
+        """Determines whether the pose lies within the table (and is not blocked).
+        """
+        return self.index_of(pose) is not None
+
+    def index_of(self, pose: Optional[Pose]) -> Optional[int]:
+        """Returns the index of the given pose, or None if the pose lies outside the table (or is blocked).
+
+        (A pose of None, i.e. an unplaced robot, maps onto the `unplaced` index.)
+        """
+        if pose is None:
+            return self.unplaced
+
+        return self.index_at(pose.x, pose.y, self.__direction_numbers[pose.direction])
+
+    def index_at(self, x: int, y: int, direction_number: int) -> Optional[int]:
+        """Same as index_of, but taking the direction as its position in `directions`.
+        """
+        if not (self.x_range[0] <= x <= self.x_range[1] and self.y_range[0] <= y <= self.y_range[1]):
+            return None
+
+        if self.obstacles is not None and self.obstacles.blocked(x, y):
+            return None
+
+        return ((x - self.x_range[0]) * self.height + (y - self.y_range[0])) * 4 + direction_number
+
+    def pose_at(self, index: int) -> Optional[Pose]:
+        """Returns the pose at the given index, or None for the `unplaced` index.
+        """
+        if index == self.unplaced:
+            return None
+
+        if not 0 <= index < self.size:
+            raise IndexError(f"Pose index out of range: {index}")
+
+        cell, direction = divmod(index, 4)
+        x, y = divmod(cell, self.height)
+        return Pose(x + self.x_range[0], y + self.y_range[0], self.directions[direction])
+
+    def transition_table(self, command_type: Command.Type) -> list[int]:
+        """Builds the table mapping each pose index onto the index that results from applying the command.
+
+        Only commands that depend on the current pose (MOVE, LEFT, RIGHT) have a table. Moves that would leave the table
+        (or run into an obstacle) are rejected, so they map onto the pose they started from; the unplaced robot ignores
+        everything and maps onto itself.
+        """
+        match command_type:
+            case Command.Type.MOVE:
+                step = primitives.move_forward
+            case Command.Type.LEFT:
+                step = lambda pose: Pose(pose.x, pose.y, primitives.turn_left(pose.direction))  # noqa: E731
+            case Command.Type.RIGHT:
+                step = lambda pose: Pose(pose.x, pose.y, primitives.turn_right(pose.direction))  # noqa: E731
+            case _:
+                raise RuntimeError(f"There is no transition table for command type: {command_type}")
+
+        table = []
+
+        for index in range(self.size):
+            candidate = self.index_of(step(self.pose_at(index)))
+            table.append(index if candidate is None else candidate)
+
+        table.append(self.unplaced)
+
+        return table
+
+
+class TransitionTables:
+    """Every transition table of a PoseSpace, along with what it takes to evaluate macro commands (see Command) on pose
+    indices without going through each of their steps.
+
+    A counted MOVE jumps straight to where it stops, as `free_steps` holds how many MOVEs in a row succeed from every
+    pose (and a step forward shifts an index by the same amount anywhere on the table), turns are taken modulo four,
+    and REPEAT blocks skip whole cycles of repetitions (see Simulator). A counted MOVE or turn is then a constant amount
+    of work, and a REPEAT at most a pass through its body per pose the robot can be in at the start of a repetition.
+    """
+
+    def __init__(self, pose_space: PoseSpace):
+        self.pose_space = pose_space
+
+        self.move = pose_space.transition_table(Command.Type.MOVE)
+        self.left = pose_space.transition_table(Command.Type.LEFT)
+        self.right = pose_space.transition_table(Command.Type.RIGHT)
+        self.for_type: dict[Command.Type, list[int]] = {Command.Type.MOVE: self.move,
+                                                        Command.Type.LEFT: self.left,
+                                                        Command.Type.RIGHT: self.right}
+
+        self.free_steps = self.__free_steps()
+
+        # How far a step forward shifts the index of a pose, per direction.
+        self.offsets = []
+        for direction in pose_space.directions:
+            step = primitives.move_forward(Pose(0, 0, direction))
+            self.offsets.append((step.x * pose_space.height + step.y) * 4)
+
+    def run(self, index: int, command: Command) -> tuple[int, int]:
+        """Returns the index a command (anything but REPORT and GOTO) leads to from the given one, and how many of the
+        commands it is made of were rejected (a MOVE that stops short counting as one).
+        """
+        if command.type == Command.Type.PLACE:
+            candidate = self.pose_space.index_of(command.pose)
+            return (index, 1) if candidate is None else (candidate, 0)
+
+        if command.type == Command.Type.REPEAT:
+            return self.__repeat(index, command)
+
+        if command.type not in self.for_type:
+            raise RuntimeError(f"There is no transition table for command type: {command.type}")
+
+        if index == self.pose_space.unplaced:
+            return index, 1
+
+        if command.type == Command.Type.MOVE:
+            steps = min(command.count, self.free_steps[index])
+            return index + steps * self.offsets[index % 4], int(steps < command.count)
+
+        table = self.for_type[command.type]
+        for _ in range(command.count % 4):
+            index = table[index]
+
+        return index, 0
+
+    def __repeat(self, index: int, command: Command) -> tuple[int, int]:
+        # Where each pose was first seen at the start of a repetition, and how many rejections there had been by then.
+        seen: dict[int, tuple[int, int]] = {}
+        iteration = 0
+        rejected = 0
+
+        while iteration < command.count:
+            if index in seen:
+                first, rejected_before = seen[index]
+                cycles = (command.count - iteration) // (iteration - first)
+                iteration += cycles * (iteration - first)
+                rejected += cycles * (rejected - rejected_before)
+
+                if iteration == command.count:
+                    break
+
+            seen[index] = (iteration, rejected)
+
+            for step in command.body:
+                index, step_rejected = self.run(index, step)
+                rejected += step_rejected
+
+            iteration += 1
+
+        return index, rejected
+
+    def __free_steps(self) -> list[int]:
+        """Counts how many MOVEs in a row succeed from every pose, following each line of poses to where it stops.
+        """
+        move = self.move
+        free = [-1] * len(move)
+
+        for start in range(len(move)):
+            line = []
+            index = start
+
+            while free[index] < 0 and move[index] != index:
+                line.append(index)
+                index = move[index]
+
+            steps = max(free[index], 0)
+            free[index] = steps
+
+            for index in reversed(line):
+                steps += 1
+                free[index] = steps
+
+        return free
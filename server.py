@@ -0,0 +1,189 @@
+from typing import Callable, Optional
+import asyncio
+import logging
+
+from command import Command
+from pose import Pose
+from simulator import Simulator
+from state import State
+
+logger = logging.getLogger(__name__)
+
+
+class SimulatorServer:
+    """Hosts many independent simulator sessions in a single process, over TCP and/or Unix sockets.
+
+    Sessions speak the same line protocol as a live session: one command per line, in, and one line per REPORT (as
+    output by Pose.to_short_string), out. Every connection gets a simulator of its own, and a session ends (and its
+    connection is closed) at the first invalid command (blank lines included), just like a live session does.
+
+    Clients are free to pipeline commands without waiting for their output. Everything that is available is read and
+    processed at once, and the lines it REPORTs are written back in a single write.
+    """
+
+    # How much to read from a connection at once, and how long a line may get before the client is considered broken.
+    read_size = 1 << 16
+    max_line_length = 1 << 16
+
+    # Connections waiting to be accepted; bursts of clients connecting at once are expected.
+    backlog = 4096
+
+    def __init__(self, engine: Callable = Simulator):
+        # Anything that can be constructed with no arguments and behaves like a Simulator.
+        self.engine = engine
+
+        self.servers: list[asyncio.Server] = []
+        self.active_sessions = 0
+        self.total_sessions = 0
+
+    async def start(self, address: str) -> asyncio.Server:
+        """Starts listening on an address (see parse_address), and returns the underlying asyncio.Server.
+        """
+        match parse_address(address):
+            case ("unix", path):
+                server = await asyncio.start_unix_server(self.handle_session, path, backlog=self.backlog)
+            case ("tcp", host, port):
+                server = await asyncio.start_server(self.handle_session, host, port, backlog=self.backlog)
+
+        self.servers.append(server)
+
+        for socket in server.sockets:
+            logger.info(f"Listening on {socket.getsockname()}.")
+
+        return server
+
+    async def serve_forever(self, addresses: list[str]) -> None:
+        """Listens on every given address until cancelled.
+        """
+        for address in addresses:
+            await self.start(address)
+
+        try:
+            await asyncio.gather(*(server.serve_forever() for server in self.servers))
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+
+        self.servers.clear()
+
+    async def handle_session(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Runs a session for as long as the client keeps sending valid commands.
+        """
+        self.active_sessions += 1
+        self.total_sessions += 1
+
+        simulator = self.engine()
+
+        # Output is only collected as commands are processed, and written out once the batch is done.
+        output: list[bytes] = []
+        simulator.subscribe(Simulator.Event.REPORT, lambda state: output.append(_report_line(state)))
+
+        remainder = b""
+
+        try:
+            while True:
+                data = await reader.read(self.read_size)
+
+                # A last line with no line break is still a line (but nothing after the last line break is not).
+                if data:
+                    lines = (remainder + data).split(b"\n")
+                    remainder = lines.pop()
+                else:
+                    lines = [remainder] if remainder else []
+
+                valid = self.__process_lines(simulator, lines)
+
+                if output:
+                    writer.write(b"".join(output))
+                    output.clear()
+                    await writer.drain()
+
+                if not valid or not data:
+                    break
+
+                if len(remainder) > self.max_line_length:
+                    logger.info("Received an overly long line, closing the session...")
+                    break
+        except ConnectionError:
+            logger.info("Client went away mid-session.")
+        finally:
+            self.active_sessions -= 1
+            writer.close()
+
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def __process_lines(self, simulator, lines: list[bytes]) -> bool:
+        """Feeds lines into a session's simulator, returning False if the session has to end.
+        """
+        for line in lines:
+            # Be lenient with clients that end lines with "\r\n".
+            line = line.rstrip(b"\r")
+
+            try:
+                command = Command.from_string(line.decode("ascii"))
+            except (RuntimeError, UnicodeDecodeError):
+                logger.info("Received an invalid command, closing the session...")
+                return False
+
+            simulator.process_command(command)
+
+        return True
+
+
+def _report_line(state: State) -> bytes:
+    """Encodes a REPORTed state into a line of output. The same few poses tend to be REPORTed over and over, so their
+    lines are cached (up to a limit, as sessions can REPORT any number of different poses).
+    """
+    line = _report_lines.get(state.pose)
+
+    if line is None:
+        line = (state.pose.to_short_string() + "\n").encode("ascii")
+
+        if len(_report_lines) < _REPORT_LINE_LIMIT:
+            _report_lines[state.pose] = line
+
+    return line
+
+
+# Lines are cached per pose, but only up to this many of them (see Pose).
+_REPORT_LINE_LIMIT = 1 << 16
+_report_lines: dict[Pose, bytes] = {}
+
+
+def parse_address(address: str) -> tuple:
+    """Parses an address into ("unix", path) for "unix:PATH", or ("tcp", host, port) for "HOST:PORT" (or ":PORT").
+    """
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+
+    host, separator, port = address.rpartition(":")
+
+    if not separator:
+        raise RuntimeError(f"Addresses must be either HOST:PORT or unix:PATH, not {address}")
+
+    try:
+        port = int(port)
+    except ValueError:
+        raise RuntimeError(f"Invalid port in address: {address}")
+
+    # IPv6 addresses come in brackets, so that their colons are not mistaken for the port's.
+    host: Optional[str] = host.strip("[]") or None
+
+    return "tcp", host, port
+
+
+async def open_connection(address: str) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    """Connects to a server listening on an address (see parse_address).
+    """
+    match parse_address(address):
+        case ("unix", path):
+            return await asyncio.open_unix_connection(path)
+        case ("tcp", host, port):
+            return await asyncio.open_connection(host or "localhost", port)
@@ -1,44 +1,171 @@
-from typing import Optional
+from typing import Generator, Optional
 import logging
+import time
 
 from command import Command
+from command_stream import CommandStream
 from state import State
 from pose import Pose
+from simulator_events import SimulatorEvents
+from metrics import RateLimitedLogger, SimulatorMetrics
+from obstacle_map import ObstacleMap
+from planner import PathPlanner
+from pose_space import PoseSpace
 import simulator_primitives as primitives
 
 logger = logging.getLogger(__name__)
 
+# Rejected commands can come by the million, so warnings about them are only logged so often.
+rejections = RateLimitedLogger(logger)
 
-class Simulator:
+
+class Simulator(SimulatorEvents):
     """The Simulator class manages the state of the world and of the robot.
 
     This class is responsible for processing commands that change (or don't) the state of the world and the robot, and
-    also to report on that state as needed.
+    also to report on that state as needed: consumers subscribe to CHANGE and REPORT events (see SimulatorEvents).
     """
 
     robot_state: Optional[Pose] = None
 
-    # Limits of the table
-    # (Taken from task, but could easily be configured.)
+    # The latest State handed out, so that it can be handed out again for as long as nothing changes.
+    __state: Optional[State] = None
+
+    # Limits of the table, unless configured otherwise
+    # (Taken from task.)
     x_range: list[int] = [0, 4]
     y_range: list[int] = [0, 4]
 
+    # Cells of the table the robot cannot be in, if any.
+    obstacles: Optional[ObstacleMap] = None
+
+    # If set, the simulator keeps count of (and times) what it does.
+    metrics: Optional[SimulatorMetrics] = None
+
+    # Plans GOTOs, on the table it was built for (it is only built when first needed, and again if the table changes).
+    __planner: Optional[PathPlanner] = None
+
+    def __init__(self,
+                 x_range: Optional[list[int]] = None,
+                 y_range: Optional[list[int]] = None,
+                 obstacles: Optional[ObstacleMap] = None):
+        super().__init__()
+
+        if x_range is not None:
+            self.x_range = list(x_range)
+        if y_range is not None:
+            self.y_range = list(y_range)
+        if obstacles is not None:
+            self.obstacles = obstacles
+
     def process_command(self, command: Command) -> None:
-        # Determine how the command will affect state
-        candidate_state = self.__compute_next_state(command)
+        metrics = self.metrics
+
+        if metrics is not None:
+            metrics.commands.increment(command.type.name)
+
+        # REPORTs do not affect state; they are simply passed on to whoever is interested (if there is anything to
+        # report).
+        if command.type == Command.Type.REPORT:
+            if self.robot_state is not None:
+                if metrics is None:
+                    self._notify(Simulator.Event.REPORT)
+                else:
+                    start = time.perf_counter()
+                    self._notify(Simulator.Event.REPORT)
+                    metrics.stage_seconds["report"].observe(time.perf_counter() - start)
+            return
+
+        # REPEAT blocks may well place the robot themselves, so they are dealt with step by step.
+        if command.type == Command.Type.REPEAT:
+            self.__repeat(command)
+            return
+
+        # Until the robot is on the table, there is nothing for any command other than PLACE to act upon.
+        if self.robot_state is None and command.type != Command.Type.PLACE:
+            self.__reject("unplaced", "The robot has not been placed yet, so the latest command has been ignored.")
+            return
+
+        # Going to a pose takes however many steps it takes, or none at all if the pose cannot be reached.
+        if command.type == Command.Type.GOTO:
+            self.__go_to(command.pose)
+            return
+
+        # Moving several steps at once goes as far as it can: once one step is rejected, so are all the ones after it.
+        if command.type == Command.Type.MOVE and command.count > 1:
+            steps = min(command.count, self.__free_steps(self.robot_state))
+
+            if steps < command.count:
+                self.__reject("steps", f"{command.count - steps} of {command.count} steps would lead to inadmissible "
+                                       "state, so they have been ignored.")
+            elif metrics is not None:
+                metrics.outcomes.increment("accepted")
 
-        # Determine whether that effect is acceptable
-        if self.__validate_state(candidate_state):
+            self.__move_to(primitives.move_forward(self.robot_state, steps))
+            return
+
+        # Determine how the command will affect state, and whether that effect is acceptable
+        if metrics is None:
+            candidate_state = self.__compute_next_state(command)
+            valid = self.__validate_state(candidate_state)
+        else:
+            start = time.perf_counter()
+            candidate_state = self.__compute_next_state(command)
+            computed = time.perf_counter()
+            valid = self.__validate_state(candidate_state)
+            metrics.stage_seconds["compute"].observe(computed - start)
+            metrics.stage_seconds["validate"].observe(time.perf_counter() - computed)
+
+        if valid:
             # If so, replace the current state
-            self.robot_state = candidate_state
+            self.__move_to(candidate_state)
+
+            if metrics is not None:
+                metrics.outcomes.increment("accepted")
         else:
-            logger.warning("Latest command would lead to inadmissible state, so it has been ignored.")
+            self.__reject("inadmissible", "Latest command would lead to inadmissible state, so it has been ignored.")
+
+    def run_stream(self, stream: CommandStream) -> Generator[Pose, None, None]:
+        """Processes a whole CommandStream, yielding the pose at every REPORT (once the robot has been placed).
+
+        (REPORTs are yielded rather than notified; CHANGE events are still notified.)
+        """
+        for command in stream:
+            if command.type != Command.Type.REPORT:
+                self.process_command(command)
+            elif self.robot_state is not None:
+                yield self.robot_state
+
+    def reset(self) -> None:
+        """Takes the robot off the table, so the simulator can be reused as if it had just been constructed.
+
+        (Subscribers are kept, and are not notified.)
+        """
+        self.robot_state = None
 
     def get_current_state(self) -> State:
         if self.robot_state is None:
             raise RuntimeError("The simulator was asked to output a state before initialisation!")
 
-        return State(self.robot_state)
+        # The State only needs replacing when the robot has actually gone somewhere else. (Poses are compared by value:
+        # they are only interned up to a point, see Pose.)
+        if self.__state is None or self.__state.pose != self.robot_state:
+            self.__state = State(self.robot_state)
+
+        return self.__state
+
+    def __reject(self, kind: str, message: str) -> None:
+        if self.metrics is not None:
+            self.metrics.outcomes.increment("rejected")
+
+        rejections.warning(kind, message)
+
+    def __move_to(self, pose: Pose) -> None:
+        """Replaces the current state, letting subscribers know if it actually changed.
+        """
+        if pose != self.robot_state:
+            self.robot_state = pose
+            self._notify(Simulator.Event.CHANGE)
 
     def __compute_next_state(self, command: Command) -> Pose:
         """Computes the next state of the system given a command.
@@ -49,17 +176,101 @@ class Simulator:
             case Command.Type.MOVE:
                 return primitives.move_forward(self.robot_state)
             case Command.Type.LEFT:
-                return Pose(self.robot_state.x, self.robot_state.y, primitives.turn_left(self.robot_state.direction))
+                return Pose(self.robot_state.x, self.robot_state.y, self.__turn(primitives.turn_left, command.count))
             case Command.Type.RIGHT:
-                return Pose(self.robot_state.x, self.robot_state.y, primitives.turn_right(self.robot_state.direction))
+                return Pose(self.robot_state.x, self.robot_state.y, self.__turn(primitives.turn_right, command.count))
             case _:
                 raise RuntimeError(f"Simulator received an unexpected command type: {command.type}")
 
+    def __go_to(self, target: Pose) -> None:
+        """Takes the robot along the shortest route to the target, one single step at a time, so that subscribers (and
+        metrics) see every step of the way.
+        """
+        planner = self.__planner_for_table()
+        route = planner.plan(self.robot_state, target)
+
+        if route is None and planner.gave_up:
+            self.__reject("search_limit", f"Gave up looking for a route to the latest command's target after "
+                                          f"{planner.max_expansions} expansions, so it has been ignored.")
+            return
+
+        if route is None:
+            self.__reject("unreachable", "Latest command's target cannot be reached, so it has been ignored.")
+            return
+
+        for command in route:
+            for step in command.expand():
+                self.process_command(step)
+
+    def __planner_for_table(self) -> PathPlanner:
+        space = self.__planner.pose_space if self.__planner is not None else None
+
+        if space is None or space.obstacles is not self.obstacles or (space.x_range, space.y_range) != \
+                (self.x_range, self.y_range):
+            self.__planner = PathPlanner(PoseSpace(self.x_range, self.y_range, self.obstacles))
+
+        return self.__planner
+
+    def __turn(self, turn, count: int) -> Pose.Direction:
+        """Turns the robot's direction count times (four turns being no turn at all).
+        """
+        direction = self.robot_state.direction
+
+        for _ in range(count % 4):
+            direction = turn(direction)
+
+        return direction
+
+    def __free_steps(self, pose: Pose) -> int:
+        """Determines how many steps the robot can take straight ahead before it would leave the table (or run into an
+        obstacle).
+        """
+        step = primitives.move_forward(Pose(0, 0, pose.direction))
+
+        if step.x > 0:
+            steps = self.x_range[1] - pose.x
+        elif step.x < 0:
+            steps = pose.x - self.x_range[0]
+        elif step.y > 0:
+            steps = self.y_range[1] - pose.y
+        else:
+            steps = pose.y - self.y_range[0]
+
+        if self.obstacles is not None:
+            steps = self.obstacles.free_steps(pose.x, pose.y, step.x, step.y, steps)
+
+        return steps
+
+    def __repeat(self, command: Command) -> None:
+        """Runs the body of a REPEAT command as many times as needed to know how all of the repetitions end up.
+
+        The body always does the same thing to the same state, so as soon as the robot is back in a state it started an
+        earlier repetition in, the repetitions in between form a cycle that would only keep repeating itself. Whole
+        cycles are skipped, which bounds the work by the number of possible states rather than the count.
+        """
+        seen: dict[Optional[Pose], int] = {}
+        iteration = 0
+
+        while iteration < command.count:
+            if self.robot_state in seen:
+                cycle = iteration - seen[self.robot_state]
+                iteration += (command.count - iteration) // cycle * cycle
+
+                if iteration == command.count:
+                    break
+
+            seen[self.robot_state] = iteration
+
+            for step in command.body:
+                self.process_command(step)
+
+            iteration += 1
+
     def __validate_state(self, candidate_state: Pose) -> bool:
         """Determines whether the candidate state is valid.
         """
         if self.x_range[0] <= candidate_state.x <= self.x_range[1]\
            and self.y_range[0] <= candidate_state.y <= self.y_range[1]:
-            return True
+            return self.obstacles is None or not self.obstacles.blocked(candidate_state.x, candidate_state.y)
         else:
             return False
@@ -0,0 +1,70 @@
+from typing import Callable
+from abc import ABC, abstractmethod
+from enum import Enum
+
+from pose import Pose
+from state import State
+
+
+class SimulatorEvents(ABC):
+    """Lets consumers subscribe to what happens inside a simulator, instead of polling it for its state.
+
+    Simulators inherit from this class, implement get_current_state(), and call _notify() whenever something happens.
+    The State handed to subscribers is only ever built if someone has subscribed to the event at hand, so unobserved
+    simulators pay next to nothing.
+    """
+
+    class Event(Enum):
+        """Enumerates the events consumers can subscribe to.
+        """
+        # The robot's pose changed (rejected commands, or commands that leave the robot where it was, do not count).
+        CHANGE = "CHANGE",
+        # A REPORT command was processed while the robot was on the table.
+        REPORT = "REPORT"
+
+    def __init__(self):
+        self.__subscribers: dict[SimulatorEvents.Event, list[Callable[[State], None]]] = \
+            {event: [] for event in SimulatorEvents.Event}
+
+    def subscribe(self, event: Event, callback: Callable[[State], None]) -> None:
+        """Registers a callback to be called with the latest State whenever the event happens.
+        """
+        self.__subscribers[event].append(callback)
+
+    def unsubscribe(self, event: Event, callback: Callable[[State], None]) -> None:
+        self.__subscribers[event].remove(callback)
+
+    def _notify(self, event: Event) -> None:
+        subscribers = self.__subscribers[event]
+
+        if not subscribers:
+            return
+
+        state = self.get_current_state()
+
+        for callback in subscribers:
+            callback(state)
+
+    @abstractmethod
+    def get_current_state(self) -> State:
+        """Returns the latest State of the robot (raising a RuntimeError if it has not been placed yet).
+        """
+
+
+def process_collecting_changes(simulator, command) -> list[Pose]:
+    """Processes a command on a simulator (or anything that passes subscriptions on to one), returning every pose the
+    robot went through on the way, e.g. along the route of a GOTO.
+    """
+    poses = []
+
+    def collect(state: State) -> None:
+        poses.append(state.pose)
+
+    simulator.subscribe(SimulatorEvents.Event.CHANGE, collect)
+
+    try:
+        simulator.process_command(command)
+    finally:
+        simulator.unsubscribe(SimulatorEvents.Event.CHANGE, collect)
+
+    return poses
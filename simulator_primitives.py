@@ -1,24 +1,18 @@
-import copy
-
 from pose import Pose
 
 
-def move_forward(pose: Pose) -> Pose:
-    """Given a pose, determine the resulting pose if the robot moves one step forward.
+def move_forward(pose: Pose, steps: int = 1) -> Pose:
+    """Given a pose, determine the resulting pose if the robot moves (one or more) steps forward.
     """
-    output = copy.deepcopy(pose)
-
     match pose.direction:
         case Pose.Direction.NORTH:
-            output.y += 1
+            return Pose(pose.x, pose.y + steps, pose.direction)
         case Pose.Direction.SOUTH:
-            output.y -= 1
+            return Pose(pose.x, pose.y - steps, pose.direction)
         case Pose.Direction.EAST:
-            output.x += 1
+            return Pose(pose.x + steps, pose.y, pose.direction)
         case Pose.Direction.WEST:
-            output.x -= 1
-
-    return output
+            return Pose(pose.x - steps, pose.y, pose.direction)
 
 
 def turn_left(direction: Pose.Direction) -> Pose.Direction:
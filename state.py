@@ -1,10 +1,13 @@
 from dataclasses import dataclass
+from typing import Optional
 
 from pose import Pose
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class State:
     """Encapsulates the current state of simulation.
     """
     pose: Pose
+    # Which robot the pose belongs to, on tables shared by several of them (see MultiRobotSimulator).
+    robot: Optional[str] = None
@@ -0,0 +1,278 @@
+from typing import Callable, Iterable, Optional, Union
+from dataclasses import dataclass
+
+from command import Command
+from command_stream import CommandStream
+from obstacle_map import ObstacleMap
+from pose import Pose
+from pose_space import PoseSpace
+from simulator import Simulator
+import simulator_primitives as primitives
+
+
+@dataclass
+class SymbolicResult:
+    """Where a stream can leave the robot, given every start pose that was considered at once.
+    """
+    # Every pose the robot can end up in (None standing for the robot not being on the table).
+    final: list[Optional[Pose]]
+    # Number of commands after which the robot could only be in one pose, whatever the start pose was (so that the
+    # rest of the stream, REPORTs included, plays out the same way for all of them), or None if that never happens.
+    converged_at: Optional[int]
+
+
+class SymbolicExecutor:
+    """Runs a stream from a whole set of start poses at once, to find out how much its outcome depends on where the
+    robot started (e.g. when its first PLACE is missing or corrupted).
+
+    Sets of poses are kept as bitsets over the PoseSpace (in plain ints, bit i standing for the pose with index i), and
+    every command maps a whole set onto the set of poses it can lead to with a few bulk operations per direction: the
+    poses facing one way that can move forward are shifted by the same number of bits, the ones that cannot stay where
+    they are, and turns shift every pose facing one way onto the same neighbouring bit. The cost of a command grows with
+    the size of the table in words, rather than in poses, and is the same however many of the poses are in the set.
+
+    Which start poses lead to a given final pose is found by going the other way: the set of poses that lead into a set
+    is built (with the same kind of operations) command by command, from the end of the stream back to its start.
+
+    Macro commands are not expanded either: a counted MOVE stops as soon as the set stops changing (at the latest once
+    every pose has run into an edge), turns are taken modulo four, and REPEAT blocks skip whole cycles of repetitions as
+    soon as a set comes round again (see Simulator).
+    """
+
+    def __init__(self,
+                 x_range: Optional[list[int]] = None,
+                 y_range: Optional[list[int]] = None,
+                 obstacles: Optional[ObstacleMap] = None):
+        self.x_range = list(x_range if x_range is not None else Simulator.x_range)
+        self.y_range = list(y_range if y_range is not None else Simulator.y_range)
+        self.obstacles = obstacles
+        self.pose_space = PoseSpace(self.x_range, self.y_range, obstacles)
+
+        space = self.pose_space
+        directions = space.directions
+        self.__unplaced = 1 << space.unplaced
+
+        # Per direction: every admissible pose facing that way, and those of them that can move forward.
+        facing = [bytearray((space.size + 8) // 8) for _ in directions]
+        movable = [bytearray((space.size + 8) // 8) for _ in directions]
+
+        for x in range(self.x_range[0], self.x_range[1] + 1):
+            for y in range(self.y_range[0], self.y_range[1] + 1):
+                for number, direction in enumerate(directions):
+                    index = space.index_at(x, y, number)
+                    if index is None:
+                        continue
+
+                    facing[number][index >> 3] |= 1 << (index & 7)
+                    if space.index_of(primitives.move_forward(Pose(x, y, direction))) is not None:
+                        movable[number][index >> 3] |= 1 << (index & 7)
+
+        self.__facing = [int.from_bytes(bits, "little") for bits in facing]
+        self.__movable = [int.from_bytes(bits, "little") for bits in movable]
+        self.__everything = sum(self.__facing) | self.__unplaced
+
+        # How many bits each pose moves by, per opcode and direction (the layout is the same everywhere on the table).
+        origin = Pose(self.x_range[0], self.y_range[0], directions[0])
+        self.__shifts: list[list[int]] = [[] for _ in CommandStream.type_of]
+
+        for number, direction in enumerate(directions):
+            pose = Pose(origin.x, origin.y, direction)
+            forward = primitives.move_forward(pose)
+            self.__shifts[CommandStream.MOVE].append(
+                ((forward.x - pose.x) * space.height + (forward.y - pose.y)) * 4)
+            self.__shifts[CommandStream.LEFT].append(directions.index(primitives.turn_left(direction)) - number)
+            self.__shifts[CommandStream.RIGHT].append(directions.index(primitives.turn_right(direction)) - number)
+
+    def run(self, stream: CommandStream, starts: Optional[Iterable[Optional[Pose]]] = None) -> SymbolicResult:
+        """Runs the stream from every one of the given start poses (every pose on the table, by default).
+        """
+        poses = self.bitset(starts) if starts is not None else self.__everything ^ self.__unplaced
+        converged_at = 0 if poses.bit_count() == 1 else None
+
+        for step, (opcode, place) in enumerate(self.__commands(stream), 1):
+            poses = self.__forward(poses, opcode, place)
+
+            if converged_at is None and poses.bit_count() == 1:
+                converged_at = step
+
+        return SymbolicResult(self.poses(poses), converged_at)
+
+    def starts_leading_to(self,
+                          stream: CommandStream,
+                          final: Iterable[Optional[Pose]],
+                          starts: Optional[Iterable[Optional[Pose]]] = None) -> list[Optional[Pose]]:
+        """Returns the start poses (out of those given, or every pose on the table) from which the stream leaves the
+        robot in one of the given final poses.
+        """
+        poses = self.bitset(final)
+
+        for opcode, place in reversed(list(self.__commands(stream))):
+            poses = self.__backward(poses, opcode, place)
+
+        return self.poses(poses & (self.bitset(starts) if starts is not None else self.__everything ^ self.__unplaced))
+
+    def groups(self,
+               stream: CommandStream,
+               starts: Optional[Iterable[Optional[Pose]]] = None) -> dict[Optional[Pose], list[Optional[Pose]]]:
+        """Groups the start poses (out of those given, or every pose on the table) by the pose the stream leaves the
+        robot in, i.e. which start poses converge.
+
+        This takes a pass back through the stream per final pose, so it is best kept to streams with few of them.
+        """
+        return {pose: self.starts_leading_to(stream, [pose], starts) for pose in self.run(stream, starts).final}
+
+    def bitset(self, poses: Iterable[Optional[Pose]]) -> int:
+        """Returns the bitset of the given poses (those off the table are left out).
+        """
+        bits = 0
+
+        for pose in poses:
+            index = self.pose_space.index_of(pose)
+            if index is not None:
+                bits |= 1 << index
+
+        return bits
+
+    def poses(self, bits: int) -> list[Optional[Pose]]:
+        """Returns the poses in a bitset, in the order of their indices.
+        """
+        poses = []
+
+        while bits:
+            lowest = bits & -bits
+            poses.append(self.pose_space.pose_at(lowest.bit_length() - 1))
+            bits ^= lowest
+
+        return poses
+
+    def __commands(self, stream: CommandStream) -> Iterable[tuple[int, Union[int, Command, None]]]:
+        """Yields the opcode of every command in the stream, along with the index of the pose a PLACE is for (None if
+        that pose is not on the table, and for other commands) or the command a MACRO stands for.
+        """
+        place_args = stream.place_args
+        macros = iter(stream.macros)
+        next_place = 0
+
+        for opcode in stream.opcodes:
+            if opcode == CommandStream.PLACE:
+                yield opcode, self.pose_space.index_at(*place_args[next_place:next_place + 3])
+                next_place += 3
+            elif opcode == CommandStream.MACRO:
+                yield opcode, next(macros)
+            else:
+                yield opcode, None
+
+    def __forward(self, poses: int, opcode: int, place: Union[int, Command, None]) -> int:
+        """Returns the set of poses that a command leads to, from any of the given ones.
+        """
+        if opcode == CommandStream.MACRO:
+            if place.type == Command.Type.REPEAT:
+                return _repeat(poses, place.count, lambda bits: self.__run_body(bits, place.body, self.__forward))
+
+            return self.__count(poses, place, self.__forward)
+
+        if opcode == CommandStream.PLACE:
+            # PLACEs off the table are ignored; any other takes the robot to the same pose, wherever it was.
+            return poses if place is None or not poses else 1 << place
+
+        if opcode == CommandStream.REPORT:
+            return poses
+
+        result = poses & self.__unplaced
+
+        for facing, movable, shift in zip(self.__facing, self.__movable, self.__shifts[opcode]):
+            facing &= poses
+
+            if opcode == CommandStream.MOVE:
+                moving = facing & movable
+                result |= _shift(moving, shift) | (facing ^ moving)
+            else:
+                result |= _shift(facing, shift)
+
+        return result
+
+    def __backward(self, poses: int, opcode: int, place: Union[int, Command, None]) -> int:
+        """Returns the set of poses from which a command leads to any of the given ones.
+        """
+        if opcode == CommandStream.MACRO:
+            if place.type == Command.Type.REPEAT:
+                body = place.body[::-1]
+                return _repeat(poses, place.count, lambda bits: self.__run_body(bits, body, self.__backward))
+
+            return self.__count(poses, place, self.__backward)
+
+        if opcode == CommandStream.PLACE:
+            if place is None:
+                return poses
+
+            return self.__everything if poses >> place & 1 else 0
+
+        if opcode == CommandStream.REPORT:
+            return poses
+
+        result = poses & self.__unplaced
+
+        for facing, movable, shift in zip(self.__facing, self.__movable, self.__shifts[opcode]):
+            if opcode == CommandStream.MOVE:
+                # Poses that moved forward into the set, and poses of the set that could not move.
+                result |= (_shift(poses, -shift) & movable) | (poses & facing & ~movable)
+            else:
+                # Poses facing this way turn into the set, if the pose they turn into is in it.
+                result |= _shift(poses, -shift) & facing
+
+        return result
+
+    def __count(self, poses: int, command: Command, step: Callable[[int, int, Optional[int]], int]) -> int:
+        """Runs a counted MOVE or turn (forward or backward, depending on the step) on a set of poses.
+        """
+        opcode = CommandStream.opcode_of[command.type]
+
+        # Four turns are no turn at all; MOVEs stop making a difference once the set stops changing (as it then never
+        # changes again).
+        count = command.count % 4 if opcode != CommandStream.MOVE else command.count
+
+        for _ in range(count):
+            previous, poses = poses, step(poses, opcode, None)
+
+            if poses == previous:
+                break
+
+        return poses
+
+    def __run_body(self, poses: int, body: Iterable[Command], step: Callable) -> int:
+        """Runs the commands of a REPEAT body once (in the order given) on a set of poses.
+        """
+        for command in body:
+            if command.count > 1 or command.body is not None:
+                poses = step(poses, CommandStream.MACRO, command)
+            elif command.type == Command.Type.PLACE:
+                poses = step(poses, CommandStream.PLACE, self.pose_space.index_of(command.pose))
+            else:
+                poses = step(poses, CommandStream.opcode_of[command.type], None)
+
+        return poses
+
+
+def _repeat(poses: int, count: int, step: Callable[[int], int]) -> int:
+    """Applies a step to a set of poses `count` times, skipping whole cycles once a set comes round again.
+    """
+    seen: dict[int, int] = {}
+    iteration = 0
+
+    while iteration < count:
+        if poses in seen:
+            cycle = iteration - seen[poses]
+            iteration += (count - iteration) // cycle * cycle
+
+            if iteration == count:
+                break
+
+        seen[poses] = iteration
+        poses = step(poses)
+        iteration += 1
+
+    return poses
+
+
+def _shift(bits: int, shift: int) -> int:
+    return bits << shift if shift >= 0 else bits >> -shift
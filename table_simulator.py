@@ -0,0 +1,273 @@
+from typing import Generator, Optional
+import logging
+import time
+
+from command import Command
+from command_stream import CommandStream
+from state import State
+from pose import Pose
+from pose_space import PoseSpace, TransitionTables
+from planner import PathPlanner
+from simulator import Simulator
+from simulator_events import SimulatorEvents
+from metrics import RateLimitedLogger, SimulatorMetrics
+from obstacle_map import ObstacleMap
+
+logger = logging.getLogger(__name__)
+
+# Rejected commands can come by the million, so warnings about them are only logged so often (see Simulator).
+rejections = RateLimitedLogger(logger)
+
+
+class TableSimulator(SimulatorEvents):
+    """A drop-in replacement for Simulator that precomputes every possible transition.
+
+    The table is bounded, so there are only so many poses the robot can ever be in. At construction time, one transition
+    table is built per command type (see PoseSpace.transition_table), after which each command is a single list lookup
+    instead of a match, a copy and a range check. Behaviour is identical to the Simulator's, warnings and events
+    included.
+
+    Tables cover every pose on the table, so they grow with its area; on very large tables, the Simulator (whose memory
+    only grows with the number of obstacles) is the better choice.
+    """
+
+    # If set, the simulator keeps count of (and times) what it does (see Simulator).
+    metrics: Optional[SimulatorMetrics] = None
+
+    # Building the tables takes tens of seconds per million poses (and a few list entries each), so tables with more
+    # poses than this are turned down.
+    max_poses: int = 1 << 20
+
+    def __init__(self,
+                 x_range: Optional[list[int]] = None,
+                 y_range: Optional[list[int]] = None,
+                 obstacles: Optional[ObstacleMap] = None):
+        super().__init__()
+
+        self.x_range = list(x_range if x_range is not None else Simulator.x_range)
+        self.y_range = list(y_range if y_range is not None else Simulator.y_range)
+        self.obstacles = obstacles
+
+        self.pose_space = PoseSpace(self.x_range, self.y_range, obstacles)
+
+        if self.pose_space.size > self.max_poses:
+            raise RuntimeError(f"The table engine only handles tables of up to {self.max_poses} poses, not "
+                               f"{self.pose_space.size} (the reference engine has no such limit).")
+
+        self.planner = PathPlanner(self.pose_space)
+
+        self.transitions = TransitionTables(self.pose_space)
+        self.__index = self.pose_space.unplaced
+        self.__state: Optional[State] = None
+
+    @property
+    def robot_state(self) -> Optional[Pose]:
+        return self.pose_space.pose_at(self.__index)
+
+    def process_command(self, command: Command) -> None:
+        metrics = self.metrics
+
+        if metrics is not None:
+            metrics.commands.increment(command.type.name)
+
+        if command.type == Command.Type.REPORT:
+            if self.__index != self.pose_space.unplaced:
+                if metrics is None:
+                    self._notify(TableSimulator.Event.REPORT)
+                else:
+                    start = time.perf_counter()
+                    self._notify(TableSimulator.Event.REPORT)
+                    metrics.stage_seconds["report"].observe(time.perf_counter() - start)
+            return
+
+        if command.type == Command.Type.REPEAT:
+            self.__repeat(command)
+            return
+
+        if command.type == Command.Type.GOTO:
+            self.__go_to(command.pose)
+            return
+
+        # Looking the next state up computes and validates it at once, so it is all timed as computation.
+        if metrics is None:
+            self.__step(command)
+        else:
+            start = time.perf_counter()
+            self.__step(command)
+            metrics.stage_seconds["compute"].observe(time.perf_counter() - start)
+
+    def __step(self, command: Command) -> None:
+        """Processes any command that may change the state of the robot (i.e. anything but REPORT, REPEAT and GOTO).
+        """
+        if command.type == Command.Type.PLACE:
+            candidate = self.pose_space.index_of(command.pose)
+
+            if candidate is None:
+                self.__reject("inadmissible", "Latest command would lead to inadmissible state, so it has been ignored.")
+            else:
+                self.__accept(candidate)
+
+            return
+
+        if command.type not in self.transitions.for_type:
+            raise RuntimeError(f"Simulator received an unexpected command type: {command.type}")
+
+        if self.__index == self.pose_space.unplaced:
+            self.__reject("unplaced", "The robot has not been placed yet, so the latest command has been ignored.")
+            return
+
+        # Turns always succeed (four of them being no turn at all), and moving several steps at once goes as far as it
+        # can: once one step is rejected, so are all the ones after it.
+        index, rejected = self.transitions.run(self.__index, command)
+
+        if not rejected:
+            self.__accept(index)
+        elif command.count == 1:
+            self.__reject("inadmissible", "Latest command would lead to inadmissible state, so it has been ignored.")
+        else:
+            steps = self.transitions.free_steps[self.__index]
+            self.__reject("steps", f"{command.count - steps} of {command.count} steps would lead to inadmissible "
+                                   "state, so they have been ignored.")
+            self.__move_to(index)
+
+    def __go_to(self, target: Pose) -> None:
+        """Takes the robot along the shortest route to the target, one single step at a time (see Simulator).
+        """
+        if self.__index == self.pose_space.unplaced:
+            self.__reject("unplaced", "The robot has not been placed yet, so the latest command has been ignored.")
+            return
+
+        route = self.planner.plan(self.robot_state, target)
+
+        if route is None and self.planner.gave_up:
+            self.__reject("search_limit", f"Gave up looking for a route to the latest command's target after "
+                                          f"{self.planner.max_expansions} expansions, so it has been ignored.")
+            return
+
+        if route is None:
+            self.__reject("unreachable", "Latest command's target cannot be reached, so it has been ignored.")
+            return
+
+        for command in route:
+            for step in command.expand():
+                self.process_command(step)
+
+    def __accept(self, index: int) -> None:
+        if self.metrics is not None:
+            self.metrics.outcomes.increment("accepted")
+
+        self.__move_to(index)
+
+    def __reject(self, kind: str, message: str) -> None:
+        if self.metrics is not None:
+            self.metrics.outcomes.increment("rejected")
+
+        rejections.warning(kind, message)
+
+    def __move_to(self, index: int) -> None:
+        """Replaces the current state, letting subscribers know if it actually changed.
+        """
+        if index != self.__index:
+            self.__index = index
+            self._notify(TableSimulator.Event.CHANGE)
+
+    def __repeat(self, command: Command) -> None:
+        """Runs the body of a REPEAT command, skipping whole cycles of repetitions (see Simulator).
+        """
+        seen: dict[int, int] = {}
+        iteration = 0
+
+        while iteration < command.count:
+            if self.__index in seen:
+                cycle = iteration - seen[self.__index]
+                iteration += (command.count - iteration) // cycle * cycle
+
+                if iteration == command.count:
+                    break
+
+            seen[self.__index] = iteration
+
+            for step in command.body:
+                self.process_command(step)
+
+            iteration += 1
+
+    def reset(self) -> None:
+        """Takes the robot off the table, keeping the (expensive) transition tables around (see Simulator).
+        """
+        self.__index = self.pose_space.unplaced
+
+    def get_current_state(self) -> State:
+        if self.__index == self.pose_space.unplaced:
+            raise RuntimeError("The simulator was asked to output a state before initialisation!")
+
+        # The State only needs replacing when the robot has actually gone somewhere else (see Simulator).
+        pose = self.robot_state
+        if self.__state is None or self.__state.pose != pose:
+            self.__state = State(pose)
+
+        return self.__state
+
+    def run_stream(self, stream: CommandStream) -> Generator[Pose, None, None]:
+        """Processes a whole CommandStream, yielding the pose at every REPORT (once the robot has been placed).
+
+        This skips Command objects (but for macros), and events, altogether. Rather than one warning per rejected
+        command, a single warning summarises how many were ignored. Metrics, if any, are counted but not timed.
+        """
+        transitions = self.transitions
+        tables = [None, transitions.move, transitions.left, transitions.right, None]
+        index_at, pose_at = self.pose_space.index_at, self.pose_space.pose_at
+        unplaced = self.pose_space.unplaced
+        place_args = stream.place_args
+        macros = iter(stream.macros)
+        next_place = 0
+        rejected = 0
+        index = self.__index
+
+        for opcode in stream.opcodes:
+            if opcode == CommandStream.PLACE:
+                candidate = index_at(place_args[next_place], place_args[next_place + 1], place_args[next_place + 2])
+                next_place += 3
+
+                if candidate is None:
+                    rejected += 1
+                else:
+                    index = candidate
+            elif opcode == CommandStream.REPORT:
+                if index != unplaced:
+                    # Keep the simulator consistent in case the consumer stops half-way.
+                    self.__index = index
+                    yield pose_at(index)
+            elif opcode == CommandStream.MACRO:
+                index, macro_rejected = transitions.run(index, next(macros))
+                rejected += macro_rejected
+            else:
+                candidate = tables[opcode][index]
+
+                if candidate == index:
+                    rejected += 1
+                else:
+                    index = candidate
+
+        self.__index = index
+
+        if self.metrics is not None:
+            self.__count_stream(stream, rejected)
+
+        if rejected:
+            logger.warning(f"{rejected} commands would have led to inadmissible (or unplaced) states, so they have "
+                           "been ignored.")
+
+    def __count_stream(self, stream: CommandStream, rejected: int) -> None:
+        """Updates the metrics with a whole stream's worth of commands at once.
+        """
+        opcodes = bytes(stream.opcodes)
+
+        for opcode, command_type in enumerate(CommandStream.type_of):
+            self.metrics.commands.increment(command_type.name, opcodes.count(opcode))
+
+        for macro in stream.macros:
+            self.metrics.commands.increment(macro.type.name)
+
+        self.metrics.outcomes.increment("accepted", len(opcodes) - opcodes.count(CommandStream.REPORT) - rejected)
+        self.metrics.outcomes.increment("rejected", rejected)
@@ -0,0 +1,257 @@
+# Class methods return objects of the class below, so we need "better" type annotations.
+from __future__ import annotations
+
+from typing import Optional
+from dataclasses import dataclass
+from multiprocessing import shared_memory, resource_tracker
+import logging
+import struct
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from pose import Pose
+from state import State
+
+logger = logging.getLogger(__name__)
+
+_DIRECTIONS = list(Pose.Direction)
+
+MAGIC = b"TLMY"
+VERSION = 1
+
+# Magic, version, size of a record, and number of records in the ring.
+_header_format = struct.Struct("<4sHHQ")
+# Number of records published so far; readers poll it to find out what is new.
+_head_format = struct.Struct("<Q")
+_HEAD_OFFSET = _header_format.size
+# Records start on a cache line of their own, away from the head, which is written to every time.
+_RECORDS_OFFSET = 64
+
+# Sequence, time (ns, from time.monotonic_ns()), x, y, direction (as its position in Pose.Direction).
+_record_format = struct.Struct("<QQqqB7x")
+_payload_format = struct.Struct("<QqqB")
+
+
+@dataclass(frozen=True)
+class TelemetryRecord:
+    """One change of state, as published: its number (counting from zero), when it happened and the new pose.
+    """
+    number: int
+    time_ns: int
+    pose: Pose
+
+
+class TelemetryPublisher:
+    """Publishes every change of a simulator's state into a ring buffer in shared memory, for other processes to read.
+
+    Records are of a fixed size, and the ring holds the latest `capacity` of them. There is a single writer (the
+    publisher) and any number of readers (see TelemetryReader), and nobody ever takes a lock: the publisher writes on
+    regardless of who is reading, so a slow reader can never hold up the simulation, it can only miss records that
+    have been overwritten since.
+
+    Each record starts with a sequence number, which works as a per-record seqlock: it is odd while the record is
+    being written (2n + 1 for record n), and even once it has been (2n + 2). A reader checks it before and after
+    reading a record, and only keeps the record if both show it complete, and still the one it was after.
+    """
+
+    def __init__(self, name: Optional[str] = None, capacity: int = 1 << 16):
+        if capacity < 1 or capacity & (capacity - 1):
+            raise RuntimeError(f"The capacity of a telemetry ring must be a power of two, not {capacity}.")
+
+        self.capacity = capacity
+        self.__mask = capacity - 1
+        self.__head = 0
+
+        self.__memory = shared_memory.SharedMemory(name, create=True,
+                                                   size=_RECORDS_OFFSET + capacity * _record_format.size)
+        self.name = self.__memory.name
+        self.__buffer = self.__memory.buf
+
+        _header_format.pack_into(self.__buffer, 0, MAGIC, VERSION, _record_format.size, capacity)
+        _head_format.pack_into(self.__buffer, _HEAD_OFFSET, 0)
+
+        logger.info(f"Publishing telemetry into shared memory {self.name}.")
+
+    def __enter__(self) -> TelemetryPublisher:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        """Number of records published so far.
+        """
+        return self.__head
+
+    def publish_state(self, state: State) -> None:
+        """Publishes a change of state; meant to be subscribed to a simulator's CHANGE events.
+        """
+        self.publish(state.pose)
+
+    def publish(self, pose: Pose) -> None:
+        number = self.__head
+        offset = _RECORDS_OFFSET + (number & self.__mask) * _record_format.size
+        buffer = self.__buffer
+
+        _head_format.pack_into(buffer, offset, 2 * number + 1)
+        _payload_format.pack_into(buffer, offset + _head_format.size, time.monotonic_ns(), pose.x, pose.y,
+                                  _direction_numbers[pose.direction])
+        _head_format.pack_into(buffer, offset, 2 * number + 2)
+
+        self.__head = number + 1
+        _head_format.pack_into(buffer, _HEAD_OFFSET, number + 1)
+
+    def close(self) -> None:
+        """Stops publishing, and removes the ring (readers that are still attached can go on reading it).
+        """
+        if self.__buffer is None:
+            return
+
+        self.__buffer = None
+        self.__memory.close()
+        self.__memory.unlink()
+
+
+class TelemetryReader:
+    """Reads the records of a TelemetryPublisher (possibly in another process), straight out of its shared memory.
+
+    Records are read in place, without any copying of the ring, pickling or pipes, and the publisher is never waited
+    for. A reader that falls more than a ring's worth of records behind skips ahead to the oldest record still in the
+    ring, and counts the ones it missed in `missed`.
+    """
+
+    def __init__(self, name: str, from_start: bool = False):
+        self.__memory = _attach(name)
+        self.__buffer = self.__memory.buf
+
+        try:
+            magic, version, record_size, self.capacity = _header_format.unpack_from(self.__buffer, 0)
+        except struct.error:
+            self.close()
+            raise RuntimeError(f"Shared memory {name} is too small to hold telemetry.")
+
+        if magic != MAGIC or version != VERSION or record_size != _record_format.size:
+            self.close()
+            raise RuntimeError(f"Shared memory {name} does not hold telemetry (or an unsupported version of it).")
+
+        self.name = name
+        self.missed = 0
+        self.__mask = self.capacity - 1
+
+        # The number of the next record to read: the oldest one still in the ring, or the next one to be published.
+        head = self.__published()
+        self.__next = max(0, head - self.capacity) if from_start else head
+
+    def __enter__(self) -> TelemetryReader:
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
+
+    def read(self) -> list[TelemetryRecord]:
+        """Returns every record published since the latest read (or since attaching), oldest first.
+        """
+        head = self.__published()
+
+        if head - self.__next > self.capacity:
+            self.missed += head - self.capacity - self.__next
+            self.__next = head - self.capacity
+
+        records = []
+
+        while self.__next < head:
+            record = self.__read_record(self.__next)
+            self.__next += 1
+
+            if record is None:
+                self.missed += 1
+            else:
+                records.append(record)
+
+        return records
+
+    def latest(self) -> Optional[TelemetryRecord]:
+        """Returns the most recent record (or None if there is none yet), skipping any others since the latest read.
+        """
+        head = self.__published()
+
+        # The record may be overwritten while it is read, in which case there is a newer one to try.
+        while head > self.__next:
+            record = self.__read_record(head - 1)
+
+            if record is not None:
+                self.__next = head
+                return record
+
+            head = self.__published()
+
+        return None
+
+    def view(self):
+        """Returns the whole ring as a NumPy structured array over the shared memory itself (without copying it).
+
+        Records in it may be overwritten (or half-written) at any time, so only those whose `sequence` is even, and
+        the same before and after they are used, can be relied upon. Needs NumPy.
+        """
+        if np is None:
+            raise RuntimeError("Telemetry views need NumPy (pip install numpy).")
+
+        return np.ndarray((self.capacity,), dtype=_RECORD_DTYPE, buffer=self.__buffer, offset=_RECORDS_OFFSET)
+
+    def close(self) -> None:
+        if self.__buffer is None:
+            return
+
+        self.__buffer = None
+        self.__memory.close()
+
+    def __published(self) -> int:
+        return _head_format.unpack_from(self.__buffer, _HEAD_OFFSET)[0]
+
+    def __read_record(self, number: int) -> Optional[TelemetryRecord]:
+        """Reads a record, or returns None if it was not (or no longer) complete while it was read.
+        """
+        offset = _RECORDS_OFFSET + (number & self.__mask) * _record_format.size
+        expected = 2 * number + 2
+
+        if _head_format.unpack_from(self.__buffer, offset)[0] != expected:
+            return None
+
+        time_ns, x, y, direction = _payload_format.unpack_from(self.__buffer, offset + _head_format.size)
+
+        if _head_format.unpack_from(self.__buffer, offset)[0] != expected:
+            return None
+
+        return TelemetryRecord(number, time_ns, Pose(x, y, _DIRECTIONS[direction]))
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attaches to existing shared memory without handing it to the resource tracker.
+
+    The publisher owns the ring, so readers must not have it removed when they exit (which is what the tracker does
+    with any shared memory it was given), nor take it off the tracker (which, in the publisher's own process or its
+    children, would be the publisher's registration that goes).
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+
+    # Before 3.13, attaching always registers the memory, so registering is turned off for as long as it takes.
+    register = resource_tracker.register
+    resource_tracker.register = lambda *_: None
+
+    try:
+        return shared_memory.SharedMemory(name)
+    finally:
+        resource_tracker.register = register
+
+
+_direction_numbers: dict[Pose.Direction, int] = {direction: number for number, direction in enumerate(_DIRECTIONS)}
+
+if np is not None:
+    _RECORD_DTYPE = np.dtype([("sequence", "<u8"), ("time_ns", "<u8"), ("x", "<i8"), ("y", "<i8"),
+                              ("direction", "u1"), ("padding", "V7")])
@@ -0,0 +1,25 @@
+import sys
+from pathlib import Path
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+from simulator import Simulator
+from command import Command
+
+
+def replay_serially(lines: list[str]):
+    """Runs lines through the reference Simulator the same way main.py does, returning the reports and final pose.
+    """
+    sim = Simulator()
+    reports = []
+
+    for line in lines:
+        command = Command.from_string(line)
+
+        if command.type != Command.Type.REPORT:
+            sim.process_command(command)
+        elif sim.robot_state is not None:
+            reports.append(sim.robot_state)
+
+    return reports, sim.robot_state
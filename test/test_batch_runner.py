@@ -0,0 +1,114 @@
+import unittest
+import tempfile
+import random
+import sys
+import os
+from pathlib import Path
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+from batch_runner import BatchRunner
+from binary_log import BinaryLog
+from bulk_parser import BulkParser
+from simulator import Simulator
+from table_simulator import TableSimulator
+from helpers import replay_serially
+
+
+class FailingSimulator(TableSimulator):
+    """A simulator that fails, in an unexpected way, on any stream of more than a few commands.
+    """
+
+    def run_stream(self, stream):
+        if len(stream) > 3:
+            raise ValueError("Too many commands!")
+
+        return super().run_stream(stream)
+
+
+class TestBatchRunner(unittest.TestCase):
+    """Test that running scenarios in a pool gives the same results as running each of them on a fresh simulator.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_scenario(self, name: str, lines: list[str]) -> str:
+        path = os.path.join(self.directory.name, name)
+
+        with open(path, "w") as file:
+            file.write("\n".join(lines) + "\n")
+
+        return path
+
+    def test_matches_fresh_simulators(self):
+        generator = random.Random(11)
+        choices = ["MOVE", "MOVE", "LEFT", "RIGHT", "REPORT", "PLACE 1,2,EAST", "PLACE 7,7,NORTH", "MOVE 3"]
+        scenarios = {}
+
+        # Scenarios of very different lengths, some of which never place the robot.
+        for index in range(20):
+            lines = [generator.choice(choices) for _ in range(generator.randrange(1, 2000))]
+            scenarios[self.write_scenario(f"scenario_{index}.txt", lines)] = lines
+
+        for engine in [Simulator, TableSimulator]:
+            results = list(BatchRunner(jobs=2, engine=engine).run(scenarios))
+
+            self.assertCountEqual([result.path for result in results], scenarios)
+
+            for result in results:
+                reports, final = replay_serially(scenarios[result.path])
+
+                self.assertIsNone(result.error)
+                self.assertEqual(result.reports, reports)
+                self.assertEqual(result.final, final)
+
+    def test_errors(self):
+        """Scenarios that cannot be run should be reported as such, without affecting the others.
+        """
+        valid = self.write_scenario("valid.txt", ["PLACE 0,0,NORTH", "MOVE", "REPORT", "JUMP", "REPORT"])
+        missing = os.path.join(self.directory.name, "missing.txt")
+
+        results = {result.path: result for result in BatchRunner(jobs=1).run([valid, missing])}
+
+        self.assertIsNone(results[valid].error)
+        self.assertEqual(len(results[valid].reports), 1)
+        self.assertIsNotNone(results[missing].error)
+        self.assertEqual(results[missing].reports, [])
+
+    def test_unexpected_errors(self):
+        """Any failure of a scenario is reported as such, with or without a pool of several workers.
+        """
+        short = self.write_scenario("short.txt", ["PLACE 0,0,NORTH", "REPORT"])
+        failing = self.write_scenario("failing.txt", ["PLACE 0,0,NORTH", "MOVE", "MOVE", "REPORT"])
+
+        for jobs in [1, 2]:
+            results = {result.path: result for result in
+                       BatchRunner(jobs=jobs, engine=FailingSimulator).run([short, failing, short])}
+
+            self.assertIsNone(results[short].error)
+            self.assertEqual(len(results[short].reports), 1)
+            self.assertIn("Too many commands!", results[failing].error)
+
+    def test_binary_logs(self):
+        lines = ["PLACE 1,1,SOUTH", "MOVE", "REPORT", "LEFT", "REPORT"]
+        text = self.write_scenario("text.txt", lines)
+        binary = os.path.join(self.directory.name, "binary.trbl")
+        BinaryLog.write(binary, [BulkParser().parse_file(text)], Simulator.x_range, Simulator.y_range)
+
+        wrong_table = os.path.join(self.directory.name, "wrong_table.trbl")
+        BinaryLog.write(wrong_table, [BulkParser().parse_file(text)], [0, 9], [0, 9])
+
+        results = {result.path: result for result in BatchRunner(jobs=1).run([text, binary, wrong_table])}
+
+        self.assertEqual(results[binary].reports, results[text].reports)
+        self.assertEqual(results[binary].reports, replay_serially(lines)[0])
+        self.assertIsNotNone(results[wrong_table].error)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+import tempfile
+import sys
+import os
+from pathlib import Path
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+from benchmark import WORKLOADS, STAGES, measure, run_benchmarks, compare, save_baseline, load_baseline
+from command import Command
+
+
+class TestWorkloads(unittest.TestCase):
+    def test_workloads(self):
+        """Workloads should be made of valid commands, and always be the same for the same seed.
+        """
+        for name, generate in WORKLOADS.items():
+            workload = generate(500, 3)
+
+            self.assertEqual(workload.name, name)
+            self.assertEqual(len(workload.lines), 500)
+            self.assertEqual(workload.lines, generate(500, 3).lines)
+            self.assertNotEqual(workload.lines, generate(500, 4).lines)
+
+            for line in workload.lines:
+                Command.from_string(line)
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_measure(self):
+        workload = WORKLOADS["edge_hugging"](200, 0)
+        results = run_benchmarks([workload], list(STAGES.values()), repeats=1)
+
+        self.assertEqual([result.stage for result in results], list(STAGES))
+
+        for result in results:
+            self.assertGreater(result.commands_per_second, 0)
+            self.assertGreaterEqual(result.peak_memory, 0)
+            self.assertEqual(result.latency_p50 is None, not STAGES[result.stage].per_command)
+
+            if result.latency_p50 is not None:
+                self.assertLessEqual(result.latency_p50, result.latency_p99)
+
+    def test_baseline(self):
+        """Results should survive a round trip through a baseline, and regressions should be found against it.
+        """
+        results = [measure(STAGES["parse"], WORKLOADS["random_walk"](200, 0), repeats=1)]
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "baseline.json")
+            save_baseline(path, results, size=200)
+            baseline = load_baseline(path)
+
+        self.assertEqual(baseline, results)
+        self.assertEqual(compare(baseline, results), [])
+
+        results[0].peak_memory = 1500
+        baseline[0].peak_memory = 1000
+        baseline[0].commands_per_second *= 2
+        self.assertEqual(len(compare(baseline, results, tolerance=0.2)), 2)
+        self.assertEqual(compare(baseline, results, tolerance=0.99), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+import tempfile
+import sys
+import os
+from pathlib import Path
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+from binary_log import BinaryLog, read_header
+from command_stream import CommandStream
+from table_simulator import TableSimulator
+
+
+class TestBinaryLog(unittest.TestCase):
+    """Test writing and replaying binary command logs.
+    """
+
+    lines = ["PLACE 0,0,NORTH", "MOVE", "REPORT", "LEFT", "PLACE 3,1,WEST", "MOVE", "RIGHT", "REPORT",
+             "PLACE 99999999999,-1,EAST", "MOVE", "REPORT", "MOVE 3", "REPEAT 4 { LEFT 2; PLACE 1,1,EAST }",
+             "REPORT"]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "commands.trbl")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        stream = CommandStream.from_lines(self.lines)
+        count = BinaryLog.write(self.path, [stream, stream], [0, 4], [0, 6])
+
+        self.assertEqual(count, 2 * len(self.lines))
+
+        with BinaryLog(self.path) as log:
+            self.assertEqual(log.x_range, [0, 4])
+            self.assertEqual(log.y_range, [0, 6])
+            self.assertEqual(list(log.stream)[:8], list(stream)[:8])
+            self.assertEqual(list(log.stream)[-3:], list(stream)[-3:])
+
+            # Coordinates that do not fit in the file are clamped, but stay out of any table.
+            self.assertEqual(log.stream.place_args[6], 2 ** 31 - 1)
+
+    def test_replay_matches_text(self):
+        stream = CommandStream.from_lines(self.lines)
+        BinaryLog.write(self.path, [stream], [0, 4], [0, 4])
+
+        expected = list(TableSimulator().run_stream(stream))
+
+        with BinaryLog(self.path) as log:
+            self.assertEqual(list(TableSimulator().run_stream(log.stream)), expected)
+
+    def test_empty(self):
+        BinaryLog.write(self.path, [], [0, 4], [0, 4])
+
+        with BinaryLog(self.path) as log:
+            self.assertEqual(len(log.stream), 0)
+
+    def test_corrupt(self):
+        """Logs that do not add up should be rejected as such, however they were damaged.
+        """
+        stream = CommandStream.from_lines(self.lines[:-3])
+        BinaryLog.write(self.path, [stream], [0, 4], [0, 4])
+
+        with open(self.path, "rb") as file:
+            data = file.read()
+
+        header = BinaryLog.header_format.size
+        damages = {
+            "truncated": data[:-3],
+            "last byte flipped": data[:-1] + bytes([data[-1] ^ 0xFF]),
+            "invalid opcode": data[:header] + b"\x09" + data[header + 1:],
+            "PLACE turned into MOVE": data[:header] + bytes([CommandStream.MOVE]) + data[header + 1:],
+        }
+
+        for damage, corrupt in damages.items():
+            with open(self.path, "wb") as file:
+                file.write(corrupt)
+
+            with self.subTest(damage):
+                self.assertRaises(RuntimeError, lambda: BinaryLog(self.path))
+
+    def test_corrupt_macros(self):
+        stream = CommandStream.from_lines(self.lines)
+        BinaryLog.write(self.path, [stream], [0, 4], [0, 4])
+
+        with open(self.path, "rb") as file:
+            data = file.read()
+
+        damages = {
+            "truncated": data[:-3],
+            "invalid": data.replace(b"MOVE 3", b"MOVE x"),
+            "single step": data.replace(b"MOVE 3", b"MOVE 1"),
+            "not text": data[:-2] + b"\xff\n",
+        }
+
+        for damage, corrupt in damages.items():
+            with open(self.path, "wb") as file:
+                file.write(corrupt)
+
+            with self.subTest(damage):
+                self.assertRaises(RuntimeError, lambda: BinaryLog(self.path))
+
+    def test_not_a_binary_log(self):
+        with open(self.path, "w") as file:
+            file.write("\n".join(self.lines))
+
+        self.assertEqual(read_header(self.path), None)
+        self.assertRaises(RuntimeError,
+                          lambda: BinaryLog(self.path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+import unittest
+import tempfile
+import io
+import sys
+import os
+from pathlib import Path
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+from bulk_parser import BulkParser, first_unfit_line, read_available_lines, read_pipe_chunks
+from command import parse_string_into_command
+from command_stream import CommandStream
+from table_simulator import TableSimulator
+import bulk_parser
+
+
+class TestBulkParser(unittest.TestCase):
+    """Test that the bulk parser accepts and rejects exactly what the regular parser does.
+    """
+
+    lines = ["PLACE 0,0,NORTH", "MOVE", "LEFT", "RIGHT", "REPORT", "PLACE -3,12,WEST", "MOVE ", "PLACE +1,2,EAST"]
+
+    def parse(self, data: bytes, chunk_size: int = 7):
+        chunks = [data[start:start + chunk_size] for start in range(0, len(data), chunk_size)]
+        return list(BulkParser().parse_chunks(chunks))
+
+    def commands(self, streams) -> list:
+        return [command for stream in streams for command in stream]
+
+    def test_matches_regular_parser(self):
+        streams = self.parse("\n".join(self.lines).encode())
+        expected = [parse_string_into_command(line) for line in self.lines]
+
+        self.assertEqual(self.commands(streams), expected)
+
+    def test_windows_line_breaks(self):
+        streams = self.parse("\r\n".join(self.lines).encode() + b"\r\n")
+
+        self.assertEqual(len(self.commands(streams)), len(self.lines))
+
+    def test_stops_at_invalid_line(self):
+        for invalid in ["NOPE", "PLACE 1,2", "PLACE a,b,NORTH", "PLACE 0,0,UP", "", "move"]:
+            streams = self.parse("\n".join(self.lines + [invalid] + self.lines).encode())
+
+            self.assertEqual(len(self.commands(streams)), len(self.lines))
+            self.assertEqual(streams[-1].invalid_line, len(self.lines))
+
+    def test_macros_are_kept_whole(self):
+        lines = ["PLACE 0,0,NORTH", "MOVE 3", "REPEAT 2 { LEFT; PLACE 1,1,EAST }", "MOVE 2000000", "REPORT"]
+        streams = self.parse("\n".join(lines).encode())
+        expected = [parse_string_into_command(line) for line in lines]
+
+        self.assertEqual(self.commands(streams), expected)
+
+    def test_rejects_goto(self):
+        """GOTOs cannot be skipped like invalid lines, as that would change what the rest of the input does.
+        """
+        for goto in ["GOTO 1,1,EAST", "REPEAT 2 { MOVE; GOTO 1,1,EAST }"]:
+            with self.assertRaisesRegex(RuntimeError, f"Line {len(self.lines) + 1}:"):
+                self.parse("\n".join(self.lines + [goto, "REPORT"]).encode())
+
+        # Input stops at an invalid line before any GOTO, as ever.
+        streams = self.parse("\n".join(self.lines + ["JUMP", "GOTO 1,1,EAST"]).encode())
+        self.assertEqual(streams[-1].invalid_line, len(self.lines))
+
+    def test_first_unfit_line(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "commands.txt")
+
+            for lines, expected in [([], None), (self.lines, None), (self.lines + ["GOTO 1,1,EAST"], 9),
+                                    (["PLACE 0,0,NORTH", "GOTO", "REPEAT 2 { MOVE; GOTO 1,1,EAST }", "REPORT"], 3)]:
+                with open(path, "w") as file:
+                    file.write("\r\n".join(lines))
+
+                self.assertEqual(first_unfit_line(path), expected)
+
+    def test_out_of_range_places(self):
+        """PLACEs too far out to be stored are kept as PLACEs off the table, rather than breaking the stream.
+        """
+        lines = ["PLACE 1,1,NORTH", "PLACE 99999999999999999999,0,NORTH", "PLACE 0,-99999999999999999999,EAST",
+                 "REPORT"]
+        parsed = CommandStream()
+        for stream in self.parse("\n".join(lines).encode()):
+            parsed.extend(stream)
+
+        for stream in [parsed, CommandStream.from_lines(lines)]:
+            self.assertEqual(list(stream.place_args[3:]), [2 ** 63 - 1, 0, 0, 0, -2 ** 63, 2])
+
+            reports = [str(pose) for pose in TableSimulator().run_stream(stream)]
+            self.assertEqual(reports, [str(parse_string_into_command(lines[0]).pose)])
+
+    def test_cache_limit(self):
+        lines = [f"PLACE {x},{y},NORTH" for x in range(20) for y in range(20)] + ["REPORT"]
+        limit = bulk_parser.CACHE_LIMIT
+        bulk_parser.CACHE_LIMIT = 16
+
+        try:
+            streams = self.parse("\n".join(lines * 2).encode(), chunk_size=100)
+        finally:
+            bulk_parser.CACHE_LIMIT = limit
+
+        self.assertEqual(self.commands(streams), [parse_string_into_command(line) for line in lines * 2])
+
+    def test_parse_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "commands.txt")
+
+            with open(path, "w") as file:
+                file.write("\n".join(self.lines * 100) + "\n")
+
+            stream = BulkParser().parse_file(path)
+
+            self.assertEqual(len(stream), len(self.lines) * 100)
+            self.assertEqual(stream.invalid_line, None)
+
+    def test_empty_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "commands.txt")
+            open(path, "w").close()
+
+            self.assertEqual(len(BulkParser().parse_file(path)), 0)
+
+    def test_pipe(self):
+        pipe = io.BufferedReader(io.BytesIO("\n".join(self.lines).encode()))
+        streams = BulkParser().parse_chunks(read_pipe_chunks(pipe))
+
+        self.assertEqual(len(self.commands(streams)), len(self.lines))
+
+    def test_available_lines(self):
+        read_fd, write_fd = os.pipe()
+        self.addCleanup(os.close, read_fd)
+
+        # Everything written before reading comes out as a single batch, with a partial line held back until it ends.
+        os.write(write_fd, b"PLACE 0,0,NORTH\nMOVE\nREP")
+        batches = read_available_lines(read_fd)
+        self.assertEqual(next(batches), [b"PLACE 0,0,NORTH", b"MOVE"])
+
+        # The last line counts even without a line break, once the pipe closes.
+        os.write(write_fd, b"ORT\r\nLEFT")
+        os.close(write_fd)
+        self.assertEqual(list(batches), [[b"REPORT\r", b"LEFT"]])
+
+        # Files cannot be waited on, but are read all the same.
+        with tempfile.TemporaryFile() as file:
+            file.write("\n".join(self.lines).encode())
+            file.seek(0)
+
+            lines = [line for batch in read_available_lines(file.fileno(), read_size=8) for line in batch]
+            self.assertEqual(lines, [line.encode() for line in self.lines])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -32,6 +32,16 @@ class TestCommand(unittest.TestCase):
         self.assertRaises(RuntimeError,
                           lambda: Command(Command.Type.MOVE, Pose(0, 0, Pose.Direction.NORTH)))
 
+    def test_interned(self):
+        """Equal commands should be the very same object, and immutable.
+        """
+        place = Command(Command.Type.PLACE, Pose(1, 2, Pose.Direction.EAST))
+
+        self.assertIs(place, Command(Command.Type.PLACE, Pose(1, 2, Pose.Direction.EAST)))
+        self.assertIs(Command.from_string("MOVE"), Command(Command.Type.MOVE))
+        self.assertRaises(AttributeError,
+                          lambda: setattr(place, "pose", None))
+
 
 class TestCommandParsing(unittest.TestCase):
     """Test the parser that builds commands from strings.
@@ -64,5 +74,35 @@ class TestCommandParsing(unittest.TestCase):
                           lambda: Command.from_string(test_string))
 
 
+class TestMacroParsing(unittest.TestCase):
+    """Test parsing counted commands and REPEAT blocks.
+    """
+
+    def test_counts(self):
+        self.assertEqual(Command.from_string("MOVE 1000"), Command(Command.Type.MOVE, count=1000))
+        self.assertEqual(Command.from_string("LEFT 3"), Command(Command.Type.LEFT, count=3))
+
+    def test_invalid_counts(self):
+        for test_string in ["MOVE 0", "MOVE -2", "RIGHT x", "LEFT 1 2"]:
+            self.assertRaises(RuntimeError,
+                              lambda: Command.from_string(test_string))
+
+    def test_repeat(self):
+        output = Command.from_string("REPEAT 3 { MOVE 2; REPEAT 2 { LEFT }; PLACE 1,1,EAST }")
+        expected_body = (Command(Command.Type.MOVE, count=2),
+                         Command(Command.Type.REPEAT, count=2, body=(Command(Command.Type.LEFT),)),
+                         Command(Command.Type.PLACE, Pose(1, 1, Pose.Direction.EAST)))
+
+        self.assertEqual(output, Command(Command.Type.REPEAT, count=3, body=expected_body))
+        self.assertEqual(output.length, 15)
+        self.assertEqual(len(list(output.expand())), 15)
+
+    def test_invalid_repeat(self):
+        for test_string in ["REPEAT 3", "REPEAT 3 MOVE", "REPEAT 3 { MOVE", "REPEAT 3 { MOVE } }", "REPEAT 3 { }",
+                            "REPEAT 3 { REPORT }", "REPEAT 0 { MOVE }", "REPEAT 3 { NOPE }"]:
+            self.assertRaises(RuntimeError,
+                              lambda: Command.from_string(test_string))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import random
+import sys
+from pathlib import Path
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from simulator import Simulator
+from command import Command
+from pose import Pose
+
+if np is not None:
+    from fleet_simulator import FleetSimulator
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestFleetSimulator(unittest.TestCase):
+    """Test that a fleet behaves exactly like as many independent Simulators.
+    """
+
+    def random_command(self, rng: random.Random) -> Command:
+        command_type = rng.choice([Command.Type.PLACE, Command.Type.MOVE, Command.Type.MOVE, Command.Type.LEFT,
+                                   Command.Type.RIGHT, Command.Type.REPORT])
+
+        if command_type == Command.Type.PLACE:
+            return Command(command_type, Pose(rng.randint(-1, 5), rng.randint(-1, 5), rng.choice(list(Pose.Direction))))
+
+        return Command(command_type)
+
+    def test_unplaced(self):
+        fleet = FleetSimulator(3)
+        fleet.process_command(Command(Command.Type.MOVE))
+
+        self.assertEqual(fleet.pose_of(0), None)
+        self.assertTrue((fleet.report()[2] == FleetSimulator.UNPLACED).all())
+
+    def test_broadcast(self):
+        fleet = FleetSimulator(4)
+        fleet.process_command(Command(Command.Type.PLACE, Pose(0, 4, Pose.Direction.NORTH)))
+        fleet.process_command(Command(Command.Type.MOVE))
+        fleet.process_command(Command(Command.Type.RIGHT))
+        fleet.process_command(Command(Command.Type.MOVE))
+
+        x, y, direction = fleet.report()
+
+        self.assertEqual(x.tolist(), [1] * 4)
+        self.assertEqual(y.tolist(), [4] * 4)
+        self.assertEqual(fleet.pose_of(3), Pose(1, 4, Pose.Direction.EAST))
+
+    def test_wrong_number_of_commands(self):
+        fleet = FleetSimulator(2)
+
+        self.assertRaises(RuntimeError,
+                          lambda: fleet.process_commands([Command(Command.Type.MOVE)]))
+
+    def test_matches_reference(self):
+        """Random per-robot streams should leave every robot where its own Simulator would.
+        """
+        rng = random.Random(3)
+        count = 50
+        fleet = FleetSimulator(count)
+        simulators = [Simulator() for _ in range(count)]
+
+        for _ in range(200):
+            commands = [self.random_command(rng) for _ in range(count)]
+            fleet.process_commands(commands)
+
+            for sim, command in zip(simulators, commands):
+                if command.type != Command.Type.REPORT:
+                    sim.process_command(command)
+
+        for robot, sim in enumerate(simulators):
+            self.assertEqual(fleet.pose_of(robot), sim.robot_state)
+
+
+if __name__ == "__main__":
+    unittest.main()
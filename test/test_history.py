@@ -0,0 +1,118 @@
+import unittest
+import random
+import sys
+from pathlib import Path
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+from history import HistoryRecorder
+from simulator import Simulator
+from table_simulator import TableSimulator
+from command import Command
+from pose import Pose
+
+
+def random_commands(count: int, seed: int) -> list[Command]:
+    rng = random.Random(seed)
+    lines = [rng.choice(["MOVE", "MOVE", "LEFT", "RIGHT", "REPORT", "MOVE 3", "RIGHT 2",
+                         f"PLACE {rng.randint(-1, 5)},{rng.randint(-1, 5)},{rng.choice(list(Pose.Direction)).name}",
+                         "REPEAT 3 { MOVE; LEFT }"]) for _ in range(count)]
+    return [Command.from_string(line) for line in lines]
+
+
+class TestHistoryRecorder(unittest.TestCase):
+    def test_seek(self):
+        """The pose after any step should be the same as simulating that many steps from scratch.
+        """
+        commands = random_commands(3000, 5)
+
+        for engine in [Simulator, TableSimulator]:
+            recorder = HistoryRecorder(engine(), interval=64)
+            expected = [None]
+            for command in commands:
+                recorder.process_command(command)
+                expected.append(recorder.simulator.robot_state)
+
+            self.assertEqual(len(recorder), len(commands))
+
+            for step in list(range(0, 200)) + list(range(len(commands) - 200, len(commands) + 1)) + [64, 128, 2048]:
+                self.assertEqual(recorder.pose_at(step), expected[step])
+
+            with self.assertRaises(RuntimeError):
+                recorder.pose_at(len(commands) + 1)
+            with self.assertRaises(RuntimeError):
+                recorder.pose_at(-1)
+
+    def test_undo(self):
+        recorder = HistoryRecorder(Simulator(), interval=4)
+        changes = []
+        recorder.subscribe(Simulator.Event.CHANGE, lambda state: changes.append(state.pose))
+
+        for line in ["PLACE 0,0,NORTH", "MOVE", "RIGHT", "MOVE", "MOVE", "MOVE", "LEFT"]:
+            recorder.process_command(Command.from_string(line))
+
+        self.assertEqual(recorder.simulator.robot_state, Pose(3, 1, Pose.Direction.NORTH))
+
+        recorder.undo()
+        self.assertEqual(recorder.simulator.robot_state, Pose(3, 1, Pose.Direction.EAST))
+        self.assertEqual(changes[-1], Pose(3, 1, Pose.Direction.EAST))
+
+        recorder.undo(4)
+        self.assertEqual(recorder.simulator.robot_state, Pose(0, 1, Pose.Direction.NORTH))
+        self.assertEqual(len(recorder), 2)
+
+        # New commands are recorded from where the robot was put back.
+        recorder.process_command(Command.from_string("LEFT"))
+        self.assertEqual(recorder.pose_at(3), Pose(0, 1, Pose.Direction.WEST))
+        self.assertEqual(recorder.pose_at(1), Pose(0, 0, Pose.Direction.NORTH))
+
+        # All the way back to before the robot was placed.
+        recorder.rewind_to(0)
+        self.assertIsNone(recorder.simulator.robot_state)
+        self.assertEqual(len(recorder), 0)
+
+        with self.assertRaises(RuntimeError):
+            recorder.undo()
+
+    def test_undo_commands(self):
+        """A GOTO is undone as a single command, however long its route, and REPORTs are not undone on their own.
+        """
+        recorder = HistoryRecorder(Simulator(), interval=4)
+
+        for line in ["PLACE 0,0,NORTH", "MOVE", "GOTO 3,3,EAST", "REPORT", "REPORT"]:
+            recorder.process_command(Command.from_string(line))
+
+        self.assertEqual(recorder.simulator.robot_state, Pose(3, 3, Pose.Direction.EAST))
+        self.assertGreater(len(recorder), 5)
+
+        recorder.undo()
+        self.assertEqual(recorder.simulator.robot_state, Pose(0, 1, Pose.Direction.NORTH))
+        self.assertEqual(len(recorder), 2)
+
+        recorder.process_command(Command.from_string("REPORT"))
+        recorder.undo()
+        self.assertEqual(recorder.simulator.robot_state, Pose(0, 0, Pose.Direction.NORTH))
+        self.assertEqual(recorder.pose_at(1), Pose(0, 0, Pose.Direction.NORTH))
+
+        with self.assertRaises(RuntimeError):
+            recorder.undo(2)
+
+    def test_bounded_memory(self):
+        commands = random_commands(5000, 6)
+        recorder = HistoryRecorder(Simulator(), interval=100, max_steps=1000)
+        expected = [None]
+
+        for command in commands:
+            recorder.process_command(command)
+            expected.append(recorder.simulator.robot_state)
+
+        # At least the latest max_steps steps are kept, and no more than an interval besides.
+        self.assertLessEqual(len(recorder) - recorder.first_step, 1100)
+        self.assertGreaterEqual(len(recorder) - recorder.first_step, 1000)
+
+        for step in range(recorder.first_step, len(recorder) + 1):
+            self.assertEqual(recorder.pose_at(step), expected[step])
+
+        with self.assertRaises(RuntimeError):
+            recorder.pose_at(recorder.first_step - 1)
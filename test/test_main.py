@@ -0,0 +1,43 @@
+import unittest
+import subprocess
+import sys
+from pathlib import Path
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+
+class TestMain(unittest.TestCase):
+    """Test that main.py turns down combinations of options it would otherwise silently ignore.
+    """
+
+    def run_main(self, *args: str) -> subprocess.CompletedProcess:
+        return subprocess.run([sys.executable, "main.py", *args], cwd=Path(__file__).parents[1], input="",
+                              capture_output=True, text=True, timeout=60)
+
+    def check_rejected(self, args: list[str], message: str) -> None:
+        result = self.run_main(*args)
+
+        self.assertEqual(result.returncode, 2, result.stderr)
+        self.assertIn(message, result.stderr)
+
+    def test_robots_with_history(self):
+        self.check_rejected(["--robots", "--live", "--history", "16"], "--robots needs --live or --input")
+
+    def test_live_with_input(self):
+        self.check_rejected(["--live", "--input", "commands.txt"], "--live and --input cannot be used together")
+
+    def test_serve_with_format(self):
+        self.check_rejected(["--serve", "localhost:0", "--format", "csv"], "--serve cannot be used together")
+
+    def test_serve_with_trajectory(self):
+        self.check_rejected(["--serve", "localhost:0", "--trajectory", "run.trtj"], "--serve cannot be used together")
+
+    def test_accepted(self):
+        result = self.run_main("--live")
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import urllib.request
+import unittest
+import logging
+import json
+import sys
+from pathlib import Path
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+from metrics import Histogram, MetricsServer, RateLimitedLogger, SimulatorMetrics, flush_rate_limited
+from simulator import Simulator
+from table_simulator import TableSimulator
+from command import Command
+from command_stream import CommandStream
+
+
+class TestSimulatorMetrics(unittest.TestCase):
+    commands = ["MOVE", "PLACE 0,0,NORTH", "MOVE 3", "REPORT", "MOVE 3", "LEFT", "MOVE", "PLACE 9,9,EAST", "REPORT"]
+
+    def run_commands(self, simulator) -> SimulatorMetrics:
+        simulator.metrics = SimulatorMetrics()
+
+        for line in self.commands:
+            simulator.process_command(Command.from_string(line))
+
+        return simulator.metrics
+
+    def test_counts(self):
+        """Both engines should count the same commands and outcomes.
+        """
+        for simulator in [Simulator(), TableSimulator()]:
+            metrics = self.run_commands(simulator)
+
+            self.assertEqual(metrics.commands.values,
+                             {"PLACE": 2, "MOVE": 4, "LEFT": 1, "RIGHT": 0, "REPORT": 2, "REPEAT": 0, "GOTO": 0})
+            # The first MOVE (unplaced), the second MOVE 3 (partly), the last MOVE and PLACE are rejected.
+            self.assertEqual(metrics.outcomes.values, {"accepted": 3, "rejected": 4})
+            self.assertEqual(metrics.stage_seconds["report"].count, 2)
+            self.assertGreater(metrics.stage_seconds["compute"].count, 0)
+
+    def test_run_stream_counts(self):
+        simulator = TableSimulator()
+        simulator.metrics = SimulatorMetrics()
+        list(simulator.run_stream(CommandStream.from_lines(["MOVE", "PLACE 0,0,NORTH", "MOVE", "LEFT", "MOVE",
+                                                            "REPORT"])))
+
+        self.assertEqual(simulator.metrics.commands.values["MOVE"], 3)
+        self.assertEqual(simulator.metrics.outcomes.values, {"accepted": 3, "rejected": 2})
+
+    def test_exports(self):
+        metrics = self.run_commands(Simulator())
+
+        exported = json.loads(metrics.to_json())
+        self.assertEqual(exported["simulator_commands_total"]["MOVE"], 4)
+        self.assertEqual(exported["simulator_stage_seconds"]["report"]["count"], 2)
+
+        text = metrics.to_prometheus()
+        self.assertIn('simulator_commands_total{type="MOVE"} 4', text)
+        self.assertIn('simulator_command_outcomes_total{outcome="rejected"} 4', text)
+        self.assertIn('simulator_stage_seconds_bucket{stage="report",le="+Inf"} 2', text)
+        self.assertIn('simulator_stage_seconds_count{stage="report"} 2', text)
+
+    def test_server(self):
+        metrics = self.run_commands(Simulator())
+        server = MetricsServer(metrics)
+        server.start()
+
+        try:
+            base = f"http://{server.address[0]}:{server.address[1]}"
+
+            with urllib.request.urlopen(base + "/metrics") as response:
+                self.assertEqual(response.read().decode(), metrics.to_prometheus())
+            with urllib.request.urlopen(base + "/metrics.json") as response:
+                self.assertEqual(json.load(response), metrics.to_dict())
+        finally:
+            server.stop()
+
+
+class TestHistogram(unittest.TestCase):
+    def test_buckets(self):
+        histogram = Histogram("test_seconds", "Test.")
+
+        for seconds in [0, 1e-6, 1.5e-6, 10]:
+            histogram.observe(seconds)
+
+        self.assertEqual(histogram.counts[0], 2)
+        self.assertEqual(histogram.counts[1], 1)
+        self.assertEqual(histogram.counts[-1], 1)
+        self.assertEqual(histogram.count, 4)
+
+
+class TestRateLimitedLogger(unittest.TestCase):
+    def test_rate_limiting(self):
+        now = [0.0]
+        logger = logging.getLogger("test_metrics.rate_limited")
+        rejections = RateLimitedLogger(logger, interval=1.0, clock=lambda: now[0])
+
+        with self.assertLogs(logger, logging.WARNING) as logs:
+            for _ in range(5):
+                rejections.warning("a", "Rejected.")
+            rejections.warning("b", "Other.")
+
+            now[0] = 1.5
+            rejections.warning("a", "Rejected.")
+            rejections.warning("a", "Rejected.")
+            rejections.flush()
+
+        self.assertEqual([record.getMessage() for record in logs.records],
+                         ["Rejected.", "Other.", "Rejected. (4 more like this since the last one.)",
+                          "Rejected. (And 1 more like this, which were not logged.)"])
+
+    def test_flush_rate_limited(self):
+        logger = logging.getLogger("test_metrics.rate_limited")
+        rejections = RateLimitedLogger(logger, interval=1.0, clock=lambda: 0.0)
+
+        with self.assertLogs(logger, logging.WARNING) as logs:
+            for _ in range(3):
+                rejections.warning("a", "Rejected.")
+            flush_rate_limited()
+
+        self.assertEqual([record.getMessage() for record in logs.records],
+                         ["Rejected.", "Rejected. (And 2 more like this, which were not logged.)"])
+
+
+if __name__ == '__main__':
+    unittest.main()
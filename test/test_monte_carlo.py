@@ -0,0 +1,104 @@
+import unittest
+import random
+import sys
+from pathlib import Path
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from monte_carlo import CommandMix, MonteCarloEngine
+from obstacle_map import ObstacleMap
+from simulator import Simulator
+from command import Command
+from pose import Pose
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestMonteCarloEngine(unittest.TestCase):
+    def test_deterministic_mixes(self):
+        start = Pose(1, 1, Pose.Direction.NORTH)
+
+        # Only MOVEs: every trial runs into the edge and stays there.
+        result = MonteCarloEngine(mix=CommandMix(1, 0, 0, 0), steps=10, start=start).run(1000)
+        self.assertEqual(result.most_common(), [(Pose(1, 4, Pose.Direction.NORTH), 1000)])
+        self.assertEqual((result.moves, result.move_rejections), (10000, 7000))
+        self.assertAlmostEqual(result.move_rejection_rate, 0.7)
+
+        # Only LEFTs: every trial turns all the way round, and then some.
+        result = MonteCarloEngine(mix=CommandMix(0, 1, 0, 0), steps=5, start=start).run(10)
+        self.assertEqual(result.most_common(), [(Pose(1, 1, Pose.Direction.WEST), 10)])
+
+        # Nothing happens to a robot that is never placed.
+        result = MonteCarloEngine(mix=CommandMix(1, 1, 1, 0), steps=5).run(10)
+        self.assertEqual((result.unplaced, result.moves, result.trials), (10, 0, 10))
+
+    def test_matches_simulator(self):
+        """Rates and final poses should match those of the Simulator, given the same mix (within sampling error).
+        """
+        obstacles = ObstacleMap([(1, 1), (2, 3)])
+        mix = CommandMix(0.6, 0.15, 0.15, 0.1, place_margin=2)
+        result = MonteCarloEngine([0, 3], [0, 4], obstacles, mix, steps=20).run(100000, seed=3)
+
+        rng = random.Random(3)
+        moves = move_rejections = unplaced = 0
+        trials = 5000
+
+        for _ in range(trials):
+            simulator = Simulator([0, 3], [0, 4], obstacles)
+
+            for _ in range(20):
+                kind = rng.choices(["MOVE", "LEFT", "RIGHT", "PLACE"], weights=[0.6, 0.15, 0.15, 0.1])[0]
+
+                if kind == "PLACE":
+                    pose = Pose(rng.randint(-2, 5), rng.randint(-2, 6), rng.choice(list(Pose.Direction)))
+                    simulator.process_command(Command(Command.Type.PLACE, pose))
+                    continue
+
+                before = simulator.robot_state
+                simulator.process_command(Command.from_string(kind))
+
+                if kind == "MOVE" and before is not None:
+                    moves += 1
+                    move_rejections += simulator.robot_state == before
+
+            unplaced += simulator.robot_state is None
+
+        self.assertEqual(result.trials, 100000)
+        self.assertAlmostEqual(result.move_rejection_rate, move_rejections / moves, delta=0.02)
+        self.assertAlmostEqual(result.unplaced / result.trials, unplaced / trials, delta=0.02)
+        self.assertAlmostEqual(result.place_rejection_rate, 1 - 18 / 72, delta=0.01)
+
+        # Nobody ends up on an obstacle.
+        self.assertEqual(result.histogram[1, 1].sum() + result.histogram[2, 3].sum(), 0)
+
+    def test_reproducible(self):
+        engine = MonteCarloEngine([0, 9], [0, 9], steps=30)
+        engine.batch_size = 1000
+
+        serial = engine.run(5500, seed=7)
+        parallel = engine.run(5500, seed=7, jobs=2)
+        other = engine.run(5500, seed=8)
+
+        np.testing.assert_array_equal(serial.histogram, parallel.histogram)
+        self.assertEqual((serial.moves, serial.move_rejections), (parallel.moves, parallel.move_rejections))
+        self.assertFalse(np.array_equal(serial.histogram, other.histogram))
+        self.assertEqual(serial.trials, 5500)
+
+    def test_invalid(self):
+        with self.assertRaises(RuntimeError):
+            MonteCarloEngine(mix=CommandMix(0, 0, 0, 0))
+        with self.assertRaises(RuntimeError):
+            MonteCarloEngine(start=Pose(9, 9, Pose.Direction.NORTH))
+        with self.assertRaises(RuntimeError):
+            CommandMix.from_string("0.5,0.5")
+
+        self.assertEqual(CommandMix.from_string("1,2,3,4"), CommandMix(1, 2, 3, 4))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+import unittest
+import random
+import sys
+from pathlib import Path
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+from multi_robot_simulator import MultiRobotSimulator
+from simulator import Simulator
+from command import Command, parse_addressed_command
+from pose import Pose
+from obstacle_map import ObstacleMap
+
+
+class TestMultiRobotSimulator(unittest.TestCase):
+    def run_lines(self, sim, lines: list[str]) -> None:
+        for line in lines:
+            sim.process_command(*parse_addressed_command(line))
+
+    def test_parsing(self):
+        self.assertEqual(parse_addressed_command("r2: MOVE 3"), ("r2", Command(Command.Type.MOVE, count=3)))
+        self.assertEqual(parse_addressed_command("robot_1.a-b: PLACE 1,2,EAST"),
+                         ("robot_1.a-b", Command(Command.Type.PLACE, Pose(1, 2, Pose.Direction.EAST))))
+
+        for line in ["MOVE", ": MOVE", "r 2: MOVE", "r2:MOVE", "r2: JUMP"]:
+            with self.assertRaises(RuntimeError):
+                parse_addressed_command(line)
+
+    def test_independent_robots(self):
+        """Robots that never meet should behave exactly as they would on their own.
+        """
+        sim = MultiRobotSimulator()
+        self.run_lines(sim, ["a: PLACE 0,0,NORTH", "b: PLACE 4,4,SOUTH", "a: MOVE", "b: MOVE 2", "a: RIGHT", "c: MOVE"])
+
+        self.assertEqual(sim.pose_of("a"), Pose(0, 1, Pose.Direction.EAST))
+        self.assertEqual(sim.pose_of("b"), Pose(4, 2, Pose.Direction.SOUTH))
+        self.assertIsNone(sim.pose_of("c"))
+        self.assertEqual(len(sim), 2)
+
+        self.assertEqual(sim.robot_at(0, 1), "a")
+        self.assertEqual(sim.robot_at(4, 2), "b")
+        self.assertIsNone(sim.robot_at(0, 0))
+        self.assertIsNone(sim.robot_at(4, 4))
+
+    def test_collisions(self):
+        sim = MultiRobotSimulator()
+        self.run_lines(sim, ["a: PLACE 0,0,NORTH", "b: PLACE 0,2,SOUTH"])
+
+        # Neither can be placed on top of the other, nor move into it.
+        self.run_lines(sim, ["c: PLACE 0,0,EAST", "a: PLACE 0,2,NORTH"])
+        self.assertIsNone(sim.pose_of("c"))
+        self.assertEqual(sim.pose_of("a"), Pose(0, 0, Pose.Direction.NORTH))
+
+        self.run_lines(sim, ["a: MOVE", "b: MOVE"])
+        self.assertEqual(sim.pose_of("a"), Pose(0, 1, Pose.Direction.NORTH))
+        self.assertEqual(sim.pose_of("b"), Pose(0, 2, Pose.Direction.SOUTH))
+
+        # Turning (or being placed again) in place is fine.
+        self.run_lines(sim, ["b: PLACE 0,2,EAST", "a: LEFT 3"])
+        self.assertEqual(sim.pose_of("b"), Pose(0, 2, Pose.Direction.EAST))
+        self.assertEqual(sim.pose_of("a"), Pose(0, 1, Pose.Direction.EAST))
+
+        # Cells are freed as soon as robots leave them.
+        self.run_lines(sim, ["b: MOVE", "a: LEFT", "a: MOVE"])
+        self.assertEqual(sim.pose_of("a"), Pose(0, 2, Pose.Direction.NORTH))
+        self.assertIsNone(sim.robot_at(0, 1))
+        self.assertEqual(sim.robot_at(1, 2), "b")
+
+    def test_counted_moves(self):
+        """A MOVE n stops right before the first robot in its way, wherever along the way that is.
+        """
+        sim = MultiRobotSimulator(obstacles=ObstacleMap([(4, 0)]))
+        self.run_lines(sim, ["a: PLACE 0,0,EAST", "b: PLACE 2,0,NORTH", "a: MOVE 4"])
+        self.assertEqual(sim.pose_of("a"), Pose(1, 0, Pose.Direction.EAST))
+
+        self.run_lines(sim, ["b: MOVE", "a: MOVE 4"])
+        self.assertEqual(sim.pose_of("a"), Pose(3, 0, Pose.Direction.EAST))
+
+        self.run_lines(sim, ["b: PLACE 2,2,SOUTH", "b: MOVE 3"])
+        self.assertEqual(sim.pose_of("b"), Pose(2, 0, Pose.Direction.SOUTH))
+
+        self.run_lines(sim, ["a: LEFT 2", "a: MOVE 4"])
+        self.assertEqual(sim.pose_of("a"), Pose(3, 0, Pose.Direction.WEST))
+
+    def test_repeat(self):
+        sim = MultiRobotSimulator()
+        self.run_lines(sim, ["a: PLACE 0,0,NORTH", "b: PLACE 1,3,WEST", "a: REPEAT 1000001 { MOVE 4; RIGHT }"])
+
+        # "a" keeps going around a 4x4 square, but "b" cuts its first lap short.
+        reference = Simulator()
+        for line in ["PLACE 0,0,NORTH", "MOVE 2", "RIGHT", "REPEAT 1000000 { MOVE 4; RIGHT }"]:
+            reference.process_command(Command.from_string(line))
+
+        self.assertEqual(sim.pose_of("a"), reference.robot_state)
+
+    def test_against_reference(self):
+        """Robots that only ever go up and down their own columns never meet, so each of them should end up where a
+        Simulator would put it.
+        """
+        rng = random.Random(11)
+        sim = MultiRobotSimulator([0, 9], [0, 9])
+        references = {}
+        lines = []
+
+        for index in range(10):
+            references[f"r{index}"] = Simulator([0, 9], [0, 9])
+            lines.append(f"r{index}: PLACE {index},{rng.randrange(10)},NORTH")
+
+        steps = ["MOVE", "MOVE 3", "LEFT 2", "RIGHT 2", "REPEAT 3 { MOVE; LEFT 2 }", "REPORT"]
+        lines += [f"r{rng.randrange(10)}: {rng.choice(steps)}" for _ in range(2000)]
+
+        for line in lines:
+            robot, command = parse_addressed_command(line)
+            sim.process_command(robot, command)
+            references[robot].process_command(command)
+
+        for robot, reference in references.items():
+            self.assertEqual(sim.pose_of(robot), reference.robot_state)
+
+    def test_events(self):
+        sim = MultiRobotSimulator()
+        reports, changes = [], []
+        sim.subscribe(Simulator.Event.REPORT, reports.append)
+        sim.subscribe(Simulator.Event.CHANGE, changes.append)
+
+        self.run_lines(sim, ["a: REPORT", "a: PLACE 0,0,NORTH", "b: PLACE 0,0,NORTH", "b: PLACE 1,1,EAST", "a: REPORT",
+                             "b: REPORT", "b: MOVE 10"])
+
+        self.assertEqual([(state.robot, state.pose) for state in reports],
+                         [("a", Pose(0, 0, Pose.Direction.NORTH)), ("b", Pose(1, 1, Pose.Direction.EAST))])
+        self.assertEqual([state.robot for state in changes], ["a", "b", "b"])
+
+        sim.reset()
+        self.assertEqual(len(sim), 0)
+        self.assertIsNone(sim.robot_at(0, 0))
+
+    def test_many_robots(self):
+        """Collision checks should still be right with a hundred thousand robots on the table.
+        """
+        sim = MultiRobotSimulator([0, 999], [0, 999])
+        place = Command.from_string
+
+        for index in range(100000):
+            sim.process_command(str(index), place(f"PLACE {index % 1000},{index // 1000},NORTH"))
+
+        self.assertEqual(len(sim), 100000)
+
+        # Every robot is right behind another one, except for those in the front row.
+        move = Command(Command.Type.MOVE)
+        for index in range(100000):
+            sim.process_command(str(index), move)
+
+        self.assertEqual(sim.pose_of("12345"), Pose(345, 12, Pose.Direction.NORTH))
+        self.assertEqual(sim.pose_of("99345"), Pose(345, 100, Pose.Direction.NORTH))
+        self.assertEqual(sim.robot_at(345, 100), "99345")
+        self.assertIsNone(sim.robot_at(345, 99))
@@ -0,0 +1,94 @@
+import unittest
+import tempfile
+import random
+import sys
+import os
+from pathlib import Path
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+from obstacle_map import ObstacleMap
+
+
+class TestObstacleMap(unittest.TestCase):
+    def test_blocked(self):
+        cells = [(0, 0), (3, -2), (-5, 7), (-1, -1), (2 ** 20, 2 ** 30)]
+        obstacles = ObstacleMap(cells)
+
+        for x, y in cells:
+            self.assertTrue(obstacles.blocked(x, y))
+
+        self.assertFalse(obstacles.blocked(0, 1))
+        self.assertFalse(obstacles.blocked(1, 0))
+        self.assertFalse(obstacles.blocked(-1, 1))
+
+        self.assertEqual(len(obstacles), len(cells))
+        self.assertCountEqual(list(obstacles), cells)
+
+        obstacles.add(0, 1)
+        self.assertTrue(obstacles.blocked(0, 1))
+
+    def test_free_steps(self):
+        obstacles = ObstacleMap([(5, 0), (0, 5), (-3, 0), (0, -2)])
+
+        self.assertEqual(obstacles.free_steps(0, 0, 1, 0, 100), 4)
+        self.assertEqual(obstacles.free_steps(0, 0, 0, 1, 100), 4)
+        self.assertEqual(obstacles.free_steps(0, 0, -1, 0, 100), 2)
+        self.assertEqual(obstacles.free_steps(0, 0, 0, -1, 100), 1)
+        self.assertEqual(obstacles.free_steps(0, 0, 1, 0, 3), 3)
+        self.assertEqual(obstacles.free_steps(6, 0, 1, 0, 100), 100)
+        self.assertEqual(obstacles.free_steps(1, 1, 1, 0, 100), 100)
+
+        # The index should keep up with obstacles added later on.
+        obstacles.add(2, 0)
+        self.assertEqual(obstacles.free_steps(0, 0, 1, 0, 100), 1)
+
+    def test_random_free_steps(self):
+        """Finding the nearest obstacle should agree with walking up to it.
+        """
+        rng = random.Random(3)
+        obstacles = ObstacleMap((rng.randint(-20, 20), rng.randint(-20, 20)) for _ in range(200))
+
+        for _ in range(500):
+            x, y = rng.randint(-20, 20), rng.randint(-20, 20)
+            step_x, step_y = rng.choice([(1, 0), (-1, 0), (0, 1), (0, -1)])
+
+            steps = 0
+            while steps < 30 and not obstacles.blocked(x + (steps + 1) * step_x, y + (steps + 1) * step_y):
+                steps += 1
+
+            self.assertEqual(obstacles.free_steps(x, y, step_x, step_y, 30), steps)
+
+    def test_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "obstacles.txt")
+
+            with open(path, "w") as file:
+                file.write("# A few obstacles\n1,2\n-3,4 # and a comment\n\n5,-6\n")
+
+            obstacles = ObstacleMap.load(path)
+            self.assertEqual(obstacles, ObstacleMap([(1, 2), (-3, 4), (5, -6)]))
+
+            obstacles.save(path)
+            self.assertEqual(ObstacleMap.load(path), obstacles)
+
+            for contents in ["1,2,3\n", "1\n", "1,a\n", "1;2\n", "1,-\n", "1,2 3,4\n", "--1,2\n", "1,4294967296\n"]:
+                with open(path, "w") as file:
+                    file.write("0,0\n\n# Fine so far\n" + contents + "5,5\n")
+
+                with self.assertRaisesRegex(RuntimeError, "line 4:"):
+                    ObstacleMap.load(path)
+
+    def test_out_of_range(self):
+        """Cells that cannot be told apart from others should be rejected, rather than block the others.
+        """
+        self.assertRaises(RuntimeError, lambda: ObstacleMap([(0, 2 ** 32)]))
+
+        obstacles = ObstacleMap([(0, 0)])
+        self.assertRaises(RuntimeError, lambda: obstacles.add(0, -2 ** 31 - 1))
+        self.assertFalse(obstacles.blocked(0, 2 ** 32))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+import random
+import sys
+from pathlib import Path
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+from optimizer import StreamOptimizer
+from simulator import Simulator
+from command import Command
+from obstacle_map import ObstacleMap
+
+
+def run(commands, obstacles=None):
+    """Runs commands the way main.py does, returning the REPORTed poses and the final pose.
+    """
+    sim = Simulator(obstacles=obstacles)
+    reports = []
+
+    for command in commands:
+        if command.type != Command.Type.REPORT:
+            sim.process_command(command)
+        elif sim.robot_state is not None:
+            reports.append(sim.robot_state)
+
+    return reports, sim.robot_state
+
+
+class TestStreamOptimizer(unittest.TestCase):
+    """Test that optimised streams are shorter, but otherwise indistinguishable.
+    """
+
+    def parse(self, lines: list[str]) -> list[Command]:
+        return [Command.from_string(line) for line in lines]
+
+    def test_before_placement(self):
+        optimizer = StreamOptimizer()
+        output = list(optimizer.optimize(self.parse(["MOVE", "REPORT", "LEFT", "PLACE 1,1,NORTH", "REPORT"])))
+
+        self.assertEqual(output, self.parse(["PLACE 1,1,NORTH", "REPORT"]))
+        self.assertEqual(optimizer.statistics.before_placement, 3)
+
+    def test_overwritten(self):
+        optimizer = StreamOptimizer()
+        output = list(optimizer.optimize(self.parse(["PLACE 1,1,NORTH", "MOVE", "PLACE 9,9,NORTH", "LEFT",
+                                                     "PLACE 2,2,EAST", "REPORT"])))
+
+        self.assertEqual(output, self.parse(["PLACE 2,2,EAST", "REPORT"]))
+        self.assertEqual(optimizer.statistics.invalid_placements, 1)
+
+    def test_turns(self):
+        output = list(StreamOptimizer().optimize(self.parse(["PLACE 1,1,NORTH", "REPORT", "LEFT", "RIGHT", "MOVE",
+                                                             "LEFT", "LEFT", "LEFT", "LEFT", "MOVE", "RIGHT", "RIGHT",
+                                                             "REPORT"])))
+
+        self.assertEqual(output, self.parse(["PLACE 1,1,NORTH", "REPORT", "MOVE 2", "LEFT 2", "REPORT"]))
+
+    def test_turns_folded_into_placement(self):
+        output = list(StreamOptimizer().optimize(self.parse(["PLACE 1,1,NORTH", "RIGHT", "REPORT"])))
+
+        self.assertEqual(output, self.parse(["PLACE 1,1,EAST", "REPORT"]))
+
+    def test_trailing(self):
+        optimizer = StreamOptimizer(keep_final_state=False)
+        output = list(optimizer.optimize(self.parse(["PLACE 1,1,NORTH", "REPORT", "MOVE", "LEFT"])))
+
+        self.assertEqual(output, self.parse(["PLACE 1,1,NORTH", "REPORT"]))
+        self.assertEqual(optimizer.statistics.trailing, 2)
+
+    def test_placing_repeat(self):
+        """REPEAT blocks that may place the robot must survive, even before the first PLACE.
+        """
+        lines = ["REPEAT 2 { MOVE }", "REPEAT 2 { PLACE 0,0,NORTH; MOVE }", "REPORT"]
+        output = list(StreamOptimizer().optimize(self.parse(lines)))
+
+        self.assertEqual(output, self.parse(lines[1:]))
+
+    def test_random_streams(self):
+        """Random streams should REPORT the same poses and end in the same state, optimised or not.
+        """
+        rng = random.Random(5)
+        choices = ["MOVE", "MOVE", "MOVE", "LEFT", "RIGHT", "RIGHT 3", "MOVE 2", "REPORT", "PLACE 1,2,EAST",
+                   "PLACE 7,0,NORTH", "REPEAT 3 { MOVE; LEFT }"]
+
+        for _ in range(50):
+            commands = self.parse([rng.choice(choices) for _ in range(200)])
+            optimizer = StreamOptimizer()
+            optimised = list(optimizer.optimize(commands))
+
+            self.assertEqual(run(optimised), run(commands))
+            self.assertLess(len(optimised), len(commands))
+            self.assertEqual(optimizer.statistics.commands_out, len(optimised))
+
+    def test_obstacles(self):
+        """PLACEs onto obstacles can never be accepted either.
+        """
+        obstacles = ObstacleMap([(1, 2), (3, 3)])
+        rng = random.Random(6)
+        choices = ["MOVE", "MOVE 2", "LEFT", "RIGHT", "REPORT", "PLACE 1,2,EAST", "PLACE 1,1,NORTH", "PLACE 3,0,NORTH"]
+
+        for _ in range(50):
+            commands = self.parse([rng.choice(choices) for _ in range(200)])
+            optimizer = StreamOptimizer(obstacles=obstacles)
+
+            self.assertEqual(run(optimizer.optimize(commands), obstacles), run(commands, obstacles))
+
+
+if __name__ == "__main__":
+    unittest.main()
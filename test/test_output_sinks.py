@@ -0,0 +1,102 @@
+import unittest
+import struct
+import json
+import sys
+import io
+from pathlib import Path
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+from output_sinks import SINKS, OutputSink, ShortSink, CsvSink, JsonlSink, BinarySink
+from user_interface import UserInterface
+from state import State
+from pose import Pose
+
+
+class CountingStream(io.BytesIO):
+    """A BytesIO that keeps count of how many times it was written to."""
+
+    writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        return super().write(data)
+
+
+poses = [Pose(0, 1, Pose.Direction.NORTH), Pose(4, 2, Pose.Direction.WEST), Pose(0, 1, Pose.Direction.NORTH)]
+
+
+class TestOutputSinks(unittest.TestCase):
+    def output_of(self, sink_type, source=None) -> bytes:
+        stream = io.BytesIO()
+
+        with sink_type(stream) as sink:
+            sink.write_many(poses, source)
+
+        return stream.getvalue()
+
+    def test_short(self):
+        self.assertEqual(self.output_of(ShortSink).decode().splitlines(),
+                         [pose.to_short_string() for pose in poses])
+        self.assertEqual(self.output_of(ShortSink, "a.txt").decode().splitlines()[1], "a.txt: 4,2,Direction.WEST")
+
+    def test_csv(self):
+        self.assertEqual(self.output_of(CsvSink).decode().splitlines(),
+                         ["x,y,direction", "0,1,NORTH", "4,2,WEST", "0,1,NORTH"])
+        self.assertEqual(self.output_of(CsvSink, 'odd,"name"').decode().splitlines()[:2],
+                         ["source,x,y,direction", '"odd,""name""",0,1,NORTH'])
+
+    def test_jsonl(self):
+        records = [json.loads(line) for line in self.output_of(JsonlSink, "a.txt").decode().splitlines()]
+
+        self.assertEqual(records[1], {"source": "a.txt", "x": 4, "y": 2, "direction": "WEST"})
+        self.assertEqual(len(records), 3)
+
+    def test_binary(self):
+        records = list(struct.iter_unpack("<iiB", self.output_of(BinarySink)))
+
+        self.assertEqual(records, [(0, 1, 0), (4, 2, 3), (0, 1, 0)])
+
+        with self.assertRaises(RuntimeError):
+            self.output_of(BinarySink, "a.txt")
+
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            OutputSink(io.BytesIO())
+
+    def test_buffering(self):
+        """Output should only be written out once a buffer's worth has been collected (or when flushed).
+        """
+        for sink_type in SINKS.values():
+            stream = CountingStream()
+            sink = sink_type(stream, buffer_size=1000)
+
+            sink.write_many(poses * 100)
+            written = len(stream.getvalue())
+            self.assertGreater(stream.writes, 0)
+            self.assertLessEqual(stream.writes, written // 1000)
+
+            sink.flush()
+            self.assertGreater(len(stream.getvalue()), written)
+
+            # Without a buffer, every record should be written out at once.
+            stream = CountingStream()
+            sink_type(stream, buffer_size=0).write_many(poses)
+            self.assertEqual(stream.writes, len(poses))
+
+    def test_user_interface(self):
+        """The interface should output into its sink, if it has one.
+        """
+        interface = UserInterface()
+        interface.sink = CsvSink(io.BytesIO())
+
+        interface.report_state(State(poses[0]))
+        interface.report_poses(poses[1:])
+        interface.flush()
+
+        self.assertEqual(interface.sink.stream.getvalue(), self.output_of(CsvSink))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import unittest
+import tempfile
+import random
+import sys
+import os
+from pathlib import Path
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+from parallel_replay import ParallelReplayer, split_file
+from simulator import Simulator
+from command_stream import CommandStream
+from obstacle_map import ObstacleMap
+from helpers import replay_serially
+
+
+class TestParallelReplay(unittest.TestCase):
+    """Test that replaying a file in parallel gives the same results as doing it serially.
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "commands.txt")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, lines: list[str], end: str = "\n") -> None:
+        with open(self.path, "w") as file:
+            file.write("\n".join(lines) + end)
+
+    def random_lines(self, count: int, place_probability: float) -> list[str]:
+        rng = random.Random(7)
+        lines = []
+
+        for _ in range(count):
+            if rng.random() < place_probability:
+                lines.append(f"PLACE {rng.randint(-1, 5)},{rng.randint(-1, 5)},"
+                             f"{rng.choice(['NORTH', 'SOUTH', 'EAST', 'WEST'])}")
+            else:
+                lines.append(rng.choice(["MOVE", "MOVE", "LEFT", "RIGHT", "REPORT", "MOVE 3", "RIGHT 2",
+                                         "REPEAT 5 { MOVE 2; LEFT }"]))
+
+        return lines
+
+    def check(self, lines: list[str], jobs: int = 2, end: str = "\n") -> None:
+        self.write(lines, end)
+        expected_reports, expected_state = replay_serially(lines)
+
+        replayer = ParallelReplayer(jobs)
+        reports = list(replayer.replay(self.path))
+
+        self.assertEqual(reports, expected_reports)
+        self.assertEqual(replayer.robot_state, expected_state)
+
+    def test_many_placements(self):
+        self.check(self.random_lines(5000, 0.05))
+
+    def test_single_placement(self):
+        """A single PLACE at the start means no chunk but the first knows where it starts.
+        """
+        self.check(["PLACE 2,2,NORTH"] + self.random_lines(3000, 0.0))
+
+    def test_obstacles(self):
+        lines = self.random_lines(3000, 0.05)
+        self.write(lines)
+        obstacles = ObstacleMap([(1, 1), (2, 3), (4, 0)])
+
+        sim = Simulator(obstacles=obstacles)
+        reports = list(sim.run_stream(CommandStream.from_lines(lines)))
+
+        replayer = ParallelReplayer(2, obstacles=obstacles)
+        self.assertEqual(list(replayer.replay(self.path)), reports)
+        self.assertEqual(replayer.robot_state, sim.robot_state)
+
+    def test_never_placed(self):
+        self.check(["MOVE", "REPORT", "LEFT"] * 100)
+
+    def test_macros(self):
+        """Macros may PLACE the robot too, including before the first PLACE of a chunk.
+        """
+        self.check(["REPEAT 12 { PLACE 1,1,EAST; MOVE 2 }", "REPORT"] + self.random_lines(100, 0.0))
+
+        rng = random.Random(11)
+        macros = ["REPEAT 12 { PLACE 1,1,EAST; MOVE 2 }", "REPEAT 3 { MOVE; PLACE 7,7,NORTH }", "MOVE 4", "LEFT 3",
+                  "REPEAT 2 { REPEAT 3 { MOVE; RIGHT }; PLACE 0,4,SOUTH }", "REPEAT 5 { LEFT 2; MOVE 9 }"]
+
+        for seed in range(3):
+            lines = self.random_lines(2000, 0.0)
+            rng.seed(seed)
+
+            for _ in range(20):
+                lines.insert(rng.randrange(len(lines)), rng.choice(macros))
+
+            self.check(lines)
+
+    def test_no_trailing_newline(self):
+        """The last line counts even if the file does not end with a line break.
+        """
+        self.check(["PLACE 0,0,NORTH", "MOVE", "REPORT", "MOVE", "REPORT"], end="")
+        self.check(["PLACE 2,2,NORTH"] + self.random_lines(3000, 0.0) + ["REPORT"], end="")
+
+    def test_stops_at_invalid_line(self):
+        lines = self.random_lines(3000, 0.05)
+        self.write(lines[:1000] + ["NOPE"] + lines[1000:])
+
+        expected_reports, expected_state = replay_serially(lines[:1000])
+
+        replayer = ParallelReplayer(2)
+        self.assertEqual(list(replayer.replay(self.path)), expected_reports)
+        self.assertEqual(replayer.robot_state, expected_state)
+
+    def test_split_on_line_boundaries(self):
+        self.write(self.random_lines(1000, 0.1))
+
+        with open(self.path, "rb") as file:
+            data = file.read()
+
+        ranges = split_file(self.path, 7)
+
+        self.assertEqual(b"".join(data[start:end] for start, end in ranges), data)
+
+        for _, end in ranges:
+            self.assertEqual(data[end - 1:end], b"\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
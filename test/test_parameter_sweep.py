@@ -0,0 +1,92 @@
+import unittest
+import random
+import sys
+from pathlib import Path
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from simulator import Simulator
+from command_stream import CommandStream
+from command import Command
+from pose import Pose
+
+if np is not None:
+    from parameter_sweep import ParameterSweep, SweepConfiguration, configuration_grid
+
+
+def random_lines(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    lines = []
+
+    for _ in range(count):
+        line = rng.choices(["MOVE", "LEFT", "RIGHT", "REPORT", "PLACE", "MOVE 4", "LEFT 3", "REPEAT 9 { MOVE 2; RIGHT }"],
+                           weights=[8, 2, 2, 2, 1, 1, 1, 1])[0]
+
+        if line == "PLACE":
+            line = f"PLACE {rng.randint(-1, 9)},{rng.randint(-1, 9)},{rng.choice(list(Pose.Direction)).name}"
+
+        lines.append(line)
+
+    return lines
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestParameterSweep(unittest.TestCase):
+    """Test that every configuration of a sweep ends up exactly where a Simulator on its table would.
+    """
+
+    def simulate(self, configuration, stream: CommandStream) -> tuple[list[Pose], Pose]:
+        simulator = Simulator(configuration.x_range, configuration.y_range)
+        reports = []
+        simulator.subscribe(Simulator.Event.REPORT, lambda state: reports.append(state.pose))
+
+        if configuration.start is not None:
+            simulator.process_command(Command(Command.Type.PLACE, configuration.start))
+
+        for command in stream:
+            simulator.process_command(command)
+
+        return reports, simulator.robot_state
+
+    def test_matches_simulator(self):
+        stream = CommandStream.from_lines(random_lines(3000, 1))
+        starts = [None, Pose(0, 0, Pose.Direction.NORTH), Pose(4, 7, Pose.Direction.WEST)]
+        configurations = configuration_grid([(1, 1), (3, 8), (5, 5), (10, 2), (12, 12)], starts)
+        configurations.append(SweepConfiguration((-3, 2), (2, 6), Pose(-1, 3, Pose.Direction.SOUTH)))
+
+        result = ParameterSweep(configurations).run(stream)
+
+        self.assertEqual(len(configurations), 16)
+        self.assertEqual(result.report_x.shape, (bytes(stream.opcodes).count(CommandStream.REPORT), 16))
+
+        for index, configuration in enumerate(configurations):
+            reports, final = self.simulate(configuration, stream)
+
+            self.assertEqual(result.reports(index), reports)
+            self.assertEqual(result.final_pose(index), final)
+
+    def test_without_reports(self):
+        stream = CommandStream.from_lines(["PLACE 1,1,EAST", "MOVE", "RIGHT", "MOVE", "MOVE", "REPORT"])
+        result = ParameterSweep(configuration_grid([(2, 2), (3, 3)])).run(stream, keep_reports=False)
+
+        self.assertEqual(result.final_pose(0), Pose(1, 0, Pose.Direction.SOUTH))
+        self.assertEqual(result.final_pose(1), Pose(2, 0, Pose.Direction.SOUTH))
+
+        with self.assertRaises(RuntimeError):
+            result.reports(0)
+
+    def test_empty_stream(self):
+        result = ParameterSweep(configuration_grid([(2, 2)], [Pose(5, 5, Pose.Direction.EAST)])).run(CommandStream())
+
+        self.assertIsNone(result.final_pose(0))
+        self.assertEqual(result.reports(0), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,199 @@
+import unittest
+import random
+import sys
+from pathlib import Path
+from unittest import mock
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+from planner import PathPlanner
+from pose_space import PoseSpace
+from obstacle_map import ObstacleMap
+from simulator import Simulator
+from table_simulator import TableSimulator
+from bulk_parser import BulkParser
+from history import HistoryRecorder
+from metrics import SimulatorMetrics
+from command import Command, parse_string_into_command
+from pose import Pose
+
+# A wall across the middle of the table, with a single gap at the top.
+_WALL = ObstacleMap([(3, y) for y in range(0, 5)])
+
+
+def random_pose(rng: random.Random) -> Pose:
+    return Pose(rng.randint(0, 6), rng.randint(0, 5), rng.choice(list(Pose.Direction)))
+
+
+class TestPathPlanner(unittest.TestCase):
+    def replay(self, start: Pose, commands: list[Command]) -> Pose:
+        simulator = Simulator([0, 6], [0, 5], _WALL)
+        simulator.process_command(Command(Command.Type.PLACE, start))
+
+        for command in commands:
+            simulator.process_command(command)
+
+        return simulator.robot_state
+
+    def test_plans_are_shortest(self):
+        rng = random.Random(7)
+        planner = PathPlanner(PoseSpace([0, 6], [0, 5], _WALL))
+
+        # The other side of the wall can only be reached through the gap.
+        self.assertEqual(planner.distance(Pose(2, 0, Pose.Direction.EAST), Pose(4, 0, Pose.Direction.EAST)), 16)
+        self.assertEqual(planner.distance(Pose(0, 0, Pose.Direction.NORTH), Pose(0, 0, Pose.Direction.SOUTH)), 2)
+        self.assertEqual(planner.distance(Pose(0, 0, Pose.Direction.NORTH), Pose(0, 0, Pose.Direction.NORTH)), 0)
+
+        for _ in range(200):
+            start, target = random_pose(rng), random_pose(rng)
+            distance = planner.distance(start, target)
+            commands = planner.plan(start, target)
+
+            if _WALL.blocked(start.x, start.y) or _WALL.blocked(target.x, target.y):
+                self.assertIsNone(distance)
+                self.assertIsNone(commands)
+                continue
+
+            self.assertEqual(sum(command.count for command in commands), distance)
+            self.assertEqual(self.replay(start, commands), target)
+
+    def test_search_matches_fields(self):
+        """Tables too large for distance fields are searched with A*, which should find paths just as short.
+        """
+        rng = random.Random(8)
+        planner = PathPlanner(PoseSpace([0, 6], [0, 5], _WALL))
+        searcher = PathPlanner(PoseSpace([0, 6], [0, 5], _WALL))
+        searcher.max_field_poses = 0
+
+        for _ in range(100):
+            start, target = random_pose(rng), random_pose(rng)
+            commands = searcher.plan(start, target)
+
+            self.assertEqual(searcher.distance(start, target), planner.distance(start, target))
+
+            if commands is not None:
+                self.assertEqual(self.replay(start, commands), target)
+
+        self.assertFalse(searcher.gave_up)
+
+        # Giving up is not the same as finding there is no path.
+        searcher.max_expansions = 10
+        self.assertIsNone(searcher.distance(Pose(0, 0, Pose.Direction.NORTH), Pose(6, 5, Pose.Direction.SOUTH)))
+        self.assertTrue(searcher.gave_up)
+
+    def test_fields_follow_obstacles(self):
+        obstacles = ObstacleMap()
+        planner = PathPlanner(PoseSpace([0, 4], [0, 4], obstacles))
+        start, target = Pose(0, 0, Pose.Direction.EAST), Pose(2, 0, Pose.Direction.EAST)
+
+        self.assertEqual(planner.distance(start, target), 2)
+
+        # Fields are dropped as soon as the table changes, and only then.
+        obstacles.add(1, 0)
+        self.assertEqual(planner.distance(start, target), 8)
+        self.assertEqual(sum(command.count for command in planner.plan(start, target)), 8)
+
+        for x in range(0, 5):
+            obstacles.add(x, 1)
+        self.assertIsNone(planner.distance(start, target))
+
+    def test_cache_is_bounded(self):
+        """Fields are kept for fewer targets on larger tables, so that they never take more than so much memory.
+        """
+        planner = PathPlanner(PoseSpace([0, 6], [0, 5], _WALL))
+        planner.max_cached_poses = 3 * planner.pose_space.size
+        start = Pose(0, 0, Pose.Direction.NORTH)
+        targets = [Pose(x, 5, Pose.Direction.SOUTH) for x in range(7)]
+
+        builds = []
+        build_field = planner._PathPlanner__build_field
+        planner._PathPlanner__build_field = lambda target: builds.append(target) or build_field(target)
+
+        for target in targets:
+            planner.distance(start, target)
+        self.assertEqual(len(builds), 7)
+
+        # Only the latest three fields are still there, so those take a lookup and the others a new search.
+        for target in targets[-3:] + targets[:1]:
+            planner.distance(start, target)
+        self.assertEqual(len(builds), 8)
+
+
+class TestGoto(unittest.TestCase):
+    lines = ["GOTO 1,1,NORTH", "PLACE 0,0,NORTH", "GOTO 7,5,NORTH", "GOTO 4,0,WEST", "REPORT", "GOTO 3,2,SOUTH",
+             "GOTO 6,5,EAST", "REPORT", "PLACE 6,0,NORTH", "GOTO 0,5,WEST", "REPORT", "GOTO 0,5,WEST", "REPORT"]
+
+    def test_parsing(self):
+        command = parse_string_into_command("GOTO 1,2,NORTH")
+
+        self.assertEqual(command.type, Command.Type.GOTO)
+        self.assertEqual(command.pose, Pose(1, 2, Pose.Direction.NORTH))
+
+        for invalid in ["GOTO", "GOTO 1,2", "GOTO 1,2,UP", "GOTO 2 1,2,NORTH"]:
+            self.assertIsNone(parse_string_into_command(invalid))
+
+    def test_engines_agree(self):
+        reports = {}
+
+        for engine in [Simulator, TableSimulator]:
+            simulator = engine([0, 6], [0, 5], _WALL)
+            reports[engine] = []
+            simulator.subscribe(Simulator.Event.REPORT, lambda state: reports[engine].append(state.pose))
+
+            for line in self.lines:
+                simulator.process_command(parse_string_into_command(line))
+
+        # Targets off the table, on an obstacle, or that cannot be reached (yet) are ignored.
+        self.assertEqual(reports[Simulator], [Pose(4, 0, Pose.Direction.WEST), Pose(6, 5, Pose.Direction.EAST),
+                                              Pose(0, 5, Pose.Direction.WEST), Pose(0, 5, Pose.Direction.WEST)])
+        self.assertEqual(reports[TableSimulator], reports[Simulator])
+
+    def test_search_limit(self):
+        """Giving up on a search is reported as such, rather than as the target being unreachable.
+        """
+        for engine, logger in [(Simulator, "simulator"), (TableSimulator, "table_simulator")]:
+            with mock.patch.object(PathPlanner, "max_field_poses", 0), \
+                    mock.patch.object(PathPlanner, "max_expansions", 10):
+                simulator = engine([0, 6], [0, 5], _WALL)
+
+                with self.assertLogs(logger, "WARNING") as logs:
+                    for line in ["PLACE 0,0,NORTH", "GOTO 6,5,SOUTH"]:
+                        simulator.process_command(parse_string_into_command(line))
+
+            self.assertIn("Gave up looking for a route", logs.output[-1])
+            self.assertEqual(simulator.robot_state, Pose(0, 0, Pose.Direction.NORTH))
+
+    def test_route_is_followed(self):
+        """Subscribers, metrics and recorders should see every step along the way, not just the target.
+        """
+        for engine in [Simulator, TableSimulator]:
+            simulator = HistoryRecorder(engine([0, 6], [0, 5], _WALL))
+            simulator.simulator.metrics = SimulatorMetrics()
+            changes = []
+            simulator.subscribe(Simulator.Event.CHANGE, lambda state: changes.append(state.pose))
+
+            for line in ["PLACE 2,0,EAST", "GOTO 4,0,EAST", "GOTO 9,9,EAST", "REPORT"]:
+                simulator.process_command(parse_string_into_command(line))
+
+            self.assertEqual(len(changes), 1 + 16)
+            self.assertEqual(changes[-1], Pose(4, 0, Pose.Direction.EAST))
+            self.assertEqual(len(simulator), 1 + 16 + 2)
+            self.assertEqual([simulator.pose_at(step) for step in range(1, 18)], changes)
+
+            # Every step along the route is a command of its own (on top of the GOTO it is part of).
+            counts = simulator.simulator.metrics.commands.values
+            self.assertEqual((counts["GOTO"], counts["MOVE"] + counts["LEFT"] + counts["RIGHT"]), (2, 16))
+            self.assertEqual(simulator.simulator.metrics.outcomes.values, {"accepted": 1 + 16, "rejected": 1})
+
+            for before, after in zip(changes, changes[1:]):
+                self.assertEqual(PathPlanner(PoseSpace([0, 6], [0, 5], _WALL)).distance(before, after), 1)
+
+    def test_not_in_bulk(self):
+        lines = ["PLACE 0,0,NORTH", "MOVE", "GOTO 1,1,NORTH", "REPORT"]
+        with self.assertRaisesRegex(RuntimeError, "Line 3:"):
+            list(BulkParser().parse_chunks(["\n".join(lines).encode()]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+import tempfile
+import asyncio
+import sys
+import os
+from pathlib import Path
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+from server import SimulatorServer, parse_address, open_connection
+from table_simulator import TableSimulator
+from load_client import generate_load
+
+
+class TestParseAddress(unittest.TestCase):
+    def test_addresses(self):
+        self.assertEqual(parse_address("localhost:8000"), ("tcp", "localhost", 8000))
+        self.assertEqual(parse_address(":8000"), ("tcp", None, 8000))
+        self.assertEqual(parse_address("[::1]:8000"), ("tcp", "::1", 8000))
+        self.assertEqual(parse_address("unix:/tmp/robot.sock"), ("unix", "/tmp/robot.sock"))
+
+        with self.assertRaises(RuntimeError):
+            parse_address("localhost")
+        with self.assertRaises(RuntimeError):
+            parse_address("localhost:http")
+
+
+class TestSimulatorServer(unittest.IsolatedAsyncioTestCase):
+    """Test the SimulatorServer class, over real (local) connections.
+    """
+
+    async def asyncSetUp(self):
+        self.server = SimulatorServer()
+        tcp_server = await self.server.start("127.0.0.1:0")
+        self.address = f"127.0.0.1:{tcp_server.sockets[0].getsockname()[1]}"
+
+    async def asyncTearDown(self):
+        await self.server.close()
+
+    async def test_session(self):
+        """A session should behave just like a live one, REPORTs included.
+        """
+        reader, writer = await open_connection(self.address)
+
+        writer.write(b"MOVE\nREPORT\nPLACE 0,0,NORTH\nMOVE\nREPORT\r\nRIGHT 2\nREPORT\n")
+        self.assertEqual(await reader.readline(), b"0,1,Direction.NORTH\n")
+        self.assertEqual(await reader.readline(), b"0,1,Direction.SOUTH\n")
+
+        # Lines split across writes should be put back together.
+        writer.write(b"MO")
+        await writer.drain()
+        writer.write(b"VE\nREPO")
+        await writer.drain()
+        writer.write(b"RT\n")
+        self.assertEqual(await reader.readline(), b"0,0,Direction.SOUTH\n")
+
+        writer.close()
+        await writer.wait_closed()
+
+    async def test_invalid_command(self):
+        """An invalid command should end the session, after any output before it has been written.
+        """
+        reader, writer = await open_connection(self.address)
+
+        writer.write(b"PLACE 1,1,EAST\nREPORT\nJUMP\nREPORT\n")
+        self.assertEqual(await reader.read(), b"1,1,Direction.EAST\n")
+
+        writer.close()
+        await writer.wait_closed()
+
+    async def test_blank_line(self):
+        """A blank line is an invalid command, just as in a live session.
+        """
+        reader, writer = await open_connection(self.address)
+
+        writer.write(b"PLACE 1,1,EAST\nREPORT\n\nREPORT\n")
+        self.assertEqual(await reader.read(), b"1,1,Direction.EAST\n")
+
+        writer.close()
+        await writer.wait_closed()
+
+    async def test_last_line(self):
+        """The last line should be processed even if the client does not end it.
+        """
+        reader, writer = await open_connection(self.address)
+
+        writer.write(b"PLACE 2,3,WEST\nREPORT")
+        writer.write_eof()
+        self.assertEqual(await reader.read(), b"2,3,Direction.WEST\n")
+
+        writer.close()
+        await writer.wait_closed()
+
+    async def test_sessions_are_independent(self):
+        connections = [await open_connection(self.address) for _ in range(10)]
+
+        for i, (_, writer) in enumerate(connections):
+            writer.write(f"PLACE {i % 5},0,NORTH\nMOVE {i + 1}\n".encode())
+
+        for i, (reader, writer) in enumerate(connections):
+            writer.write(b"REPORT\n")
+            self.assertEqual(await reader.readline(), f"{i % 5},{min(i + 1, 4)},Direction.NORTH\n".encode())
+
+            writer.close()
+            await writer.wait_closed()
+
+    async def test_load(self):
+        """Many concurrent, pipelined sessions should all get all of their output.
+        """
+        statistics = await generate_load(self.address, sessions=50, requests=20, pipeline=5)
+
+        self.assertEqual(statistics.sessions, 50)
+        self.assertEqual(statistics.requests, 50 * 20)
+        self.assertEqual(len(statistics.latencies), 50 * 4)
+        self.assertEqual(self.server.total_sessions, 50)
+
+    @unittest.skipIf(not hasattr(asyncio, "start_unix_server"), "Unix sockets are not available")
+    async def test_unix_socket(self):
+        """Unix sockets should work just the same, with any engine.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            server = SimulatorServer(TableSimulator)
+            address = "unix:" + os.path.join(directory, "robot.sock")
+            await server.start(address)
+
+            reader, writer = await open_connection(address)
+            writer.write(b"PLACE 0,0,EAST\nMOVE 10\nREPORT\n")
+            self.assertEqual(await reader.readline(), b"4,0,Direction.EAST\n")
+
+            writer.close()
+            await writer.wait_closed()
+            await server.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
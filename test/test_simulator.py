@@ -1,4 +1,5 @@
 import unittest
+import random
 import sys
 from pathlib import Path
 
@@ -6,8 +7,12 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parents[1]))
 
 from simulator import Simulator
+from multi_robot_simulator import MultiRobotSimulator
 from command import Command
 from pose import Pose
+from obstacle_map import ObstacleMap
+import command
+import pose
 
 
 class TestSimulator(unittest.TestCase):
@@ -88,3 +93,153 @@ class TestSimulator(unittest.TestCase):
 
         expected_pose = Pose(0, 0, Pose.Direction.EAST)
         self.assertEqual(sim.robot_state, expected_pose)
+
+    def test_commands_before_placement(self):
+        """Commands other than PLACE should be ignored until the robot has been placed.
+        """
+        sim = Simulator()
+
+        sim.process_command(Command(Command.Type.MOVE))
+        sim.process_command(Command(Command.Type.LEFT))
+
+        self.assertEqual(sim.robot_state, None)
+
+    def test_rejected_move(self):
+        """Moves that would drive the robot off the table should be ignored.
+        """
+        target_pose = Pose(0, 4, Pose.Direction.NORTH)
+
+        sim = Simulator()
+
+        sim.process_command(Command(Command.Type.PLACE, target_pose))
+        sim.process_command(Command(Command.Type.MOVE))
+
+        self.assertEqual(sim.robot_state, target_pose)
+
+    def test_reset(self):
+        """A reset simulator should behave just like a new one.
+        """
+        sim = Simulator()
+
+        sim.process_command(Command(Command.Type.PLACE, Pose(1, 1, Pose.Direction.EAST)))
+        sim.reset()
+        self.assertEqual(sim.robot_state, None)
+
+        sim.process_command(Command(Command.Type.MOVE))
+        self.assertEqual(sim.robot_state, None)
+
+    def test_events(self):
+        """Subscribers should hear about actual changes and REPORTs only.
+        """
+        sim = Simulator()
+        changes, reports = [], []
+        sim.subscribe(Simulator.Event.CHANGE, lambda state: changes.append(state.pose))
+        sim.subscribe(Simulator.Event.REPORT, lambda state: reports.append(state.pose))
+
+        for line in ["REPORT", "MOVE", "PLACE 0,4,NORTH", "MOVE", "PLACE 0,4,NORTH", "REPORT", "RIGHT", "REPORT"]:
+            sim.process_command(Command.from_string(line))
+
+        self.assertEqual(changes, [Pose(0, 4, Pose.Direction.NORTH), Pose(0, 4, Pose.Direction.EAST)])
+        self.assertEqual(reports, changes)
+
+    def test_events_without_interning(self):
+        """Once poses are no longer interned, only actual changes should still be heard about.
+        """
+        sim = Simulator([0, 10 ** 9], [0, 10 ** 9])
+        robots = MultiRobotSimulator([0, 10 ** 9], [0, 10 ** 9])
+        changes = []
+        sim.subscribe(Simulator.Event.CHANGE, lambda state: changes.append(state.pose))
+        robots.subscribe(Simulator.Event.CHANGE, lambda state: changes.append(state.pose))
+
+        limits = pose._INTERN_LIMIT, command._INTERN_LIMIT
+        pose._INTERN_LIMIT = command._INTERN_LIMIT = 0
+
+        try:
+            for line in ["PLACE 123456789,1000000000,NORTH", "MOVE", "PLACE +123456789,1000000000,NORTH"]:
+                sim.process_command(Command.from_string(line))
+                robots.process_command("r1", Command.from_string(line))
+        finally:
+            pose._INTERN_LIMIT, command._INTERN_LIMIT = limits
+
+        self.assertEqual(changes, [Pose(123456789, 10 ** 9, Pose.Direction.NORTH)] * 2)
+
+    def test_unsubscribe(self):
+        sim = Simulator()
+        reports = []
+        sim.subscribe(Simulator.Event.REPORT, reports.append)
+        sim.unsubscribe(Simulator.Event.REPORT, reports.append)
+
+        sim.process_command(Command.from_string("PLACE 0,0,NORTH"))
+        sim.process_command(Command.from_string("REPORT"))
+
+        self.assertEqual(reports, [])
+
+
+class TestTables(unittest.TestCase):
+    """Test tables of other sizes, and with obstacles.
+    """
+
+    def run_lines(self, sim, lines: list[str]) -> None:
+        for line in lines:
+            sim.process_command(Command.from_string(line))
+
+    def test_size(self):
+        sim = Simulator([0, 999], [-10, 10])
+
+        self.run_lines(sim, ["PLACE 500,-10,EAST", "MOVE 1000", "LEFT", "MOVE 25"])
+        self.assertEqual(sim.robot_state, Pose(999, 10, Pose.Direction.NORTH))
+
+        # The defaults should be unaffected.
+        self.assertEqual(Simulator().x_range, [0, 4])
+
+    def test_obstacles(self):
+        sim = Simulator(obstacles=ObstacleMap([(2, 2), (4, 0)]))
+
+        self.run_lines(sim, ["PLACE 2,2,NORTH"])
+        self.assertEqual(sim.robot_state, None)
+
+        self.run_lines(sim, ["PLACE 2,0,NORTH", "MOVE", "MOVE"])
+        self.assertEqual(sim.robot_state, Pose(2, 1, Pose.Direction.NORTH))
+
+        self.run_lines(sim, ["RIGHT", "RIGHT", "MOVE", "LEFT", "MOVE 4"])
+        self.assertEqual(sim.robot_state, Pose(3, 0, Pose.Direction.EAST))
+
+
+class TestMacros(unittest.TestCase):
+    """Test that macro commands end up exactly where their expansion into single steps would.
+    """
+
+    macros = ["MOVE 3", "MOVE 1000", "LEFT 3", "RIGHT 6", "REPEAT 7 { MOVE; LEFT }", "REPEAT 1003 { MOVE 2; RIGHT 3 }",
+              "REPEAT 5 { PLACE 1,1,NORTH; MOVE 2 }", "REPEAT 99 { REPEAT 3 { MOVE }; LEFT; PLACE 9,9,EAST }"]
+
+    def check(self, make_simulator) -> None:
+        rng = random.Random(11)
+
+        for macro in self.macros:
+            for _ in range(20):
+                start = Command(Command.Type.PLACE,
+                                Pose(rng.randint(0, 4), rng.randint(0, 4), rng.choice(list(Pose.Direction))))
+                command = Command.from_string(macro)
+
+                fast = make_simulator()
+                fast.process_command(start)
+                fast.process_command(command)
+
+                slow = make_simulator()
+                slow.process_command(start)
+
+                for step in command.expand():
+                    slow.process_command(step)
+
+                self.assertEqual(fast.robot_state, slow.robot_state, f"{macro} from {start.pose}")
+
+    def test_reference(self):
+        self.check(Simulator)
+
+    def test_unplaced_repeat(self):
+        """A REPEAT block can place the robot itself.
+        """
+        sim = Simulator()
+        sim.process_command(Command.from_string("REPEAT 2 { MOVE; PLACE 0,0,NORTH; MOVE }"))
+
+        self.assertEqual(sim.robot_state, Pose(0, 1, Pose.Direction.NORTH))
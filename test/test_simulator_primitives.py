@@ -45,6 +45,20 @@ class TestMove(unittest.TestCase):
 
         self.assertEqual(result, expected_pose)
 
+    def test_move_leaves_input_untouched(self):
+        """Poses are shared, so moving must never change the pose that was given.
+        """
+        initial_pose = Pose(1, 1, Pose.Direction.NORTH)
+
+        primitives.move_forward(initial_pose)
+
+        self.assertEqual(initial_pose, Pose(1, 1, Pose.Direction.NORTH))
+
+    def test_move_result_is_interned(self):
+        result = primitives.move_forward(Pose(1, 1, Pose.Direction.EAST))
+
+        self.assertIs(result, Pose(2, 1, Pose.Direction.EAST))
+
 
 class TestTurnLeft(unittest.TestCase):
     """Test turning left.
@@ -0,0 +1,103 @@
+import unittest
+import random
+import sys
+from pathlib import Path
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+from symbolic_execution import SymbolicExecutor
+from obstacle_map import ObstacleMap
+from simulator import Simulator
+from command_stream import CommandStream
+from command import Command
+from pose import Pose
+
+_OBSTACLES = ObstacleMap([(1, 1), (3, 2)])
+
+
+def random_stream(count: int, seed: int, places: bool = True) -> CommandStream:
+    rng = random.Random(seed)
+    lines = []
+
+    for _ in range(count):
+        line = rng.choices(["MOVE", "LEFT", "RIGHT", "REPORT", "PLACE", "MOVE 3", "RIGHT 3", "REPEAT 7 { MOVE; LEFT 2 }",
+                            "REPEAT 5 { MOVE 2; PLACE 1,0,EAST }"],
+                           weights=[6, 2, 2, 1, 1 if places else 0, 1, 1, 1, 1 if places else 0])[0]
+
+        if line == "PLACE":
+            line = f"PLACE {rng.randint(-1, 5)},{rng.randint(-1, 4)},{rng.choice(list(Pose.Direction)).name}"
+
+        lines.append(line)
+
+    return CommandStream.from_lines(lines)
+
+
+class TestSymbolicExecutor(unittest.TestCase):
+    """Test that running from every start pose at once gives the same outcomes as a Simulator per start pose.
+    """
+
+    def brute_force(self, stream: CommandStream, starts: list) -> tuple[dict, list]:
+        """Returns the final pose of every start, and how many distinct poses there were after each command.
+        """
+        simulators = {}
+
+        for start in starts:
+            simulators[start] = Simulator([0, 4], [0, 3], _OBSTACLES)
+            if start is not None:
+                simulators[start].process_command(Command(Command.Type.PLACE, start))
+
+        distinct = []
+
+        for command in stream:
+            for simulator in simulators.values():
+                simulator.process_command(command)
+            distinct.append(len({simulator.robot_state for simulator in simulators.values()}))
+
+        return {start: simulator.robot_state for start, simulator in simulators.items()}, distinct
+
+    def test_matches_simulator(self):
+        executor = SymbolicExecutor([0, 4], [0, 3], _OBSTACLES)
+        every_pose = [Pose(x, y, direction) for x in range(5) for y in range(4) for direction in Pose.Direction
+                      if not _OBSTACLES.blocked(x, y)]
+
+        for seed, places, starts in [(1, False, None), (2, True, None), (3, True, [None] + every_pose[:10]),
+                                     (4, False, every_pose[20:30])]:
+            stream = random_stream(300, seed, places)
+            final, distinct = self.brute_force(stream, starts if starts is not None else every_pose)
+            result = executor.run(stream, starts)
+
+            self.assertEqual(set(result.final), set(final.values()))
+            self.assertEqual(result.converged_at, distinct.index(1) + 1 if 1 in distinct else None)
+
+            groups = executor.groups(stream, starts)
+            for start, pose in final.items():
+                self.assertIn(start, groups[pose])
+            self.assertEqual(sum(len(group) for group in groups.values()), len(final))
+
+    def test_convergence(self):
+        executor = SymbolicExecutor()
+
+        # Turning never brings two poses together, so the outcome depends on the start pose for good.
+        result = executor.run(CommandStream.from_lines(["LEFT", "RIGHT", "RIGHT"]))
+        self.assertEqual(len(result.final), 100)
+        self.assertIsNone(result.converged_at)
+
+        # Running into a corner does, from wherever the robot started (as long as it is known which way it faced).
+        lines = ["LEFT", "MOVE 4", "LEFT", "MOVE 4", "LEFT", "MOVE 4", "LEFT", "MOVE 4", "LEFT", "REPORT"]
+        starts = [Pose(x, y, Pose.Direction.NORTH) for x in range(5) for y in range(5)]
+        result = executor.run(CommandStream.from_lines(lines), starts)
+        self.assertEqual(result.final, [Pose(4, 4, Pose.Direction.WEST)])
+        # (A counted MOVE is a single command, so the robot is known to be in the corner after the fourth.)
+        self.assertEqual(result.converged_at, 4)
+
+        # A valid PLACE settles everything at once, and an invalid one changes nothing.
+        stream = CommandStream.from_lines(["MOVE", "PLACE 9,9,NORTH", "MOVE", "PLACE 2,2,EAST", "MOVE"])
+        result = executor.run(stream)
+        self.assertEqual((result.final, result.converged_at), ([Pose(3, 2, Pose.Direction.EAST)], 4))
+        self.assertEqual(len(executor.starts_leading_to(stream, [Pose(3, 2, Pose.Direction.EAST)])), 100)
+        self.assertEqual(executor.starts_leading_to(stream, [Pose(0, 0, Pose.Direction.EAST)]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+import unittest
+import random
+import sys
+from pathlib import Path
+from unittest import mock
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+from table_simulator import TableSimulator
+from pose_space import PoseSpace
+from obstacle_map import ObstacleMap
+from simulator import Simulator
+from command import Command
+from command_stream import CommandStream
+import test_simulator
+from pose import Pose
+
+
+class TestPoseSpace(unittest.TestCase):
+    """Test the mapping between poses and indices.
+    """
+
+    def test_round_trip(self):
+        """Every index should map onto a pose that maps back onto the same index.
+        """
+        space = PoseSpace([0, 4], [0, 2])
+
+        for index in range(space.size):
+            self.assertEqual(space.index_of(space.pose_at(index)), index)
+
+    def test_outside_table(self):
+        space = PoseSpace([0, 4], [0, 4])
+
+        self.assertEqual(space.index_of(Pose(5, 0, Pose.Direction.NORTH)), None)
+        self.assertEqual(space.index_of(Pose(0, -1, Pose.Direction.NORTH)), None)
+
+    def test_unplaced(self):
+        space = PoseSpace([0, 4], [0, 4])
+
+        self.assertEqual(space.index_of(None), space.unplaced)
+        self.assertEqual(space.pose_at(space.unplaced), None)
+
+
+class TestTableSimulator(unittest.TestCase):
+    """Test that the TableSimulator behaves exactly like the Simulator.
+    """
+
+    def test_placement(self):
+        target_pose = Pose(1, 2, Pose.Direction.EAST)
+
+        sim = TableSimulator()
+        sim.process_command(Command(Command.Type.PLACE, target_pose))
+
+        self.assertEqual(sim.robot_state, target_pose)
+
+    def test_rejected_move(self):
+        target_pose = Pose(4, 4, Pose.Direction.EAST)
+
+        sim = TableSimulator()
+        sim.process_command(Command(Command.Type.PLACE, target_pose))
+        sim.process_command(Command(Command.Type.MOVE))
+
+        self.assertEqual(sim.robot_state, target_pose)
+
+    def test_reset(self):
+        sim = TableSimulator()
+
+        sim.process_command(Command(Command.Type.PLACE, Pose(1, 1, Pose.Direction.EAST)))
+        sim.reset()
+        self.assertEqual(sim.robot_state, None)
+
+        sim.process_command(Command(Command.Type.MOVE))
+        self.assertEqual(sim.robot_state, None)
+
+    def test_too_large(self):
+        """Tables too large to build transition tables for are turned down straight away.
+        """
+        with self.assertRaises(RuntimeError):
+            TableSimulator([0, 1023], [0, 1023])
+
+        with mock.patch.object(TableSimulator, "max_poses", 100):
+            self.assertEqual(TableSimulator([0, 4], [0, 4]).pose_space.size, 100)
+
+            with self.assertRaises(RuntimeError):
+                TableSimulator([0, 5], [0, 4])
+
+    def test_events(self):
+        """The TableSimulator should notify subscribers just like the Simulator.
+        """
+        commands = [Command.from_string(line) for line in ["REPORT", "PLACE 0,4,NORTH", "MOVE", "REPORT", "LEFT 4",
+                                                             "RIGHT", "MOVE 2"]]
+        received = {}
+
+        for make_simulator in [Simulator, TableSimulator]:
+            sim = make_simulator()
+            changes, reports = [], []
+            sim.subscribe(Simulator.Event.CHANGE, lambda state: changes.append(state.pose))
+            sim.subscribe(Simulator.Event.REPORT, lambda state: reports.append(state.pose))
+
+            for command in commands:
+                sim.process_command(command)
+
+            received[make_simulator] = (changes, reports)
+
+        self.assertEqual(received[TableSimulator], received[Simulator])
+
+    def test_matches_reference(self):
+        """Random streams (including out-of-bounds placements) should produce the same poses on both engines.
+        """
+        rng = random.Random(42)
+        reference = Simulator()
+        table = TableSimulator()
+
+        for _ in range(2000):
+            command_type = rng.choice([Command.Type.PLACE, Command.Type.MOVE, Command.Type.MOVE, Command.Type.LEFT,
+                                       Command.Type.RIGHT])
+            pose = None
+
+            if command_type == Command.Type.PLACE:
+                pose = Pose(rng.randint(-1, 5), rng.randint(-1, 5), rng.choice(list(Pose.Direction)))
+
+            command = Command(command_type, pose)
+            reference.process_command(command)
+            table.process_command(command)
+
+            self.assertEqual(table.robot_state, reference.robot_state)
+
+    def test_matches_reference_with_obstacles(self):
+        rng = random.Random(43)
+        obstacles = ObstacleMap((rng.randint(0, 6), rng.randint(0, 5)) for _ in range(8))
+        reference = Simulator([0, 6], [0, 5], obstacles)
+        table = TableSimulator([0, 6], [0, 5], obstacles)
+
+        for _ in range(2000):
+            line = rng.choice(["MOVE", "MOVE", "MOVE 3", "LEFT", "RIGHT",
+                               f"PLACE {rng.randint(-1, 7)},{rng.randint(-1, 6)},NORTH"])
+            command = Command.from_string(line)
+            reference.process_command(command)
+            table.process_command(command)
+
+            self.assertEqual(table.robot_state, reference.robot_state)
+
+    def test_run_stream_matches_reference(self):
+        """Running a whole CommandStream should REPORT the same poses on both engines.
+        """
+        lines = ["REPORT", "MOVE", "PLACE 4,4,NORTH", "MOVE", "REPORT", "LEFT", "MOVE", "REPORT", "PLACE 9,9,EAST",
+                 "RIGHT", "RIGHT", "MOVE", "REPORT"]
+        stream = CommandStream.from_lines(lines)
+
+        table = TableSimulator()
+
+        self.assertEqual(list(table.run_stream(stream)), list(Simulator().run_stream(stream)))
+        self.assertEqual(table.robot_state, Pose(4, 4, Pose.Direction.EAST))
+
+    def test_run_stream_macros(self):
+        """Macros in a stream should be evaluated whole, however many steps they stand for.
+        """
+        lines = ["MOVE 3", "PLACE 0,0,NORTH", "MOVE 2000000", "REPORT", "RIGHT 7", "REPEAT 999999 { MOVE 2; LEFT }",
+                 "REPORT", "REPEAT 3 { PLACE 9,9,EAST; RIGHT }", "REPORT"]
+        stream = CommandStream.from_lines(lines)
+
+        table = TableSimulator()
+        reports = list(table.run_stream(stream))
+
+        self.assertEqual(reports, list(Simulator().run_stream(stream)))
+        self.assertEqual(reports[0], Pose(0, 4, Pose.Direction.NORTH))
+        self.assertEqual(table.robot_state, reports[-1])
+
+
+class TestTableSimulatorMacros(test_simulator.TestMacros):
+    """Test that the TableSimulator evaluates macro commands just like their expansion, too.
+    """
+
+    def test_reference(self):
+        self.check(TableSimulator)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import unittest
+import multiprocessing
+import sys
+from pathlib import Path
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from telemetry import TelemetryPublisher, TelemetryReader
+from simulator import Simulator
+from command import Command
+from pose import Pose
+
+
+def read_in_another_process(name: str, records: int, queue) -> None:
+    with TelemetryReader(name, from_start=True) as reader:
+        poses = []
+        while len(poses) < records:
+            poses += [record.pose for record in reader.read()]
+
+    queue.put(poses)
+
+
+class TestTelemetry(unittest.TestCase):
+    def publisher(self, capacity: int = 1 << 16) -> TelemetryPublisher:
+        publisher = TelemetryPublisher(capacity=capacity)
+        self.addCleanup(publisher.close)
+        return publisher
+
+    def reader(self, name: str, from_start: bool = False) -> TelemetryReader:
+        reader = TelemetryReader(name, from_start)
+        self.addCleanup(reader.close)
+        return reader
+
+    def test_simulator_changes(self):
+        publisher = self.publisher()
+        reader = self.reader(publisher.name)
+
+        simulator = Simulator()
+        simulator.subscribe(Simulator.Event.CHANGE, publisher.publish_state)
+
+        # Rejected commands change nothing, so they are not published.
+        for line in ["MOVE", "PLACE 0,0,NORTH", "MOVE", "LEFT", "MOVE", "REPORT", "RIGHT"]:
+            simulator.process_command(Command.from_string(line))
+
+        records = reader.read()
+        self.assertEqual([record.pose for record in records],
+                         [Pose(0, 0, Pose.Direction.NORTH), Pose(0, 1, Pose.Direction.NORTH),
+                          Pose(0, 1, Pose.Direction.WEST), Pose(0, 1, Pose.Direction.NORTH)])
+        self.assertEqual([record.number for record in records], [0, 1, 2, 3])
+        self.assertEqual(len(publisher), 4)
+        self.assertEqual(reader.read(), [])
+
+    def test_slow_reader(self):
+        publisher = self.publisher(capacity=8)
+        publisher.publish(Pose(0, 0, Pose.Direction.EAST))
+
+        # Readers start from the next record published, unless they ask for what is still in the ring.
+        self.assertEqual(self.reader(publisher.name).read(), [])
+        reader = self.reader(publisher.name, from_start=True)
+
+        for x in range(1, 20):
+            publisher.publish(Pose(x, 0, Pose.Direction.EAST))
+
+        # The publisher never waits: a reader that falls behind skips to the oldest record still in the ring.
+        self.assertEqual([record.pose.x for record in reader.read()], list(range(12, 20)))
+        self.assertEqual(reader.missed, 12)
+
+        publisher.publish(Pose(20, 0, Pose.Direction.EAST))
+        publisher.publish(Pose(21, 0, Pose.Direction.EAST))
+        self.assertEqual(reader.latest().pose, Pose(21, 0, Pose.Direction.EAST))
+        self.assertIsNone(reader.latest())
+        self.assertEqual(reader.missed, 12)
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_view(self):
+        publisher = self.publisher(capacity=4)
+        reader = self.reader(publisher.name)
+        view = reader.view()
+
+        for x in range(6):
+            publisher.publish(Pose(x, 2, Pose.Direction.SOUTH))
+
+        # The view is the ring itself, so it sees every record as soon as it is published.
+        self.assertEqual(view["x"].tolist(), [4, 5, 2, 3])
+        self.assertEqual(view["sequence"].tolist(), [10, 12, 6, 8])
+        self.assertEqual(set(view["direction"].tolist()), {list(Pose.Direction).index(Pose.Direction.SOUTH)})
+        del view
+
+    def test_other_process(self):
+        publisher = self.publisher(capacity=1 << 10)
+        poses = [Pose(x, x % 5, Pose.Direction.WEST) for x in range(500)]
+
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=read_in_another_process, args=(publisher.name, len(poses), queue))
+        process.start()
+
+        for pose in poses:
+            publisher.publish(pose)
+
+        self.assertEqual(queue.get(timeout=30), poses)
+        process.join()
+
+        # Readers leave the ring to the publisher when they are done.
+        self.assertEqual(self.reader(publisher.name, from_start=True).latest().pose, poses[-1])
+
+    def test_errors(self):
+        with self.assertRaises(RuntimeError):
+            TelemetryPublisher(capacity=1000)
+
+        publisher = self.publisher()
+        with self.assertRaises(FileExistsError):
+            TelemetryPublisher(publisher.name)
+
+        with self.assertRaises(FileNotFoundError):
+            TelemetryReader("no-such-telemetry")
+
+
+if __name__ == "__main__":
+    unittest.main()
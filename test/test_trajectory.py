@@ -0,0 +1,136 @@
+import unittest
+import tempfile
+import random
+import sys
+import os
+from pathlib import Path
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from trajectory import TrajectoryRecorder
+from simulator import Simulator
+from table_simulator import TableSimulator
+from command import Command
+from pose import Pose
+
+
+def record(engine, count: int, seed: int, interval: int = 64) -> tuple[TrajectoryRecorder, list]:
+    """Records a random run, returning the recorder and the pose after every step.
+    """
+    rng = random.Random(seed)
+    recorder = TrajectoryRecorder(engine([0, 7], [0, 5]), interval)
+    poses = []
+
+    for _ in range(count):
+        line = rng.choices(["MOVE", "LEFT", "RIGHT", "REPORT", "MOVE 3", "PLACE"], weights=[8, 2, 2, 1, 1, 1])[0]
+
+        if line == "PLACE":
+            line = f"PLACE {rng.randint(-1, 8)},{rng.randint(-1, 6)},{rng.choice(list(Pose.Direction)).name}"
+
+        recorder.process_command(Command.from_string(line))
+        poses.append(recorder.simulator.robot_state)
+
+    return recorder, poses
+
+
+class TestTrajectoryRecorder(unittest.TestCase):
+    def test_recording(self):
+        recorder, poses = record(Simulator, 5000, 1)
+
+        self.assertEqual(len(recorder), len(poses))
+        # About a byte per step: jumps are the exception.
+        self.assertLess(len(recorder.jump_steps), len(poses) // 10)
+
+    def test_save_and_load(self):
+        recorder, poses = record(TableSimulator, 5000, 2)
+
+        with tempfile.TemporaryDirectory() as directory:
+            for compress in [True, False]:
+                path = os.path.join(directory, "trajectory.trtj")
+                recorder.save(path, compress=compress)
+                loaded = TrajectoryRecorder.load(path)
+
+                self.assertEqual(len(loaded), len(recorder))
+                self.assertEqual((loaded.x_range, loaded.y_range), ([0, 7], [0, 5]))
+                self.assertEqual(loaded.codes, recorder.codes)
+                self.assertEqual(loaded.jump_x, recorder.jump_x)
+                self.assertEqual(loaded.checkpoint_y, recorder.checkpoint_y)
+
+            # Truncated files are caught.
+            with open(path, "r+b") as file:
+                file.truncate(os.path.getsize(path) - 100)
+            with self.assertRaises(RuntimeError):
+                TrajectoryRecorder.load(path)
+
+            with open(path, "wb") as file:
+                file.write(b"PLACE 0,0,NORTH\n")
+            with self.assertRaises(RuntimeError):
+                TrajectoryRecorder.load(path)
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestTrajectoryQueries(unittest.TestCase):
+    def setUp(self):
+        self.recorder, self.poses = record(Simulator, 5000, 3)
+        # Decode in small chunks, so that chunk boundaries are exercised too.
+        self.recorder.chunk_steps = 777
+
+    def test_positions(self):
+        for start, stop in [(0, 5000), (0, 1), (63, 65), (64, 128), (1000, 3333), (4999, 5000), (4000, 9000)]:
+            x, y, direction, placed = self.recorder.positions(start, stop)
+            expected = self.poses[start:stop]
+
+            self.assertEqual(len(x), len(expected))
+            self.assertEqual([pose is not None for pose in expected], placed.tolist())
+
+            for index in np.flatnonzero(placed):
+                self.assertEqual((x[index], y[index], direction[index]),
+                                 (expected[index].x, expected[index].y,
+                                  list(Pose.Direction).index(expected[index].direction)))
+
+        for step in [0, 1, 64, 2500, 4999]:
+            self.assertEqual(self.recorder.pose_at(step), self.poses[step])
+
+        with self.assertRaises(RuntimeError):
+            self.recorder.pose_at(5000)
+
+    def test_cell_queries(self):
+        dwell = np.zeros((8, 6), dtype=np.int64)
+        visits = np.zeros((8, 6), dtype=np.int64)
+        first = np.full((8, 6), -1, dtype=np.int64)
+        entries = {}
+        previous = None
+
+        for step, pose in enumerate(self.poses):
+            if pose is not None:
+                dwell[pose.x, pose.y] += 1
+
+                if previous is None or (previous.x, previous.y) != (pose.x, pose.y):
+                    visits[pose.x, pose.y] += 1
+                    entries.setdefault((pose.x, pose.y), []).append(step)
+
+                    if first[pose.x, pose.y] == -1:
+                        first[pose.x, pose.y] = step
+
+            previous = pose
+
+        np.testing.assert_array_equal(self.recorder.heatmap(), dwell)
+        np.testing.assert_array_equal(self.recorder.visit_counts(), visits)
+        np.testing.assert_array_equal(self.recorder.first_visits(), first)
+
+        for cell in [(0, 0), (3, 4), (7, 5)]:
+            self.assertEqual(self.recorder.visits(*cell).tolist(), entries.get(cell, []))
+
+        steps = entries[(3, 4)]
+        self.assertEqual(self.recorder.visits(3, 4, steps[1], steps[-1]).tolist(), steps[1:-1])
+
+        # Cells off the table would otherwise alias cells on it.
+        for cell in [(1, -1), (-1, 8), (8, 0), (0, 6)]:
+            with self.assertRaises(RuntimeError):
+                self.recorder.visits(*cell)
@@ -0,0 +1,76 @@
+import unittest
+import os
+import sys
+from pathlib import Path
+from unittest import mock
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+from user_interface import UserInterface
+from history import HistoryRecorder
+from simulator import Simulator
+from command import Command
+from pose import Pose
+
+
+class TestPipedInput(unittest.TestCase):
+    def pipe(self, data: bytes):
+        """Replaces stdin with a pipe holding the given data (and then closed), for as long as the test runs.
+        """
+        read_fd, write_fd = os.pipe()
+        os.write(write_fd, data)
+        os.close(write_fd)
+
+        stdin = open(read_fd, "r")
+        self.addCleanup(stdin.close)
+
+        patcher = mock.patch("sys.stdin", stdin)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_invalid_lines(self):
+        self.pipe(b"PLACE 0,0,NORTH\nMOVE\nJUMP\n\nREPORT\r\nMOVE -1\nLEFT")
+
+        # Invalid lines are skipped, and logged (once each) along with their line numbers (blank ones are just skipped).
+        with self.assertLogs(level="ERROR") as logs:
+            commands = list(UserInterface().get_piped_commands())
+
+        self.assertEqual(commands,
+                         [Command.from_string(line) for line in ["PLACE 0,0,NORTH", "MOVE", "REPORT", "LEFT"]])
+        self.assertEqual([output.split(":")[2] for output in logs.output], ["Line 3", "Line 6"])
+
+    def test_undo(self):
+        self.pipe(b"PLACE 0,0,NORTH\nMOVE\nMOVE\nUNDO\nREPORT\nUNDO 0\n")
+
+        recorder = HistoryRecorder(Simulator(), 4)
+        reports = []
+        recorder.subscribe(Simulator.Event.REPORT, lambda state: reports.append(state.pose))
+
+        with self.assertLogs("user_interface", "WARNING"):
+            for command in UserInterface().get_piped_commands(history=recorder):
+                recorder.process_command(command)
+
+        self.assertEqual(reports, [Pose(0, 1, Pose.Direction.NORTH)])
+
+    def test_robots(self):
+        self.pipe(b"r1: PLACE 0,0,NORTH\nMOVE\nr2: MOVE\nr3: JUMP\n")
+
+        with self.assertLogs(level="ERROR") as logs:
+            commands = list(UserInterface().get_piped_robot_commands())
+
+        self.assertEqual([output.split(":")[2] for output in logs.output], ["Line 2", "Line 4"])
+
+        self.assertEqual(commands,
+                         [("r1", Command.from_string("PLACE 0,0,NORTH")), ("r2", Command.from_string("MOVE"))])
+
+    def test_end_of_typed_input(self):
+        # Running out of input ends the session, rather than raising an EOFError.
+        self.pipe(b"PLACE 0,0,NORTH\n")
+
+        self.assertEqual(list(UserInterface().get_command_from_user()), [Command.from_string("PLACE 0,0,NORTH")])
+        self.assertEqual(list(UserInterface().get_robot_commands_from_user()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import unittest
+import random
+import sys
+from pathlib import Path
+
+# Make modules in parent directory accessible
+sys.path.append(str(Path(__file__).parents[1]))
+
+from verifying_simulator import VerifyingSimulator
+from engines import ENGINES, make_engine, register_engine
+from simulator import Simulator
+from table_simulator import TableSimulator
+from command_stream import CommandStream
+from command import Command
+from pose import Pose
+
+
+class FaultyTableSimulator(TableSimulator):
+    """Ignores one command (the one after `fault` commands), as a buggy engine might.
+    """
+    fault = 500
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.processed = 0
+
+    def process_command(self, command: Command) -> None:
+        self.processed += 1
+
+        if self.processed != self.fault + 1:
+            super().process_command(command)
+
+
+def random_lines(count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    lines = ["PLACE 0,0,NORTH"]
+
+    for _ in range(count - 1):
+        line = rng.choices(["MOVE", "LEFT", "RIGHT", "REPORT", "PLACE"], weights=[6, 2, 2, 2, 1])[0]
+
+        if line == "PLACE":
+            line = f"PLACE {rng.randint(-1, 5)},{rng.randint(-1, 5)},{rng.choice(list(Pose.Direction)).name}"
+
+        lines.append(line)
+
+    return lines
+
+
+class TestVerifyingSimulator(unittest.TestCase):
+    def run_commands(self, simulator, lines: list[str]) -> list[Pose]:
+        reports = []
+        simulator.subscribe(Simulator.Event.REPORT, lambda state: reports.append(state.pose))
+
+        for line in lines:
+            simulator.process_command(Command.from_string(line))
+
+        return reports
+
+    def test_lockstep(self):
+        lines = random_lines(2000, 1) + ["MOVE 3", "REPEAT 2 { LEFT; MOVE }", "GOTO 4,4,SOUTH", "REPORT"]
+        simulator = VerifyingSimulator(engine=TableSimulator)
+
+        # The output is the engine's own.
+        self.assertEqual(self.run_commands(simulator, lines), self.run_commands(TableSimulator(), lines))
+        self.assertIsNone(simulator.divergence)
+        self.assertEqual(simulator.checked_steps, len(lines))
+
+    def test_first_divergence(self):
+        lines = ["PLACE 0,0,NORTH"] + ["LEFT"] * 999
+        simulator = VerifyingSimulator(engine=FaultyTableSimulator)
+
+        with self.assertLogs("verifying_simulator", "ERROR"):
+            self.run_commands(simulator, lines)
+
+        self.assertEqual(simulator.divergence.step, FaultyTableSimulator.fault + 1)
+        self.assertEqual(simulator.divergence.command, Command(Command.Type.LEFT))
+        self.assertNotEqual(simulator.divergence.expected, simulator.divergence.actual)
+        # Nothing is checked after the first divergence.
+        self.assertEqual(simulator.checked_steps, FaultyTableSimulator.fault + 1)
+
+    def test_sampled_windows(self):
+        lines = ["PLACE 0,0,NORTH"] + ["LEFT"] * 999
+
+        # The fault falls outside of every window, so it goes unnoticed...
+        simulator = VerifyingSimulator(engine=FaultyTableSimulator, sample_interval=300)
+        simulator.window = 10
+        self.run_commands(simulator, lines)
+
+        self.assertIsNone(simulator.divergence)
+        self.assertEqual(simulator.checked_steps, 40)
+
+        # ...unless a window covers it. The Simulator picks up wherever the engine is at the start of each window.
+        simulator = VerifyingSimulator(engine=FaultyTableSimulator, sample_interval=100)
+        simulator.window = 10
+        with self.assertLogs("verifying_simulator", "ERROR"):
+            self.run_commands(simulator, lines)
+
+        self.assertEqual(simulator.divergence.step, FaultyTableSimulator.fault + 1)
+
+    def test_short_intervals(self):
+        lines = ["PLACE 0,0,NORTH"] + ["LEFT"] * 999
+
+        # Windows never cover more than half of an interval, however short it is...
+        simulator = VerifyingSimulator(sample_interval=100)
+        self.run_commands(simulator, lines)
+
+        self.assertEqual(simulator.checked_steps, 500)
+
+        # ...but for intervals of a single step, which check every step.
+        simulator = VerifyingSimulator(sample_interval=1)
+        self.run_commands(simulator, lines)
+
+        self.assertEqual(simulator.checked_steps, 1000)
+
+    def test_run_stream(self):
+        stream = CommandStream.from_lines(random_lines(5000, 2) + ["MOVE 3", "REPEAT 9 { MOVE 2; LEFT }", "REPORT"] * 50)
+        expected = list(TableSimulator().run_stream(stream))
+
+        for sample_interval in [None, 1000, 7]:
+            simulator = VerifyingSimulator(sample_interval=sample_interval)
+            simulator.window = 64
+
+            self.assertEqual(list(simulator.run_stream(stream)), expected)
+            self.assertIsNone(simulator.divergence)
+
+        # Checked steps in streams go through process_command(), so they can be caught too.
+        simulator = VerifyingSimulator(engine=FaultyTableSimulator)
+        stream = CommandStream.from_lines(["PLACE 0,0,NORTH"] + ["LEFT"] * 999)
+        with self.assertLogs("verifying_simulator", "ERROR"):
+            list(simulator.run_stream(stream))
+
+        self.assertEqual(simulator.divergence.step, FaultyTableSimulator.fault + 1)
+
+
+class TestEngines(unittest.TestCase):
+    def test_registry(self):
+        register_engine("faulty", FaultyTableSimulator)
+        self.addCleanup(ENGINES.pop, "faulty")
+
+        self.assertIsInstance(make_engine("faulty", [0, 9], [0, 9]), FaultyTableSimulator)
+
+        simulator = make_engine("faulty", [0, 9], [0, 9], verify=True, sample_interval=1000)
+        self.assertIsInstance(simulator.engine, FaultyTableSimulator)
+        self.assertEqual((simulator.x_range, simulator.y_range), ([0, 9], [0, 9]))
+
+        with self.assertRaises(RuntimeError):
+            register_engine("faulty", TableSimulator)
+        with self.assertRaises(RuntimeError):
+            make_engine("nope")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,355 @@
+# A class method returns an object of the class below, so we need "better" type annotations.
+from __future__ import annotations
+
+from typing import Callable, Generator, Optional
+from array import array
+import logging
+import struct
+import zlib
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from command import Command
+from command_stream import CommandStream
+from pose import Pose
+from state import State
+from simulator_events import process_collecting_changes
+import simulator_primitives as primitives
+
+logger = logging.getLogger(__name__)
+
+# Every step is kept as a single byte: the direction the robot ends up facing (as an index into
+# CommandStream.directions) in the low two bits, and flags for whether it took a single step forward, jumped somewhere
+# else entirely (e.g. a PLACE, kept out of line), or is not on the table at all.
+_DIRECTION_MASK = 0b11
+_MOVED = 0b100
+_JUMPED = 0b1000
+_UNPLACED = 0b10000
+
+_direction_numbers: dict[Pose.Direction, int] = {direction: number
+                                                  for number, direction in enumerate(CommandStream.directions)}
+
+# Arrays are written out and read back in chunks of (about) this many bytes, so nothing needs holding twice.
+_CHUNK_SIZE = 1 << 24
+
+
+class TrajectoryRecorder:
+    """Records the pose of the robot after every step of a run, in about a byte per step, and answers questions about
+    where it has been.
+
+    Commands go through the recorder, which passes them on to the simulator (any engine will do; as with
+    HistoryRecorder, a simulator only lets subscribers know about changes, not about every step). Each step is stored
+    as a delta from the one before it: which way the robot is facing and whether it moved one cell forward. Anything
+    else (PLACEs, or the outcome of a macro command such as MOVE n, which counts as a single step) is stored out of line
+    as a jump to an absolute position. A GOTO, though, takes as many steps as its route, so that every cell on the way
+    is recorded. Every `interval` steps the position is checkpointed, so any range of steps can be decoded without going
+    back to the start.
+
+    Queries decode the deltas back into positions with NumPy, a chunk at a time, so they need NumPy installed
+    (recording does not). A 100M-step run takes about 100MB to record, and typically much less on disk once compressed.
+    """
+
+    MAGIC = b"TRTJ"
+    VERSION = 1
+
+    # Magic, version, whether the arrays are compressed, x_range, y_range, checkpoint interval, steps, jumps.
+    header_format = struct.Struct("<4sHBiiiiQQQ")
+
+    # Number of steps decoded at once by the queries over a whole run.
+    chunk_steps: int = 1 << 22
+
+    def __init__(self, simulator, interval: int = 1 << 16):
+        self.simulator = simulator
+        self.interval = interval
+        self.x_range = list(simulator.x_range) if simulator is not None else [0, 0]
+        self.y_range = list(simulator.y_range) if simulator is not None else [0, 0]
+
+        self.codes = array("B")
+        self.jump_steps = array("q")
+        self.jump_x = array("q")
+        self.jump_y = array("q")
+        self.checkpoint_x = array("q")
+        self.checkpoint_y = array("q")
+
+        # Where the robot is, as of the latest step (or as of attaching to the simulator).
+        self.__pose: Optional[Pose] = simulator.robot_state if simulator is not None else None
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def subscribe(self, event, callback: Callable[[State], None]) -> None:
+        self.simulator.subscribe(event, callback)
+
+    def unsubscribe(self, event, callback: Callable[[State], None]) -> None:
+        self.simulator.unsubscribe(event, callback)
+
+    def process_command(self, command: Command) -> None:
+        if command.type == Command.Type.GOTO:
+            route = process_collecting_changes(self.simulator, command)
+        else:
+            self.simulator.process_command(command)
+            route = []
+
+        for pose in route or [self.simulator.robot_state]:
+            self.record(pose)
+
+    def record(self, pose: Optional[Pose]) -> None:
+        """Appends the pose the robot is in after another step.
+        """
+        before = self.__pose
+        step = len(self.codes)
+
+        if step % self.interval == 0:
+            self.checkpoint_x.append(before.x if before is not None else 0)
+            self.checkpoint_y.append(before.y if before is not None else 0)
+
+        if pose is None:
+            self.codes.append(_UNPLACED)
+        elif before is not None and pose.x == before.x and pose.y == before.y:
+            self.codes.append(_direction_numbers[pose.direction])
+        elif before is not None and pose == primitives.move_forward(before):
+            self.codes.append(_direction_numbers[pose.direction] | _MOVED)
+        else:
+            self.codes.append(_direction_numbers[pose.direction] | _JUMPED)
+            self.jump_steps.append(step)
+            self.jump_x.append(pose.x)
+            self.jump_y.append(pose.y)
+
+        self.__pose = pose
+
+    def positions(self, start: int = 0, stop: Optional[int] = None) -> tuple:
+        """Decodes a range of steps into NumPy arrays of x, y and direction (as an index into CommandStream.directions)
+        after each step, and whether the robot was on the table at all (if not, the rest are meaningless).
+
+        Decoding starts at the checkpoint before `start`, so it takes time in proportion to the range (plus at most an
+        interval), wherever in the run it lies.
+        """
+        _require_numpy()
+        stop = len(self.codes) if stop is None else min(stop, len(self.codes))
+        start = max(0, min(start, stop))
+
+        block = start // self.interval
+        base = block * self.interval
+
+        codes = np.frombuffer(self.codes, dtype=np.uint8, count=stop - base, offset=base)
+        direction = (codes & _DIRECTION_MASK).astype(np.int8)
+        moved = (codes & _MOVED) != 0
+
+        if len(codes) == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty.copy(), direction, moved
+
+        x = np.cumsum(np.where(moved, _step_x[direction], 0))
+        y = np.cumsum(np.where(moved, _step_y[direction], 0))
+
+        # Each jump resets the position, so every step after a jump (up to the next one) is offset so as to line up
+        # with it; steps before the first jump in range are offset from the checkpoint instead.
+        jump_steps = np.frombuffer(self.jump_steps, dtype=np.int64)
+        first, last = np.searchsorted(jump_steps, [base, stop])
+        jumps = jump_steps[first:last] - base
+
+        offset_x = np.empty(len(jumps) + 1, dtype=np.int64)
+        offset_y = np.empty(len(jumps) + 1, dtype=np.int64)
+        offset_x[0], offset_y[0] = self.checkpoint_x[block], self.checkpoint_y[block]
+        offset_x[1:] = np.frombuffer(self.jump_x, dtype=np.int64)[first:last] - x[jumps]
+        offset_y[1:] = np.frombuffer(self.jump_y, dtype=np.int64)[first:last] - y[jumps]
+
+        segment = np.cumsum((codes & _JUMPED) != 0)
+        x += offset_x[segment]
+        y += offset_y[segment]
+
+        placed = (codes & _UNPLACED) == 0
+        skip = start - base
+
+        return x[skip:], y[skip:], direction[skip:], placed[skip:]
+
+    def pose_at(self, step: int) -> Optional[Pose]:
+        """Returns the pose after a step (counting from zero), or None if the robot was not on the table.
+        """
+        if not 0 <= step < len(self.codes):
+            raise RuntimeError(f"Step {step} is not in the trajectory (steps 0 to {len(self.codes) - 1}).")
+
+        x, y, direction, placed = self.positions(step, step + 1)
+
+        return Pose(int(x[0]), int(y[0]), CommandStream.directions[direction[0]]) if placed[0] else None
+
+    def heatmap(self) -> np.ndarray:
+        """Counts how many steps the robot spent in each cell of the table (its dwell time), indexed by [x, y] from the
+        bottom-left corner.
+        """
+        counts = np.zeros(self.__table_size(), dtype=np.int64)
+
+        for start, (cells, _, placed) in self.__chunks():
+            counts += np.bincount(cells[placed], minlength=counts.size).reshape(counts.shape)
+
+        return counts
+
+    def visit_counts(self) -> np.ndarray:
+        """Counts how many times the robot entered each cell of the table (staying put or turning does not count,
+        leaving and coming back does), indexed by [x, y].
+        """
+        counts = np.zeros(self.__table_size(), dtype=np.int64)
+
+        for start, (cells, entered, _) in self.__chunks():
+            counts += np.bincount(cells[entered], minlength=counts.size).reshape(counts.shape)
+
+        return counts
+
+    def first_visits(self) -> np.ndarray:
+        """Finds the first step at which the robot reached each cell of the table (-1 if it never did), indexed by
+        [x, y].
+        """
+        first = np.full(self.__table_size(), -1, dtype=np.int64).reshape(-1)
+
+        for start, (cells, entered, _) in self.__chunks():
+            reached, index = np.unique(cells[entered], return_index=True)
+            new = first[reached] == -1
+            first[reached[new]] = start + np.flatnonzero(entered)[index[new]]
+
+        return first.reshape(self.__table_size())
+
+    def visits(self, x: int, y: int, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """Returns every step (within a range) at which the robot entered a cell (which must be on the table).
+        """
+        _require_numpy()
+
+        if not (self.x_range[0] <= x <= self.x_range[1] and self.y_range[0] <= y <= self.y_range[1]):
+            raise RuntimeError(f"Cell {x},{y} is not on the table ({self.x_range} by {self.y_range}).")
+
+        stop = len(self.codes) if stop is None else min(stop, len(self.codes))
+        steps = []
+
+        for chunk_start in range(start, stop, self.chunk_steps):
+            chunk_stop = min(chunk_start + self.chunk_steps, stop)
+            cells, entered, _ = self.__cells(chunk_start, chunk_stop)
+            steps.append(chunk_start + np.flatnonzero(entered & (cells == self.__cell(x, y))))
+
+        return np.concatenate(steps) if steps else np.zeros(0, dtype=np.int64)
+
+    def __table_size(self) -> tuple[int, int]:
+        _require_numpy()
+        return self.x_range[1] - self.x_range[0] + 1, self.y_range[1] - self.y_range[0] + 1
+
+    def __cell(self, x, y):
+        return (x - self.x_range[0]) * (self.y_range[1] - self.y_range[0] + 1) + (y - self.y_range[0])
+
+    def __cells(self, start: int, stop: int) -> tuple:
+        """Decodes a range of steps into the (flat) cell the robot is in after each, whether it had just entered it, and
+        whether it was on the table at all.
+        """
+        x, y, _, placed = self.positions(max(0, start - 1), stop)
+        cells = self.__cell(x, y)
+
+        # A step enters a cell if the robot was somewhere else (or nowhere) the step before.
+        entered = placed.copy()
+        entered[1:] &= (cells[1:] != cells[:-1]) | ~placed[:-1]
+
+        if start > 0:
+            cells, entered, placed = cells[1:], entered[1:], placed[1:]
+
+        return cells, entered, placed
+
+    def __chunks(self) -> Generator[tuple[int, tuple], None, None]:
+        for start in range(0, len(self.codes), self.chunk_steps):
+            yield start, self.__cells(start, min(start + self.chunk_steps, len(self.codes)))
+
+    def save(self, path: str, compress: bool = True) -> None:
+        """Writes the trajectory out into a file, compressing it (with zlib) unless told not to.
+        """
+        with open(path, "wb") as file:
+            file.write(self.header_format.pack(self.MAGIC, self.VERSION, compress, *self.x_range, *self.y_range,
+                                               self.interval, len(self.codes), len(self.jump_steps)))
+
+            compressor = zlib.compressobj(6) if compress else None
+
+            for values in self.__arrays():
+                if sys.byteorder != "little" and values.itemsize > 1:
+                    values = array(values.typecode, values)
+                    values.byteswap()
+
+                data = memoryview(values).cast("B")
+
+                for offset in range(0, len(data), _CHUNK_SIZE):
+                    chunk = data[offset:offset + _CHUNK_SIZE]
+                    file.write(compressor.compress(chunk) if compressor is not None else chunk)
+
+            if compressor is not None:
+                file.write(compressor.flush())
+
+    @classmethod
+    def load(cls, path: str) -> TrajectoryRecorder:
+        """Reads a trajectory back from a file (which can be queried, but not recorded into any further).
+        """
+        with open(path, "rb") as file:
+            try:
+                magic, version, compressed, x_min, x_max, y_min, y_max, interval, steps, jumps = \
+                    cls.header_format.unpack(file.read(cls.header_format.size))
+            except struct.error:
+                raise RuntimeError(f"File is too short to be a trajectory: {path}")
+
+            if magic != cls.MAGIC or version != cls.VERSION:
+                raise RuntimeError(f"Not a trajectory (or an unsupported version of one): {path}")
+
+            trajectory = cls(None, interval)
+            trajectory.x_range, trajectory.y_range = [x_min, x_max], [y_min, y_max]
+            checkpoints = (steps + interval - 1) // interval
+            counts = [steps, jumps, jumps, jumps, checkpoints, checkpoints]
+
+            chunks = _read_chunks(file, compressed)
+            pending = memoryview(b"")
+
+            for values, count in zip(trajectory.__arrays(), counts):
+                data = bytearray()
+
+                while len(data) < count * values.itemsize:
+                    if not pending:
+                        pending = memoryview(next(chunks, b""))
+
+                        if not pending:
+                            raise RuntimeError(f"Trajectory is truncated: {path}")
+
+                    needed = count * values.itemsize - len(data)
+                    data += pending[:needed]
+                    pending = pending[needed:]
+
+                values.frombytes(data)
+
+                if sys.byteorder != "little" and values.itemsize > 1:
+                    values.byteswap()
+
+        logger.info(f"Loaded a trajectory of {steps} steps from {path}.")
+
+        return trajectory
+
+    def __arrays(self) -> list[array]:
+        return [self.codes, self.jump_steps, self.jump_x, self.jump_y, self.checkpoint_x, self.checkpoint_y]
+
+
+def _read_chunks(file, compressed: bool) -> Generator[bytes, None, None]:
+    """Reads a file in chunks, decompressing them if needed (into chunks of bounded size, too).
+    """
+    decompressor = zlib.decompressobj() if compressed else None
+
+    while data := file.read(_CHUNK_SIZE):
+        if decompressor is None:
+            yield data
+            continue
+
+        while data:
+            yield decompressor.decompress(data, _CHUNK_SIZE)
+            data = decompressor.unconsumed_tail
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("Trajectory queries need NumPy (pip install numpy).")
+
+
+if np is not None:
+    # Per-direction effect of a step forward, derived from the primitives (see FleetSimulator).
+    _step_x = np.array([primitives.move_forward(Pose(0, 0, direction)).x for direction in CommandStream.directions])
+    _step_y = np.array([primitives.move_forward(Pose(0, 0, direction)).y for direction in CommandStream.directions])
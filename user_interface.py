@@ -1,7 +1,16 @@
-from typing import Generator
+from typing import Generator, Iterable, Optional
 import logging
+import time
+import sys
 
-from command import Command
+from binary_log import BinaryLog
+from bulk_parser import BulkParser, read_available_lines, read_mapped_chunks, read_pipe_chunks
+from command import Command, parse_addressed_command, try_parse_addressed_command, try_parse_command
+from command_stream import CommandStream
+from history import HistoryRecorder
+from metrics import SimulatorMetrics
+from output_sinks import OutputSink
+from pose import Pose
 from state import State
 
 logger = logging.getLogger(__name__)
@@ -13,20 +22,122 @@ class UserInterface:
 
     latest_state: State = None
 
-    def get_command_from_user(self) -> Generator[Command, Command, Command]:
+    # If set, the interface times how long commands take to parse.
+    metrics: Optional[SimulatorMetrics] = None
+
+    # If set, output goes (buffered, and in whichever format the sink writes) into the sink instead of being printed.
+    sink: Optional[OutputSink] = None
+
+    def get_command_from_user(self, history: Optional[HistoryRecorder] = None) -> Generator[Command, Command, Command]:
         """Yields a new command until the user provides an invalid command, or until the application is stopped.
+
+        If a history is given, the user may also undo the latest commands with "UNDO" (or "UNDO n", for n of them).
         """
         while True:
-            raw_cmd = input("Input your command: ")
+            try:
+                raw_cmd = input(_prompt())
+            except EOFError:
+                return
+
+            if history is not None and raw_cmd.split(" ")[0] == "UNDO":
+                try:
+                    history.undo(self.__parse_undo(raw_cmd))
+                except RuntimeError as error:
+                    logger.warning(f"Could not undo: {error}")
+                continue
 
             try:
-                cmd = Command.from_string(raw_cmd)
+                cmd = self.__parse(raw_cmd)
             except RuntimeError:
                 logger.info("Received an invalid command, exiting...")
                 return
 
             yield cmd
 
+    def get_piped_commands(self, history: Optional[HistoryRecorder] = None) -> Generator[Command, None, None]:
+        """Yields the commands of a live session whose input is piped in (e.g. a feed from another program) rather than
+        typed, until stdin closes.
+
+        Rather than blocking on a prompt per line, everything that is available on stdin is read at once, and its
+        commands are yielded as a batch; any output they lead to is flushed before waiting for more. Invalid lines are
+        logged as errors, along with their line number, and skipped instead of ending the session. UNDO works as in
+        get_command_from_user().
+        """
+        for number, line in self.__piped_lines():
+            if history is not None and line.split(" ")[0] == "UNDO":
+                try:
+                    history.undo(self.__parse_undo(line))
+                except RuntimeError as error:
+                    logger.warning(f"Line {number}: could not undo: {error}")
+                continue
+
+            cmd, error = self.__try_parse(line)
+
+            if cmd is None:
+                logger.error(f"Line {number}: {error}")
+                continue
+
+            yield cmd
+
+    def get_piped_robot_commands(self) -> Generator[tuple[str, Command], None, None]:
+        """Yields (robot ID, command) pairs from piped input, in batches, just like get_piped_commands() does.
+        """
+        for number, line in self.__piped_lines():
+            addressed, error = try_parse_addressed_command(line)
+
+            if addressed is None:
+                logger.error(f"Line {number}: {error}")
+                continue
+
+            yield addressed
+
+    def get_robot_commands_from_user(self) -> Generator[tuple[str, Command], None, None]:
+        """Yields (robot ID, command) pairs, from commands addressed to robots as in "r2: MOVE", until the user provides
+        an invalid command, or until the application is stopped.
+        """
+        while True:
+            try:
+                raw_cmd = input(_prompt())
+            except EOFError:
+                return
+
+            try:
+                addressed = parse_addressed_command(raw_cmd)
+            except RuntimeError:
+                logger.info("Received an invalid command, exiting...")
+                return
+
+            yield addressed
+
+    def get_robot_commands_from_file(self, path: str) -> Generator[tuple[str, Command], None, None]:
+        """Yields (robot ID, command) pairs from a file of addressed commands (or from stdin, if the path is "-"), one
+        per line. Reading stops at the first invalid command.
+        """
+        with (open(sys.stdin.fileno(), closefd=False) if path == "-" else open(path)) as file:
+            for line in file:
+                try:
+                    addressed = parse_addressed_command(line.rstrip("\r\n"))
+                except RuntimeError:
+                    logger.info("Received an invalid command, exiting...")
+                    return
+
+                yield addressed
+
+    def get_command_streams_from_file(self, path: str) -> Generator[CommandStream, None, None]:
+        """Yields the commands in a file (or in stdin, if the path is "-") as a sequence of compact CommandStreams.
+
+        Text files are memory-mapped and parsed in large chunks; stdin is parsed as data becomes available. Reading
+        stops at the first invalid command. Binary logs need no parsing at all, and are replayed in place.
+        """
+        if path != "-" and BinaryLog.is_binary_log(path):
+            with BinaryLog(path) as log:
+                yield log.stream
+            return
+
+        chunks = read_pipe_chunks(sys.stdin.buffer) if path == "-" else read_mapped_chunks(path)
+
+        yield from BulkParser().parse_chunks(chunks)
+
     def get_pre_coded_commands(self) -> Generator[Command, Command, Command]:
         """Yields commands from a hard-coded list.
         """
@@ -46,17 +157,109 @@ class UserInterface:
         ]
 
         for raw_command in test_commands:
-            cmd = Command.from_string(raw_command)
+            cmd = self.__parse(raw_command)
             yield cmd
 
+    def __piped_lines(self) -> Generator[tuple[int, str], None, None]:
+        """Yields every non-blank line from stdin along with its number (counting from 1), a batch at a time.
+        """
+        number = 0
+
+        for lines in read_available_lines(sys.stdin.fileno()):
+            for line in lines:
+                number += 1
+                line = line.rstrip(b"\r")
+
+                # Undecodable bytes are kept visible, so that the line is rejected (and logged) like any other bad one.
+                if line:
+                    yield number, line.decode("ascii", errors="backslashreplace")
+
+            # Everything that was available has been processed by now, so its output can go out before waiting.
+            self.flush()
+
+    @staticmethod
+    def __parse_undo(raw_cmd: str) -> int:
+        split_raw_cmd = raw_cmd.split(" ")
+
+        if len(split_raw_cmd) == 1:
+            return 1
+
+        try:
+            steps = int(split_raw_cmd[1]) if len(split_raw_cmd) == 2 else 0
+        except ValueError:
+            steps = 0
+
+        if steps < 1:
+            raise RuntimeError(f"UNDO takes a single, positive number of commands: {raw_cmd}")
+
+        return steps
+
+    def __parse(self, raw_cmd: str) -> Command:
+        if self.metrics is None:
+            return Command.from_string(raw_cmd)
+
+        start = time.perf_counter()
+        try:
+            return Command.from_string(raw_cmd)
+        finally:
+            self.metrics.stage_seconds["parse"].observe(time.perf_counter() - start)
+
+    def __try_parse(self, raw_cmd: str) -> tuple[Optional[Command], Optional[str]]:
+        """Parses a command without logging why it is invalid (if it is), timing it like __parse().
+        """
+        if self.metrics is None:
+            return try_parse_command(raw_cmd)
+
+        start = time.perf_counter()
+        try:
+            return try_parse_command(raw_cmd)
+        finally:
+            self.metrics.stage_seconds["parse"].observe(time.perf_counter() - start)
+
     def update_state(self, state: State) -> None:
         """Allows the interface to update its internal state.
         """
         self.latest_state = state
 
-    def report_state(self) -> None:
-        """Outputs the state of the system to the terminal as a raw string.
+    def report_state(self, state: Optional[State] = None, source: Optional[str] = None) -> None:
+        """Outputs the state of the system to the terminal as a raw string (or into the sink, if there is one).
+
+        If a state is given, the interface is updated with it first (so this can be subscribed to a Simulator's REPORT
+        events directly). If a source is given (e.g. the scenario file the state came from), it is output too, so that
+        output from several sources can be told apart.
         """
+        if state is not None:
+            self.update_state(state)
+
+        if self.sink is not None:
+            self.sink.write(self.latest_state.pose, source)
+            return
+
         # Using print() instead of logging as the challenge specifies that the output should be a string in a certain
         # format.
-        print(self.latest_state.pose.to_short_string())
+        if source is None:
+            print(self.latest_state.pose.to_short_string())
+        else:
+            print(f"{source}: {self.latest_state.pose.to_short_string()}")
+
+    def report_poses(self, poses: Iterable[Pose], source: Optional[str] = None) -> None:
+        """Outputs many poses at once (e.g. every REPORT in a CommandStream), without a State for each of them.
+        """
+        if self.sink is None:
+            for pose in poses:
+                self.report_state(State(pose), source)
+            return
+
+        self.sink.write_many(poses, source)
+
+    def flush(self) -> None:
+        """Makes sure any buffered output has been written out.
+        """
+        if self.sink is not None:
+            self.sink.flush()
+
+
+def _prompt() -> str:
+    """Prompts are only shown to someone typing commands in, not written out for every line of piped input.
+    """
+    return "Input your command: " if sys.stdin.isatty() else ""
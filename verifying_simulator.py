@@ -0,0 +1,203 @@
+from typing import Callable, Generator, Optional
+from dataclasses import dataclass
+import logging
+
+from command import Command
+from command_stream import CommandStream
+from state import State
+from pose import Pose
+from simulator import Simulator
+from table_simulator import TableSimulator
+from obstacle_map import ObstacleMap
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Divergence:
+    """The first step after which an engine and the reference Simulator disagreed on where the robot is.
+    """
+    # Steps are counted from one, as in "the pose after step 5"; commands given at once (e.g. a MOVE 3) count as a
+    # single step, but the commands in a stream count one each.
+    step: int
+    command: Command
+    expected: Optional[Pose]
+    actual: Optional[Pose]
+
+
+class VerifyingSimulator:
+    """Runs an engine, and the reference Simulator alongside it, to check that the engine behaves exactly like the
+    Simulator does.
+
+    The engine does all the actual work: events, REPORTs and metrics are its own, and the Simulator only follows along,
+    so the output is the same as the engine's would be on its own. After every step that is checked, the poses of both
+    are compared; the first time they differ, the divergence is logged (and kept in `divergence`), and no more steps are
+    checked, as the two no longer have anything in common.
+
+    By default, every step is checked. If `sample_interval` is set, only the first `window` steps out of every
+    `sample_interval` steps are, so checking costs next to nothing on long runs: the Simulator is simply put wherever
+    the engine is at the start of each window. Streams are run by the engine's own run_stream() between windows.
+    Windows never take up more than half of an interval (but for intervals of a single step), so that sampling always
+    checks fewer steps than checking everything would.
+    """
+
+    # Number of steps in a row that are checked, once every sample_interval steps (if set).
+    window: int = 1024
+
+    def __init__(self,
+                 x_range: Optional[list[int]] = None,
+                 y_range: Optional[list[int]] = None,
+                 obstacles: Optional[ObstacleMap] = None,
+                 engine: Callable = TableSimulator,
+                 sample_interval: Optional[int] = None):
+        if sample_interval is not None and sample_interval < 1:
+            raise RuntimeError(f"Steps can only be sampled once every one or more steps, not {sample_interval}.")
+
+        self.engine = engine(x_range, y_range, obstacles)
+        self.reference = Simulator(x_range, y_range, obstacles)
+        self.sample_interval = sample_interval
+
+        self.x_range = self.engine.x_range
+        self.y_range = self.engine.y_range
+        self.obstacles = self.engine.obstacles
+
+        self.divergence: Optional[Divergence] = None
+        self.checked_steps = 0
+
+        self.__steps = 0
+        # Whether the Simulator has followed the engine through every step so far (or since the latest window began).
+        self.__in_step = True
+
+    @property
+    def robot_state(self) -> Optional[Pose]:
+        return self.engine.robot_state
+
+    @property
+    def metrics(self):
+        return self.engine.metrics
+
+    @metrics.setter
+    def metrics(self, metrics) -> None:
+        self.engine.metrics = metrics
+
+    def subscribe(self, event, callback: Callable[[State], None]) -> None:
+        self.engine.subscribe(event, callback)
+
+    def unsubscribe(self, event, callback: Callable[[State], None]) -> None:
+        self.engine.unsubscribe(event, callback)
+
+    def get_current_state(self) -> State:
+        return self.engine.get_current_state()
+
+    def reset(self) -> None:
+        """Takes the robot off the table, on both simulators (see Simulator).
+        """
+        self.engine.reset()
+        self.reference.reset()
+        self.__in_step = True
+
+    def process_command(self, command: Command) -> None:
+        if not self.__checking():
+            self.__steps += 1
+            self.__in_step = False
+            self.engine.process_command(command)
+            return
+
+        self.__check(command)
+
+    def run_stream(self, stream: CommandStream) -> Generator[Pose, None, None]:
+        """Processes a whole CommandStream, yielding the pose at every REPORT (see Simulator).
+
+        Steps that are checked go through both simulators one at a time; the others go through the engine's
+        run_stream() in one go.
+        """
+        start = 0
+        # Number of PLACEs and macros before `start`.
+        before = (0, 0)
+
+        while start < len(stream):
+            if self.__checking():
+                stop = len(stream) if self.sample_interval is None else \
+                    min(len(stream), start + self.__window() - self.__steps % self.sample_interval)
+                part, counts = _slice(stream, start, stop, before)
+
+                for offset, command in enumerate(part):
+                    if command.type != Command.Type.REPORT:
+                        self.__check(command)
+                    else:
+                        self.__steps += 1
+                        self.__count_report()
+
+                        if self.engine.robot_state is not None:
+                            yield self.engine.robot_state
+
+                    # Once the simulators disagree, there is no point in checking the rest.
+                    if self.divergence is not None:
+                        stop = start + offset + 1
+                        part, counts = _slice(stream, start, stop, before)
+                        break
+            else:
+                stop = len(stream) if self.sample_interval is None or self.divergence is not None else \
+                    min(len(stream), start + self.sample_interval - self.__steps % self.sample_interval)
+                part, counts = _slice(stream, start, stop, before)
+
+                self.__steps += len(part)
+                self.__in_step = False
+                yield from self.engine.run_stream(part)
+
+            before = (before[0] + counts[0], before[1] + counts[1])
+            start = stop
+
+    def __checking(self) -> bool:
+        """Whether the next step is to be checked.
+        """
+        if self.divergence is not None:
+            return False
+
+        return self.sample_interval is None or self.__steps % self.sample_interval < self.__window()
+
+    def __window(self) -> int:
+        """Number of steps in a row that are actually checked, once every sample_interval steps.
+        """
+        return max(1, min(self.window, self.sample_interval // 2))
+
+    def __check(self, command: Command) -> None:
+        """Processes a command on both simulators, and compares where they leave the robot.
+        """
+        if not self.__in_step:
+            # Starting a window: the Simulator picks up from wherever the engine is.
+            self.reference.reset()
+            self.reference.robot_state = self.engine.robot_state
+            self.__in_step = True
+
+        self.__steps += 1
+        self.checked_steps += 1
+        self.engine.process_command(command)
+        self.reference.process_command(command)
+
+        if self.engine.robot_state != self.reference.robot_state:
+            self.divergence = Divergence(self.__steps, command, self.reference.robot_state, self.engine.robot_state)
+            logger.error(f"The engine diverged from the reference Simulator at step {self.__steps} "
+                         f"({command.type.name}): the robot should be at {self.reference.robot_state}, not "
+                         f"{self.engine.robot_state}. No more steps will be checked.")
+
+    def __count_report(self) -> None:
+        # REPORTs in streams are not processed as commands, but should still be counted as the engine's would be.
+        if self.engine.metrics is not None:
+            self.engine.metrics.commands.increment(Command.Type.REPORT.name)
+
+
+def _slice(stream: CommandStream,
+           start: int,
+           stop: int,
+           before: tuple[int, int]) -> tuple[CommandStream, tuple[int, int]]:
+    """Returns the commands of a stream from `start` up to `stop` (given how many PLACEs and macros come before
+    `start`), and how many PLACEs and macros there are among them.
+    """
+    part = CommandStream()
+    part.opcodes = stream.opcodes[start:stop]
+    opcodes = bytes(part.opcodes)
+    places, macros = opcodes.count(CommandStream.PLACE), opcodes.count(CommandStream.MACRO)
+    part.place_args = stream.place_args[before[0] * 3:(before[0] + places) * 3]
+    part.macros = stream.macros[before[1]:before[1] + macros]
+    return part, (places, macros)